@@ -0,0 +1,566 @@
+"""asyncio-native counterparts of the Business and Merchant API clients.
+
+Requires ``aiohttp``. The clients share the models, request building and error mapping with
+their blocking counterparts from ``revolut.business`` and ``revolut.merchant``. All clients
+created with the same ``requester`` (an ``aiohttp.ClientSession``) share its connection pool.
+"""
+import asyncio
+from datetime import date, datetime, timezone
+from decimal import Decimal
+import logging
+from typing import Optional, Union
+from urllib.parse import urljoin
+import weakref
+
+import aiohttp
+
+from . import base, business, exceptions, merchant, utils
+from .cache import ClientCache
+from .codec import JSONCodec, default_codec
+from .compact import CompactOrder, CompactTransaction
+from .metrics import Metrics
+from .ratelimit import RateLimiter
+from .retry import RetryPolicy
+
+__all__ = (
+    "AsyncBusinessClient",
+    "AsyncMerchantClient",
+    "AsyncAccount",
+    "AsyncCounterparty",
+    "AsyncExternalCounterparty",
+    "AsyncTransaction",
+    "AsyncOrder",
+)
+
+_log = logging.getLogger(__name__)
+
+# NOTE: session: {event loop: asyncio.Lock}, as the clients sharing a session renew its token
+_token_locks = weakref.WeakKeyDictionary()
+
+
+def _token_lock(session):
+    """Returns the lock serializing the token renewals of the ``session`` within the
+    running event loop."""
+    locks = _token_locks.setdefault(session, weakref.WeakKeyDictionary())
+    loop = asyncio.get_running_loop()
+    if loop not in locks:
+        locks[loop] = asyncio.Lock()
+    return locks[loop]
+
+
+_TRANSPORT_ERRORS = (aiohttp.ClientConnectionError, asyncio.TimeoutError)
+
+
+class AsyncBaseClient:
+    _session = None
+    _requester = None  # aiohttp.ClientSession()
+    _own_requester: bool = False
+    timeout = 10
+    retry = None  # retry.RetryPolicy()
+    rate_limiter = None  # ratelimit.RateLimiter()
+    codec = None  # codec.JSONCodec()
+    metrics = None  # metrics.Metrics()
+    connections: int = 100
+    base_url: str = ""
+
+    def _set_requester(self, requester, connections):
+        self._requester = requester
+        self.connections = connections or self.connections
+
+    def _set_codec(self, codec):
+        self.codec = codec or default_codec()
+
+    def _timing(self, method, path, phase):
+        """Returns a context timing the ``phase`` of a call, if the metrics are collected."""
+        if self.metrics is None:
+            return base._NOT_TIMED
+        return self.metrics.timing(method, path, phase)
+
+    def _get_requester(self):
+        # NOTE: aiohttp wants the session to be created within a running event loop
+        if self._requester is None:
+            self._requester = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.connections)
+            )
+            self._own_requester = True
+        return self._requester
+
+    async def close(self):
+        """Closes the HTTP session, unless it has been provided by the caller."""
+        if self._own_requester and self._requester is not None:
+            await self._requester.close()
+            self._requester = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def _headers(self):
+        raise NotImplementedError(
+            "{} has to provide authorization headers".format(type(self).__name__)
+        )
+
+    async def _request(self, method, path, data=None):
+        metrics = self.metrics
+        if metrics is not None:
+            metrics.call(method, path)
+        attempt = 1
+        while True:
+            try:
+                return await self._do_request(method, path, data)
+            except Exception as e:
+                if metrics is not None:
+                    metrics.exception(method, path, e)
+                if self.retry is None or not self.retry.should_retry(
+                    method, path, data, e, attempt, _TRANSPORT_ERRORS
+                ):
+                    raise
+                delay = self.retry.delay(attempt, getattr(e, "retry_after", None))
+            if metrics is not None:
+                metrics.retry(method, path)
+            _log.warning(
+                "{} {} failed on attempt {:d}, retrying in {:.2f}s".format(
+                    method, path, attempt, delay
+                )
+            )
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def _do_request(self, method, path, data=None, headers=None):
+        metrics = self.metrics
+        if self.rate_limiter is not None:
+            delay, waited = self.rate_limiter.reserve(method, path), 0.0
+            while delay:
+                await asyncio.sleep(delay)
+                waited += delay
+                delay = self.rate_limiter.reserve(method, path)
+            if waited and metrics is not None:
+                metrics.throttle(method, path, waited)
+        url = urljoin(self.base_url, path)
+        # NOTE: like in base.BaseClient, the payloads are formatted only if they're logged
+        debug = _log.isEnabledFor(logging.DEBUG)
+        if debug:
+            _log.debug("{}".format(path))
+            if data is not None:
+                _log.debug("data: {}".format(utils._loggable(data)))
+        headers = dict(headers or await self._headers())
+        if data:
+            headers["Content-Type"] = "application/json"
+        if metrics is not None:
+            started = metrics.clock()
+        async with self._get_requester().request(
+            method,
+            url,
+            data=self.codec.dumps(data) if data else None,
+            headers=headers,
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+        ) as rsp:
+            status_code = rsp.status
+            body = await rsp.read() if status_code != 204 else None
+        if metrics is not None:
+            received = metrics.clock()
+            metrics.observe(method, path, "network", received - started)
+            metrics.status(method, path, status_code)
+        result = None
+        if body is not None:
+            try:
+                result = self.codec.loads(body)
+            except ValueError:
+                # NOTE: gateway errors may come with a HTML body
+                if 200 <= status_code < 300:
+                    raise
+            if metrics is not None:
+                metrics.observe(method, path, "decode", metrics.clock() - received)
+        base._raise_for_status(status_code, url, result, rsp.headers)
+        if debug and result:
+            _log.debug("Result:\n{}".format(utils._loggable(result)))
+        return result
+
+    async def _get(self, path, data=None):
+        return await self._request("GET", base._query_path(path, data))
+
+    async def _post(self, path, data=None):
+        return await self._request("POST", path, data or {})
+
+    async def _patch(self, path, data=None):
+        return await self._request("PATCH", path, data or {})
+
+    async def _delete(self, path, data=None):
+        return await self._request("DELETE", path, data or {})
+
+
+class AsyncBusinessClient(
+    business._ResourceCacheMixin, business._CounterpartyIndexMixin, AsyncBaseClient
+):
+    """Business API client to be driven by an event loop.
+
+    The ``accounts`` and ``counterparties`` are available as properties only after being
+    loaded by ``await get_accounts()`` and ``await get_counterparties()`` respectively.
+    These coroutines reload them once expired in the ``cache``.
+    """
+
+    live = False
+
+    def __init__(
+        self,
+        session,
+        timeout=None,
+        requester=None,
+        connections=None,
+        retry=None,
+        rate_limiter=None,
+        cache: Optional[ClientCache] = None,
+        codec: Optional[JSONCodec] = None,
+        metrics: Optional[Metrics] = None,
+    ):
+        self.base_url = session.base_url
+        self.live = session.live
+        self._session = session
+        self.timeout = timeout if timeout is not None else self.timeout
+        self.retry = retry
+        self.rate_limiter = rate_limiter
+        self.metrics = metrics
+        self._set_requester(requester, connections)
+        self._set_cache(cache)
+        self._set_codec(codec)
+
+    async def _do_request(self, method, path, data=None, headers=None):
+        token = await self._access_token()
+        try:
+            return await super(AsyncBusinessClient, self)._do_request(
+                method, path, data, business._auth_headers(token)
+            )
+        except exceptions.Unauthorized:
+            if not self._session.renewable:
+                raise
+        _log.info("Access token rejected, refreshing it and retrying {}".format(path))
+        token = await self._access_token(stale_token=token)
+        return await super(AsyncBusinessClient, self)._do_request(
+            method, path, data, business._auth_headers(token)
+        )
+
+    async def _access_token(self, stale_token=None):
+        """Returns the current access token, obtaining a new one if needed or if the
+        ``stale_token`` is still the current one."""
+        session = self._session
+        if session._needs_token() or stale_token == session._access_token:
+            store = session.token_store
+            key = session._store_key() if store is not None else None
+            async with _token_lock(session):
+                # NOTE: another coroutine or process might have refreshed it meanwhile
+                if store is not None:
+                    with store.lock(key):
+                        session._load_token(store.load(key))
+                if session._needs_token() or stale_token == session._access_token:
+                    # NOTE: the store's lock is blocking, so unlike in RenewableSession it
+                    # isn't held while waiting for the token; the renewals are single-flight
+                    # within a process, while other processes may renew it at the same time
+                    await self._request_token()
+                    if store is not None:
+                        with store.lock(key):
+                            store.save(key, session._dump_token())
+        return session._access_token
+
+    async def _request_token(self):
+        session = self._session
+        data = session._token_request_data(**session._grant_params())
+        now = datetime.utcnow()
+        async with self._get_requester().post(
+            urljoin(session.base_url, "auth/token"),
+            data=data,
+            timeout=aiohttp.ClientTimeout(total=session._timeout or self.timeout),
+        ) as rsp:
+            status_code = rsp.status
+            result = await rsp.json(content_type=None)
+        session._set_token(status_code, result, now)
+
+    @property
+    def accounts(self):
+        if self._accounts is None:
+            raise RuntimeError("Accounts not loaded, await get_accounts() first.")
+        return self._accounts
+
+    @property
+    def counterparties(self):
+        if self._counterparties is None:
+            raise RuntimeError(
+                "Counterparties not loaded, await get_counterparties() first."
+            )
+        return self._counterparties
+
+    async def get_accounts(self):
+        if self._accounts_fresh():
+            return self._accounts
+        data = await self._get("accounts")
+        with self._timing("GET", "accounts", "models"):
+            return self._store_accounts(data, AsyncAccount)
+
+    async def get_counterparties(self):
+        if self._counterparties_fresh():
+            return self._counterparties
+        data = await self._get("counterparties")
+        with self._timing("GET", "counterparties", "models"):
+            return self._store_counterparties(
+                AsyncCounterparty(client=self, **cptdat) for cptdat in data
+            )
+
+    async def refresh_accounts(self):
+        self.cache.invalidate("accounts")
+        return await self.get_accounts()
+
+    async def refresh_counterparties(self):
+        self.cache.invalidate("counterparties")
+        return await self.get_counterparties()
+
+    async def refresh_balances(self, accounts=None, workers=8):
+        """Like ``business.BusinessClient.refresh_balances()``, with at most ``workers``
+        account requests in progress at a time."""
+        ids = None if accounts is None else [getattr(a, "id", a) for a in accounts]
+        fetched_at = datetime.now(timezone.utc)
+        if self._list_balances(ids):
+            loaded = await self.refresh_accounts()
+            selected = [loaded[accid] for accid in (loaded if ids is None else ids)]
+        else:
+            selected = [self._accounts[accid] for accid in ids]
+            semaphore = asyncio.Semaphore(workers)
+
+            async def refresh(acc):
+                async with semaphore:
+                    await acc.refresh()
+
+            await asyncio.gather(*(refresh(acc) for acc in selected))
+        return business.BalanceSnapshot(selected, fetched_at)
+
+    async def transactions(
+        self,
+        counterparty=None,
+        from_date=None,
+        to_date=None,
+        txtype=None,
+        account=None,
+        compact=False,
+    ):
+        reqdata = business.BusinessClient._transactions_query(
+            counterparty, from_date, to_date, txtype, account
+        )
+        data = await self._get("transactions", data=reqdata or None)
+        Class = CompactTransaction if compact else AsyncTransaction
+        with self._timing("GET", "transactions", "models"):
+            return [Class(client=self, **txdat) for txdat in data]
+
+    async def transaction(self, id):
+        data = await self._get("transaction/{}".format(id))
+        return AsyncTransaction(client=self, **data)
+
+
+class AsyncAccount(business.Account):
+    client: AsyncBusinessClient
+
+    async def refresh(self):
+        data = await self.client._get("accounts/{}".format(self.id))
+        self._update(**data)
+        return self
+
+    async def details(self, refresh=False):
+        cache = self.client.cache
+        details = None if refresh else cache.get("bank_details", self.id)
+        if details is None:
+            details = await self.client._get("accounts/{}/bank-details".format(self.id))
+            cache.set("bank_details", details, self.id)
+        return details
+
+    async def send(
+        self, dest, amount, currency, request_id, reference=None, fetch=True
+    ):
+        """Unless ``fetch`` is set, returns a ``Transaction`` made of the response to
+        the payment, which lacks e.g. the ``legs``. Call its ``refresh()`` coroutine
+        to get the complete data."""
+        await self.client.get_accounts()
+        await self.client.get_counterparties()
+        path, reqdata = self._payment(dest, amount, currency, request_id, reference)
+        return await self._send(path, reqdata, fetch)
+
+    async def send_many(self, payments, workers=8, fetch=True):
+        """Like ``business.Account.send_many()``, with at most ``workers`` payments
+        in progress at a time."""
+        await self.client.get_accounts()
+        await self.client.get_counterparties()
+        semaphore = asyncio.Semaphore(workers)
+
+        async def send(result, path, reqdata):
+            async with semaphore:
+                try:
+                    result.transaction = await self._send(path, reqdata, fetch)
+                except Exception as e:
+                    result.error = e
+
+        results, tasks = [], []
+        for payment in payments:
+            result = business.PaymentResult(payment)
+            results.append(result)
+            try:
+                path, reqdata = self._payment(*payment)
+            except Exception as e:
+                result.error = e
+                continue
+            tasks.append(send(result, path, reqdata))
+        await asyncio.gather(*tasks)
+        return results
+
+    async def _send(self, path, reqdata, fetch=True):
+        data = await self.client._post(path, reqdata)
+        if fetch:
+            return await self.client.transaction(data["id"])
+        return AsyncTransaction(client=self.client, **self._sent_data(reqdata, data))
+
+
+class AsyncTransaction(business.Transaction):
+    client: AsyncBusinessClient
+
+    async def refresh(self):
+        data = await self.client._get("transaction/{}".format(self.id))
+        self._update(**data)
+        return self
+
+
+class AsyncCounterparty(business.Counterparty):
+    client: AsyncBusinessClient
+
+    async def refresh(self):
+        data = await self.client._get("counterparty/{}".format(self.id))
+        self._update(**data)
+        self.client._add_counterparty(self)
+        return self
+
+    async def save(self):
+        reqdata = self._save_data()
+        try:
+            data = await self.client._post("counterparty", data=reqdata)
+        except exceptions.RevolutHttpError as e:
+            if e.status_code == 422:
+                raise exceptions.CounterpartyAlreadyExists()
+            raise
+        self._update(**data)
+        self.client._add_counterparty(self)
+        return self
+
+    async def delete(self):
+        if not self.id:
+            raise ValueError("{} doesn't have an ID. Cannot delete.".format(self))
+        await self.client._delete("counterparty/{}".format(self.id))
+        self.client._remove_counterparty(self.id)
+        self.id = None
+
+
+class AsyncExternalCounterparty(business.ExternalCounterparty):
+    client: AsyncBusinessClient
+
+    async def save(self):
+        data = await self.client._post("counterparty", data=self._save_data())
+        self.id = data["id"]
+        cpt = AsyncCounterparty(client=self.client, id=self.id)
+        return await cpt.refresh()
+
+
+class AsyncMerchantClient(AsyncBaseClient):
+    merchant_key: Optional[str] = None
+    sandbox: bool = False
+
+    def __init__(
+        self,
+        merchant_key: str,
+        sandbox: bool = False,
+        timeout: Optional[Union[int, float]] = None,
+        requester: Optional[aiohttp.ClientSession] = None,
+        connections: Optional[int] = None,
+        retry: Optional[RetryPolicy] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        codec: Optional[JSONCodec] = None,
+        metrics: Optional[Metrics] = None,
+    ):
+        """
+        Client to the Merchant API to be driven by an event loop. See ``MerchantClient``
+        for the meaning of ``merchant_key`` and ``sandbox``.
+        """
+        self.sandbox = sandbox
+        if sandbox:
+            self.base_url = "https://sandbox-merchant.revolut.com/api/1.0/"
+        else:
+            self.base_url = "https://merchant.revolut.com/api/1.0/"  # pragma: nocover
+        self.merchant_key = merchant_key
+        self.timeout = timeout if timeout is not None else self.timeout
+        self.retry = retry
+        self.rate_limiter = rate_limiter
+        self.metrics = metrics
+        self._set_requester(requester, connections)
+        self._set_codec(codec)
+
+    async def _headers(self):
+        return {"Authorization": "Bearer {}".format(self.merchant_key)}
+
+    async def create_order(
+        self, amount: Union[Decimal, int], currency: str, merchant_reference: str
+    ) -> "AsyncOrder":
+        data = await self._post(
+            "orders",
+            data=merchant.MerchantClient._order_data(
+                amount, currency, merchant_reference
+            ),
+        )
+        return AsyncOrder(client=self, **data)
+
+    async def get_order(self, order_id: str) -> "AsyncOrder":
+        data = await self._get(f"orders/{order_id}")
+        return AsyncOrder(client=self, **data)
+
+    async def create_orders(self, orders, workers: int = 8):
+        """Like ``MerchantClient.create_orders()``, with at most ``workers`` requests
+        in progress at a time."""
+        return await self._map_orders(
+            lambda item: self.create_order(*item), orders, workers
+        )
+
+    async def get_orders(self, order_ids, workers: int = 8):
+        return await self._map_orders(self.get_order, order_ids, workers)
+
+    @staticmethod
+    async def _map_orders(func, items, workers):
+        semaphore = asyncio.Semaphore(workers)
+
+        async def run(result):
+            async with semaphore:
+                try:
+                    result.order = await func(result.item)
+                except Exception as e:
+                    result.error = e
+
+        results = [merchant.OrderResult(item) for item in items]
+        await asyncio.gather(*(run(result) for result in results))
+        return results
+
+    async def orders(
+        self,
+        from_date: Optional[Union[date, datetime]] = None,
+        to_date: Optional[Union[date, datetime]] = None,
+        compact: bool = False,
+    ) -> ["AsyncOrder"]:
+        data = await self._get(
+            path="orders",
+            data=merchant.MerchantClient._orders_query(from_date, to_date),
+        )
+        Class = CompactOrder if compact else AsyncOrder
+        with self._timing("GET", "orders", "models"):
+            return [Class(client=self, **orddat) for orddat in data]
+
+    async def webhook(self, url, events):
+        _ = await self._post(
+            "webhooks", data=merchant.MerchantClient._webhook_data(url, events)
+        )
+
+
+class AsyncOrder(merchant.Order):
+    async def save(self) -> None:
+        respdata = await self.client._patch(f"orders/{self.id}", self._save_data())
+        self._update(**respdata)
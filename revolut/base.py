@@ -1,93 +1,191 @@
-from decimal import Decimal
-import json
+import contextlib
 import logging
+import time
 from urllib.parse import urljoin, urlencode
-from . import exceptions, utils
+from . import exceptions, retry, utils
+from .codec import default_codec
+from .transport import default_transport
 
 _log = logging.getLogger(__name__)
 
+_NOT_TIMED = contextlib.nullcontext()
+
 
 class BaseClient:
     _session = None
-    _requester = None  # requests.Session()
+    _transport = None  # transport.Transport()
+    _requester = None  # requests.Session(), taken from the transport
     timeout = 10
+    retry = None  # retry.RetryPolicy()
+    rate_limiter = None  # ratelimit.RateLimiter()
+    codec = None  # codec.JSONCodec()
+    metrics = None  # metrics.Metrics()
     base_url: str = ""
 
-    def _request(self, func, path, data=None):
-        url = urljoin(self.base_url, path)
-        _log.debug("{}".format(path))
-        if data is not None:
-            _log.debug(
-                "data: {}".format(
-                    json.dumps(
-                        data, cls=utils.JSONWithDecimalEncoder, indent=2, sort_keys=True
-                    )
+    def _request(self, method, path, data=None):
+        metrics = self.metrics
+        if metrics is not None:
+            metrics.call(method, path)
+        attempt = 1
+        while True:
+            try:
+                return self._do_request(method, path, data)
+            except Exception as e:
+                if metrics is not None:
+                    metrics.exception(method, path, e)
+                if self.retry is None or not self.retry.should_retry(
+                    method, path, data, e, attempt
+                ):
+                    raise
+                delay = self.retry.delay(attempt, getattr(e, "retry_after", None))
+            if metrics is not None:
+                metrics.retry(method, path)
+            _log.warning(
+                "{} {} failed on attempt {:d}, retrying in {:.2f}s".format(
+                    method, path, attempt, delay
                 )
             )
-        rsp = func(url, data=json.dumps(data) if data else None, timeout=self.timeout)
+            time.sleep(delay)
+            attempt += 1
+
+    def _do_request(self, method, path, data=None, headers=None):
+        metrics = self.metrics
+        if self.rate_limiter is not None:
+            waited = self.rate_limiter.acquire(method, path)
+            if waited and metrics is not None:
+                metrics.throttle(method, path, waited)
+        url = urljoin(self.base_url, path)
+        # NOTE: the payloads are formatted only if they're going to be logged
+        debug = _log.isEnabledFor(logging.DEBUG)
+        if debug:
+            _log.debug("{}".format(path))
+            if data is not None:
+                _log.debug("data: {}".format(utils._loggable(data)))
+        if metrics is not None:
+            started = metrics.clock()
+        rsp = self._requester.request(
+            method,
+            url,
+            data=self.codec.dumps(data) if data else None,
+            headers=headers,
+            timeout=self.timeout
+            if self.timeout is not None
+            else self._transport.timeout,
+        )
+        if metrics is not None:
+            received = metrics.clock()
+            metrics.observe(method, path, "network", received - started)
+            metrics.status(method, path, rsp.status_code)
         result = None
         if rsp.status_code != 204:
-            result = rsp.json(parse_float=Decimal)
-        if rsp.status_code < 200 or rsp.status_code >= 300:
-            message = getattr(result, "message", "No message supplied")
-            _log.error("HTTP {} for {}: {}".format(rsp.status_code, url, message))
-            if rsp.status_code in (400, 422):
-                if "o pocket found" in message:
-                    raise exceptions.NoPocketFound(message)
-                if "BIC and IBAN does not match" in message:
-                    raise exceptions.BICIBANMismatch(message)
-                if "ould not interpret numbers after plus-sign" in message:
-                    raise exceptions.InvalidPhoneNumber(message)
-                if "equired fields are:" in message:
-                    raise exceptions.MissingFields(message)
-                if "nsufficient balance" in message:
-                    raise exceptions.InsufficientBalance(message)
-                if "ddress is required" in message:
-                    raise exceptions.CounterpartyAddressRequired(message)
-                if "ounterparty already exists" in message:
-                    raise exceptions.CounterpartyAlreadyExists(message)
-                if "we no longer support this beneficiary" in message:
-                    raise exceptions.BeneficiaryUnsupported(message)
-                raise exceptions.BadRequest(rsp.status_code, message)
-            if rsp.status_code == 401:
-                raise exceptions.Unauthorized(rsp.status_code, message)
-            if rsp.status_code == 403:
-                raise exceptions.Forbidden(rsp.status_code, message)
-            if rsp.status_code == 404:
-                raise exceptions.NotFound(rsp.status_code, message)
-            if rsp.status_code == 405:
-                raise exceptions.MethodNotAllowed(rsp.status_code, message)
-            if rsp.status_code == 406:
-                raise exceptions.NotAccaptable(rsp.status_code, message)
-            if rsp.status_code == 409:
-                raise exceptions.RequestConflict(rsp.status_code, message)
-            if rsp.status_code == 429:
-                raise exceptions.TooManyRequests(rsp.status_code, message)
-            if rsp.status_code == 500:
-                raise exceptions.InternalServerError(rsp.status_code, message)
-            if rsp.status_code == 503:
-                raise exceptions.ServiceUnavailable(rsp.status_code, message)
-            raise exceptions.RevolutHttpError(rsp.status_code, message)
-        if result:
-            _ppresult = json.dumps(
-                result, cls=utils.JSONWithDecimalEncoder, indent=2, sort_keys=True
-            )
-            _log.debug("Result:\n{result}".format(result=_ppresult))
+            try:
+                result = self.codec.loads(rsp.content)
+            except ValueError:
+                # NOTE: gateway errors may come with a HTML body
+                if 200 <= rsp.status_code < 300:
+                    raise
+            if metrics is not None:
+                metrics.observe(method, path, "decode", metrics.clock() - received)
+        _raise_for_status(rsp.status_code, url, result, rsp.headers)
+        if debug and result:
+            _log.debug("Result:\n{}".format(utils._loggable(result)))
         return result
 
+    def _iter_pages(self, path, reqdata, size_key, cursor_key, seen_ids=()):
+        """Yields the items of ``path``, which the API returns ordered by creation time
+        descending, fetching them page by page of ``reqdata[size_key]`` new items.
+
+        The ``cursor_key`` of the query is moved to the creation time of the last item on
+        each page. The cursor is inclusive, so the items sharing that timestamp appear again
+        on the next page and are skipped, as are the ones with IDs in ``seen_ids`` when
+        resuming from a cursor. Should they fill a page, the page is enlarged by their
+        number, so that the cursor moves past any number of items created at once."""
+        size = reqdata[size_key]
+        boundary, seen = None, set(seen_ids)
+        while True:
+            reqdata[size_key] = size if len(seen) < size else size + len(seen)
+            data = self._get(path, data=reqdata)
+            for item in data:
+                if item["id"] not in seen:
+                    yield item
+            if len(data) < reqdata[size_key]:
+                return
+            if data[-1]["created_at"] != boundary:
+                boundary, seen = data[-1]["created_at"], set()
+            seen.update(item["id"] for item in data if item["created_at"] == boundary)
+            reqdata[cursor_key] = boundary
+
+    def _set_transport(self, transport):
+        self._transport = transport or default_transport()
+        self._requester = self._transport.session
+
+    def _set_codec(self, codec):
+        self.codec = codec or default_codec()
+
+    def _timing(self, method, path, phase):
+        """Returns a context timing the ``phase`` of a call, if the metrics are collected."""
+        if self.metrics is None:
+            return _NOT_TIMED
+        return self.metrics.timing(method, path, phase)
+
     def _get(self, path, data=None):
-        path = (
-            "{}?{}".format(path, urlencode(data, safe=":"))
-            if data is not None
-            else path
-        )
-        return self._request(self._requester.get, path)
+        return self._request("GET", _query_path(path, data))
 
     def _post(self, path, data=None):
-        return self._request(self._requester.post, path, data or {})
+        return self._request("POST", path, data or {})
 
     def _patch(self, path, data=None):
-        return self._request(self._requester.patch, path, data or {})
+        return self._request("PATCH", path, data or {})
 
     def _delete(self, path, data=None):
-        return self._request(self._requester.delete, path, data or {})
+        return self._request("DELETE", path, data or {})
+
+
+def _query_path(path, data=None):
+    return "{}?{}".format(path, urlencode(data, safe=":")) if data is not None else path
+
+
+def _raise_for_status(status_code, url, result, headers=None):
+    """Maps an unsuccessful HTTP response onto the appropriate exception."""
+    if 200 <= status_code < 300:
+        return
+    retry_after = retry._parse_retry_after((headers or {}).get("Retry-After"))
+    message = getattr(result, "message", "No message supplied")
+    _log.error("HTTP {} for {}: {}".format(status_code, url, message))
+    if status_code in (400, 422):
+        if "o pocket found" in message:
+            raise exceptions.NoPocketFound(message)
+        if "BIC and IBAN does not match" in message:
+            raise exceptions.BICIBANMismatch(message)
+        if "ould not interpret numbers after plus-sign" in message:
+            raise exceptions.InvalidPhoneNumber(message)
+        if "equired fields are:" in message:
+            raise exceptions.MissingFields(message)
+        if "nsufficient balance" in message:
+            raise exceptions.InsufficientBalance(message)
+        if "ddress is required" in message:
+            raise exceptions.CounterpartyAddressRequired(message)
+        if "ounterparty already exists" in message:
+            raise exceptions.CounterpartyAlreadyExists(message)
+        if "we no longer support this beneficiary" in message:
+            raise exceptions.BeneficiaryUnsupported(message)
+        raise exceptions.BadRequest(status_code, message)
+    if status_code == 401:
+        raise exceptions.Unauthorized(status_code, message)
+    if status_code == 403:
+        raise exceptions.Forbidden(status_code, message)
+    if status_code == 404:
+        raise exceptions.NotFound(status_code, message)
+    if status_code == 405:
+        raise exceptions.MethodNotAllowed(status_code, message)
+    if status_code == 406:
+        raise exceptions.NotAccaptable(status_code, message)
+    if status_code == 409:
+        raise exceptions.RequestConflict(status_code, message)
+    if status_code == 429:
+        raise exceptions.TooManyRequests(status_code, message, retry_after)
+    if status_code == 500:
+        raise exceptions.InternalServerError(status_code, message, retry_after)
+    if status_code == 503:
+        raise exceptions.ServiceUnavailable(status_code, message, retry_after)
+    raise exceptions.RevolutHttpError(status_code, message, retry_after)
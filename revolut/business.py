@@ -1,63 +1,427 @@
-import dateutil.parser
+from concurrent import futures
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
 from decimal import Decimal
-import requests
+import logging
+import re
 from typing import Optional
 
-from . import base, exceptions, utils
+from . import base, columns, exceptions, utils
+from .cache import ClientCache
+from .codec import JSONCodec
+from .compact import CompactTransaction
+from .metrics import Metrics
 
+TRANSACTION_TYPES = (
+    "atm",
+    "card_payment",
+    "card_refund",
+    "card_chargeback",
+    "card_credit",
+    "exchange",
+    "transfer",
+    "loan",
+    "fee",
+    "refund",
+    "topup",
+    "topup_return",
+    "tax",
+    "tax_refund",
+)
+TRANSACTIONS_PAGE_SIZE = 1000  # the maximum accepted by the API
+BACKFILL_MIN_SHARD = timedelta(minutes=1)
+# up to that many accounts are refreshed one by one, more with a single list request
+BALANCES_REFRESH_THRESHOLD = 3
+
+_log = logging.getLogger(__name__)
+
+
+def _auth_headers(token):
+    return {"Authorization": "Bearer {}".format(token)}
+
+
+def _iban_key(iban):
+    return "".join(iban.split()).upper() if iban else None
+
+
+def _email_key(email):
+    return email.strip().lower() if email else None
+
+
+def _phone_key(phone):
+    return re.sub(r"[^\d+]", "", phone) if phone else None
+
+
+def _accno_key(account_no, sort_code=None):
+    if not account_no:
+        return None
+    return (
+        "".join(account_no.split()),
+        re.sub(r"\D", "", sort_code) if sort_code else None,
+    )
+
+
+class _CounterpartyIndexMixin(object):
+    """Keeps the loaded counterparties indexed by ID and by the IDs of their accounts,
+    as well as the IBANs, account numbers with sort codes, emails and phones. The indexes
+    are updated as single counterparties get saved, refreshed or deleted."""
 
-class BusinessClient(base.BaseClient, utils._SetEnv):
-    live = False
-    _accounts = None
     _counterparties = None
     _cptbyaccount = None
+    _cptbyiban = None
+    _cptbyaccno = None
+    _cptbyemail = None
+    _cptbyphone = None
+    _cptkeys = None  # the index entries of each counterparty, for removal
+
+    def find_counterparty(self, email=None, phone=None):
+        """Returns the ``Counterparty`` with the given ``email`` or ``phone``, or ``None``."""
+        _ = self.counterparties  # NOTE: make sure counterparties are loaded
+        if email:
+            return self._cptbyemail.get(_email_key(email))
+        return self._cptbyphone.get(_phone_key(phone))
+
+    def find_counterparty_account(self, iban=None, account_no=None, sort_code=None):
+        """Returns the counterparty account with the given ``iban`` or ``account_no`` and
+        ``sort_code`` (if applicable), or ``None``. It may be passed to ``Account.send()``
+        as the destination."""
+        _ = self.counterparties  # NOTE: make sure counterparties are loaded
+        if iban:
+            return self._cptbyiban.get(_iban_key(iban))
+        return self._cptbyaccno.get(_accno_key(account_no, sort_code))
+
+    def _index_counterparties(self, counterparties):
+        self._counterparties, self._cptbyaccount, self._cptkeys = {}, {}, {}
+        self._cptbyiban, self._cptbyaccno = {}, {}
+        self._cptbyemail, self._cptbyphone = {}, {}
+        for cpt in counterparties:
+            self._add_counterparty(cpt)
+        return self._counterparties
+
+    def _add_counterparty(self, cpt):
+        if self._counterparties is None:
+            return  # NOTE: not loaded yet, it will come along with the others
+        self._remove_counterparty(cpt.id)
+        entries = []
+
+        def index(idx, key, obj):
+            if key is not None:
+                idx[key] = obj
+                entries.append((idx, key, obj))
+
+        self._counterparties[cpt.id] = cpt
+        index(self._cptbyemail, _email_key(cpt.email), cpt)
+        index(self._cptbyphone, _phone_key(cpt.phone), cpt)
+        for accid, acc in cpt.accounts.items():  # type: ignore
+            index(self._cptbyaccount, accid, cpt)
+            if isinstance(acc, CounterpartyExternalAccount):
+                index(self._cptbyiban, _iban_key(acc.iban), acc)
+                index(self._cptbyaccno, _accno_key(acc.account_no, acc.sort_code), acc)
+                index(self._cptbyemail, _email_key(acc.email), cpt)
+        self._cptkeys[cpt.id] = entries
+
+    def _remove_counterparty(self, cptid):
+        if self._counterparties is None:
+            return
+        self._counterparties.pop(cptid, None)
+        for idx, key, obj in self._cptkeys.pop(cptid, ()):
+            if idx.get(key) is obj:
+                del idx[key]
+
+
+class _ResourceCacheMixin(object):
+    """Keeps the accounts, counterparties and bank details in the ``cache``, a
+    ``cache.ClientCache``. Once the accounts expire they are reloaded and the existing
+    ``Account`` objects updated, so the references held elsewhere stay valid."""
+
+    cache = None
+    _accounts = None
+
+    def _set_cache(self, cache):
+        self.cache = cache or ClientCache()
+
+    def _accounts_fresh(self):
+        return self._accounts is not None and self.cache.get("accounts") is not None
+
+    def _counterparties_fresh(self):
+        return (
+            self._counterparties is not None
+            and self.cache.get("counterparties") is not None
+        )
+
+    def _store_accounts(self, data, Class):
+        old = self._accounts or {}
+        _accounts = {}
+        for accdat in data:
+            acc = old.get(accdat["id"])
+            if acc is None:
+                acc = Class(client=self, **accdat)
+            else:
+                acc._update(**accdat)
+            _accounts[acc.id] = acc
+        self._accounts = _accounts
+        self.cache.set("accounts", _accounts)
+        return _accounts
+
+    def _list_balances(self, ids):
+        # NOTE: if the accounts are to be loaded anyway, the list gets the balances as well
+        return (
+            ids is None
+            or len(ids) > BALANCES_REFRESH_THRESHOLD
+            or not self._accounts_fresh()
+        )
+
+    def _store_counterparties(self, iterable):
+        _counterparties = self._index_counterparties(iterable)
+        self.cache.set("counterparties", _counterparties)
+        return _counterparties
+
+    def invalidate_cache(self, *resources):
+        """Makes the given ``resources`` (all if none given) to be fetched again upon
+        next access. See ``cache.ClientCache.RESOURCES`` for the names."""
+        for resource in resources or (None,):
+            self.cache.invalidate(resource)
+
 
-    def __init__(self, session, timeout=None):
-        self._set_env(session.access_token)
+class BusinessClient(_ResourceCacheMixin, _CounterpartyIndexMixin, base.BaseClient):
+    """The ``accounts`` and ``counterparties`` are loaded upon first access and kept
+    in the ``cache``, by default until invalidated."""
+
+    live = False
+
+    def __init__(
+        self,
+        session,
+        timeout=None,
+        retry=None,
+        rate_limiter=None,
+        transport=None,
+        cache: Optional[ClientCache] = None,
+        codec: Optional[JSONCodec] = None,
+        metrics: Optional[Metrics] = None,
+    ):
+        self.base_url = session.base_url
+        self.live = session.live
         self._session = session
         self.timeout = timeout
-        self._requester = requests.Session()
-        self._requester.headers.update(
-            {"Authorization": "Bearer {}".format(self._session.access_token)}
+        self.retry = retry
+        self.rate_limiter = rate_limiter
+        self.metrics = metrics
+        self._set_transport(transport or session.transport)
+        self._set_cache(cache)
+        self._set_codec(codec)
+
+    def _do_request(self, method, path, data=None, headers=None):
+        # NOTE: the token is taken from the session for each request, as it may get renewed
+        token = self._session.access_token
+        try:
+            return super(BusinessClient, self)._do_request(
+                method, path, data, _auth_headers(token)
+            )
+        except exceptions.Unauthorized:
+            if not self._session.renewable:
+                raise
+        # the token might have been revoked or expired earlier than announced
+        _log.info("Access token rejected, refreshing it and retrying {}".format(path))
+        token = self._session.refresh_access_token(stale_token=token)
+        return super(BusinessClient, self)._do_request(
+            method, path, data, _auth_headers(token)
         )
 
     @property
     def accounts(self):
-        if self._accounts is not None:
+        if self._accounts_fresh():
             return self._accounts
-        _accounts = {}
         data = self._get("accounts")
-        for accdat in data:
-            acc = Account(client=self, **accdat)
-            _accounts[acc.id] = acc
-        self._accounts = _accounts
-        return self._accounts
+        with self._timing("GET", "accounts", "models"):
+            return self._store_accounts(data, Account)
 
     @property
     def counterparties(self):
-        if self._counterparties is not None:
+        if self._counterparties_fresh():
             return self._counterparties
-        _counterparties = {}
-        _cptbyaccount = {}
         data = self._get("counterparties")
-        for cptdat in data:
-            cpt = Counterparty(client=self, **cptdat)
-            _counterparties[cpt.id] = cpt
-            for cptaccid in cpt.accounts.keys():  # type: ignore
-                _cptbyaccount[cptaccid] = cpt
-        self._counterparties = _counterparties
-        self._cptbyaccount = _cptbyaccount
-        return self._counterparties
+        with self._timing("GET", "counterparties", "models"):
+            return self._store_counterparties(
+                Counterparty(client=self, **cptdat) for cptdat in data
+            )
 
-    def _refresh_counterparties(self):
-        self._counterparties = self._cptbyaccount = {}
-        _ = self.counterparties
+    def refresh_accounts(self):
+        """Fetches the accounts again, regardless of the cache."""
+        self.cache.invalidate("accounts")
+        return self.accounts
+
+    def refresh_counterparties(self):
+        """Fetches the counterparties again, regardless of the cache."""
+        self.cache.invalidate("counterparties")
+        return self.counterparties
+
+    def refresh_balances(self, accounts=None, workers=8):
+        """Refreshes the ``accounts`` (objects or IDs, all if ``None``) in place and
+        returns a ``BalanceSnapshot`` of them.
+
+        Up to ``BALANCES_REFRESH_THRESHOLD`` accounts are fetched concurrently by a pool of
+        at most ``workers`` threads, each with its own request. More accounts, or all of
+        them, are fetched with a single request for the account list."""
+        ids = None if accounts is None else [getattr(a, "id", a) for a in accounts]
+        fetched_at = datetime.now(timezone.utc)
+        if self._list_balances(ids):
+            loaded = self.refresh_accounts()
+            selected = [loaded[accid] for accid in (loaded if ids is None else ids)]
+        else:
+            selected = [self._accounts[accid] for accid in ids]
+            with ThreadPoolExecutor(max_workers=max(1, min(workers, len(ids)))) as pool:
+                list(pool.map(Account.refresh, selected))  # NOTE: raises the 1st error
+        return BalanceSnapshot(selected, fetched_at)
 
     def transactions(
-        self, counterparty=None, from_date=None, to_date=None, txtype=None
+        self,
+        counterparty=None,
+        from_date=None,
+        to_date=None,
+        txtype=None,
+        account=None,
+        compact=False,
     ):
+        """Returns a list of ``Transaction`` objects, or ``CompactTransaction`` ones if
+        ``compact`` is set. The latter take less memory and time to create."""
         transactions = []
+        reqdata = self._transactions_query(
+            counterparty, from_date, to_date, txtype, account
+        )
+        data = self._get("transactions", data=reqdata or None)
+        Class = CompactTransaction if compact else Transaction
+        with self._timing("GET", "transactions", "models"):
+            for txdat in data:
+                txn = Class(client=self, **txdat)
+                transactions.append(txn)
+        return transactions
+
+    def iter_transactions(
+        self,
+        counterparty=None,
+        from_date=None,
+        to_date=None,
+        txtype=None,
+        account=None,
+        count=TRANSACTIONS_PAGE_SIZE,
+        compact=False,
+    ):
+        """Yields ``Transaction`` objects (``CompactTransaction`` if ``compact`` is set) from
+        the newest to the oldest, fetching them page by page with at most ``count`` items
+        each. Only a single page is held in memory.
+
+        The API returns transactions ordered by creation time descending, so the ``to``
+        cursor is moved to the creation time of the last item on each page. Transactions
+        sharing that timestamp appear again on the next page and are skipped."""
+        reqdata = self._transactions_query(
+            counterparty, from_date, to_date, txtype, account
+        )
+        reqdata["count"] = count
+        Class = CompactTransaction if compact else Transaction
+        for txdat in self._iter_transactions_data(reqdata):
+            yield Class(client=self, **txdat)
+
+    def transaction_columns(
+        self,
+        counterparty=None,
+        from_date=None,
+        to_date=None,
+        txtype=None,
+        account=None,
+        count=TRANSACTIONS_PAGE_SIZE,
+    ):
+        """Fetches the transactions like ``iter_transactions()`` and returns them as
+        ``columns.Columns`` with one row per leg, without creating ``Transaction`` objects.
+        Use ``.to_dataframe()`` of the result to get a ``pandas.DataFrame``."""
+        reqdata = self._transactions_query(
+            counterparty, from_date, to_date, txtype, account
+        )
+        reqdata["count"] = count
+        return columns.transaction_columns(self._iter_transactions_data(reqdata))
+
+    def _iter_transactions_data(self, reqdata):
+        return self._iter_pages("transactions", reqdata, "count", "to")
+
+    def backfill_transactions(
+        self,
+        from_date,
+        to_date=None,
+        counterparty=None,
+        txtype=None,
+        account=None,
+        shards=8,
+        workers=4,
+        count=TRANSACTIONS_PAGE_SIZE,
+        compact=False,
+    ):
+        """Fetches all transactions created between ``from_date`` and ``to_date`` (now by
+        default) concurrently and returns them ordered like ``transactions()``, newest first.
+
+        The range is split into ``shards`` equal parts which are fetched by a pool of at most
+        ``workers`` threads, so keep it low enough to stay within the API rate limits.
+        A shard which returns a full page of ``count`` items is split in halves, until it
+        spans less than ``BACKFILL_MIN_SHARD``; such one is then paged through."""
+        if shards < 1:
+            raise ValueError("shards must be at least 1, got {}".format(shards))
+        start = utils._naive_utc(utils._to_datetime(from_date))
+        end = utils._naive_utc(utils._to_datetime(to_date or datetime.utcnow()))
+        if end <= start:
+            raise ValueError("from_date must precede to_date")
+        reqdata = self._transactions_query(
+            counterparty=counterparty, txtype=txtype, account=account
+        )
+        reqdata["count"] = count
+        step = (end - start) / shards
+        bounds = [start + step * i for i in range(shards)] + [end]
+        results, pending = {}, {}
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+
+            def submit(a, b):
+                pending[pool.submit(self._transactions_shard, reqdata, a, b)] = (a, b)
+
+            for a, b in zip(bounds, bounds[1:]):
+                submit(a, b)
+            while pending:
+                done, _ = futures.wait(pending, return_when=futures.FIRST_COMPLETED)
+                for fut in done:
+                    a, b = pending.pop(fut)
+                    data = fut.result()
+                    if data is None:
+                        submit(a, a + (b - a) / 2)
+                        submit(a + (b - a) / 2, b)
+                    else:
+                        results[a] = data
+        # NOTE: shards are disjoint, except for items created exactly at the boundary
+        transactions, seen = [], set()
+        Class = CompactTransaction if compact else Transaction
+        for a in sorted(results, reverse=True):
+            for txdat in results[a]:
+                if txdat["id"] not in seen:
+                    seen.add(txdat["id"])
+                    transactions.append(Class(client=self, **txdat))
+        return transactions
+
+    def _transactions_shard(self, reqdata, start, end):
+        """Returns raw data of transactions created between ``start`` and ``end`` or ``None``
+        if there are too many of them and the shard should be split."""
+        reqdata = dict(
+            reqdata, **{"from": utils._datetime(start), "to": utils._datetime(end)}
+        )
+        data = self._get("transactions", data=reqdata)
+        if len(data) < reqdata["count"]:
+            return data
+        if end - start >= BACKFILL_MIN_SHARD:
+            return None
+        return list(self._iter_transactions_data(reqdata))
+
+    @staticmethod
+    def _transactions_query(
+        counterparty=None, from_date=None, to_date=None, txtype=None, account=None
+    ):
         reqdata = {}
+        if account:
+            reqdata["account"] = utils._obj2id(account)
         if counterparty:
             reqdata["counterparty"] = utils._obj2id(counterparty)
         if from_date:
@@ -65,35 +429,22 @@ class BusinessClient(base.BaseClient, utils._SetEnv):
         if to_date:
             reqdata["to"] = utils._date(to_date).isoformat()
         if txtype:
-            if txtype not in (
-                "atm",
-                "card_payment",
-                "card_refund",
-                "card_chargeback",
-                "card_credit",
-                "exchange",
-                "transfer",
-                "loan",
-                "fee",
-                "refund",
-                "topup",
-                "topup_return",
-                "tax",
-                "tax_refund",
-            ):
+            if txtype not in TRANSACTION_TYPES:
                 raise ValueError("Invalid transaction type: {}".format(txtype))
             reqdata["type"] = txtype
-        data = self._get("transactions", data=reqdata or None)
-        for txdat in data:
-            txn = Transaction(client=self, **txdat)
-            transactions.append(txn)
-        return transactions
+        return reqdata
 
     def transaction(self, id):
         data = self._get("transaction/{}".format(id))
         return Transaction(client=self, **data)
 
-    # TODO: def transaction_by_request_id(self, request_id):
+    def transaction_by_request_id(self, request_id):
+        """Returns the ``Transaction`` made by the request with the given ``request_id``.
+        Raises ``exceptions.NotFound`` if there is none."""
+        data = self._get(
+            "transaction/{}".format(request_id), data={"id_type": "request_id"}
+        )
+        return Transaction(client=self, **data)
 
 
 class Account(utils._UpdateFromKwargsMixin):
@@ -114,10 +465,10 @@ class Account(utils._UpdateFromKwargsMixin):
     def _update(self, **kwargs):
         super(Account, self)._update(**kwargs)
         self.created_at = (
-            dateutil.parser.parse(self.created_at) if self.created_at else None
+            utils._parse_datetime(self.created_at) if self.created_at else None
         )
         self.updated_at = (
-            dateutil.parser.parse(self.updated_at) if self.updated_at else None
+            utils._parse_datetime(self.updated_at) if self.updated_at else None
         )
         self.balance = Decimal(self.balance)
 
@@ -132,10 +483,69 @@ class Account(utils._UpdateFromKwargsMixin):
         self._update(**data)
         return self
 
-    def details(self):
-        return self.client._get("accounts/{}/bank-details".format(self.id))
-
-    def send(self, dest, amount, currency, request_id, reference=None):
+    def details(self, refresh=False):
+        """Returns the bank details, which are kept in the client's cache. Set
+        ``refresh`` to fetch them again."""
+        cache = self.client.cache
+        details = None if refresh else cache.get("bank_details", self.id)
+        if details is None:
+            details = self.client._get("accounts/{}/bank-details".format(self.id))
+            cache.set("bank_details", details, self.id)
+        return details
+
+    def send(self, dest, amount, currency, request_id, reference=None, fetch=True):
+        """Sends the money and returns the resulting ``Transaction``, which is fetched
+        with a separate request. Unless ``fetch`` is set, a ``LazyTransaction`` made of
+        the response is returned instead, which loads the remaining data upon access."""
+        path, reqdata = self._payment(dest, amount, currency, request_id, reference)
+        return self._send(path, reqdata, fetch)
+
+    def send_many(self, payments, workers=8, fetch=True):
+        """Makes the ``payments``, each being a tuple of ``send()`` arguments:
+        ``(dest, amount, currency, request_id[, reference])``. The destinations are resolved
+        up front, then the requests are made by a pool of at most ``workers`` threads.
+
+        Returns a list of ``PaymentResult`` objects in the order of ``payments``. A failure
+        of any payment is reported in its result instead of being raised. As each payment
+        carries its ``request_id``, the failed ones may be safely sent again."""
+        _ = self.client.accounts, self.client.counterparties  # NOTE: load them once
+        results, pending = [], {}
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for payment in payments:
+                result = PaymentResult(payment)
+                results.append(result)
+                try:
+                    path, reqdata = self._payment(*payment)
+                except Exception as e:
+                    result.error = e
+                    continue
+                pending[pool.submit(self._send, path, reqdata, fetch)] = result
+            for fut in futures.as_completed(pending):
+                result = pending[fut]
+                try:
+                    result.transaction = fut.result()
+                except Exception as e:
+                    result.error = e
+        return results
+
+    def _send(self, path, reqdata, fetch=True):
+        data = self.client._post(path, reqdata)
+        if fetch:
+            return self.client.transaction(data["id"])
+        return LazyTransaction(client=self.client, **self._sent_data(reqdata, data))
+
+    @staticmethod
+    def _sent_data(reqdata, data):
+        """Completes the response to a payment with what is known from the request."""
+        data = dict(data)
+        data.setdefault("request_id", reqdata["request_id"])
+        if "reference" in reqdata:
+            data.setdefault("reference", reqdata["reference"])
+        return data
+
+    def _payment(self, dest, amount, currency, request_id, reference=None):
+        """Resolves the destination and returns the endpoint path along with request data.
+        Expects the client's accounts and counterparties to be available."""
         amount = Decimal(amount)
         if not isinstance(request_id, (str, bytes)) or len(request_id) > 40:
             raise ValueError("request_id must be a string of max. 40 chars")
@@ -144,7 +554,9 @@ class Account(utils._UpdateFromKwargsMixin):
             destid in self.client.accounts
             and currency == self.currency == self.client.accounts[destid].currency
         ):
-            return self._transfer_internal(destid, amount, request_id, reference)
+            return "transfer", self._transfer_data(
+                destid, amount, request_id, reference
+            )
         _ = self.client.counterparties  # NOTE: make sure counterparties are loaded
         cpt, receiver = None, {}
         try:
@@ -177,10 +589,9 @@ class Account(utils._UpdateFromKwargsMixin):
         }
         if reference is not None:
             reqdata["reference"] = reference
-        data = self.client._post("pay", reqdata)
-        return self.client.transaction(data["id"])
+        return "pay", reqdata
 
-    def _transfer_internal(self, destid, amount, request_id, reference):
+    def _transfer_data(self, destid, amount, request_id, reference):
         reqdata = {
             "request_id": request_id,
             "source_account_id": self.id,
@@ -190,8 +601,54 @@ class Account(utils._UpdateFromKwargsMixin):
         }
         if reference is not None:
             reqdata["reference"] = reference
-        data = self.client._post("transfer", reqdata)
-        return self.client.transaction(data["id"])
+        return reqdata
+
+
+class BalanceSnapshot(dict):
+    """Maps account IDs to their balances as fetched at ``fetched_at``. Unlike the
+    ``Account`` objects, it doesn't change on subsequent refreshes."""
+
+    def __init__(self, accounts, fetched_at):
+        super(BalanceSnapshot, self).__init__((acc.id, acc.balance) for acc in accounts)
+        self.currencies = {acc.id: acc.currency for acc in accounts}
+        self.fetched_at = fetched_at
+
+    def __repr__(self):
+        return "<BalanceSnapshot of {} accounts at {}>".format(
+            len(self), self.fetched_at.isoformat()
+        )
+
+    def totals(self):
+        """Returns the sums of balances per currency."""
+        totals = {}
+        for accid, balance in self.items():
+            currency = self.currencies[accid]
+            totals[currency] = totals.get(currency, Decimal(0)) + balance
+        return totals
+
+
+class PaymentResult(object):
+    """The outcome of one of the payments made by ``Account.send_many()``: either
+    the resulting ``transaction`` or the ``error`` raised."""
+
+    transaction = None
+    error = None
+
+    def __init__(self, payment):
+        self.payment = tuple(payment)
+
+    def __repr__(self):
+        return "<PaymentResult {} {}>".format(
+            self.request_id, self.transaction or repr(self.error)
+        )
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    @property
+    def request_id(self):
+        return self.payment[3] if len(self.payment) > 3 else None
 
 
 class Counterparty(utils._UpdateFromKwargsMixin):
@@ -234,18 +691,31 @@ class Counterparty(utils._UpdateFromKwargsMixin):
             self.accounts[acc.id] = acc
         super(Counterparty, self)._update(**kwargs)
         self.created_at = (
-            dateutil.parser.parse(self.created_at) if self.created_at else None
+            utils._parse_datetime(self.created_at) if self.created_at else None
         )
         self.updated_at = (
-            dateutil.parser.parse(self.updated_at) if self.updated_at else None
+            utils._parse_datetime(self.updated_at) if self.updated_at else None
         )
 
     def refresh(self):
         data = self.client._get("counterparty/{}".format(self.id))
         self._update(**data)
+        self.client._add_counterparty(self)
         return self
 
     def save(self):
+        reqdata = self._save_data()
+        try:
+            data = self.client._post("counterparty", data=reqdata)
+        except exceptions.RevolutHttpError as e:
+            if e.status_code == 422:
+                raise exceptions.CounterpartyAlreadyExists()
+            raise
+        self._update(**data)
+        self.client._add_counterparty(self)
+        return self
+
+    def _save_data(self):
         if self.id:
             raise exceptions.CounterpartyAlreadyExists(
                 "The object's ID is set. It has been saved already."
@@ -256,23 +726,13 @@ class Counterparty(utils._UpdateFromKwargsMixin):
             keyset = ("profile_type", "name", "phone")
         else:
             raise ValueError("Invalid profile type: {}".format(self.profile_type))
-        try:
-            data = self.client._post(
-                "counterparty", data={k: getattr(self, k) for k in keyset}
-            )
-        except exceptions.RevolutHttpError as e:
-            if e.status_code == 422:
-                raise exceptions.CounterpartyAlreadyExists()
-            raise
-        self._update(**data)
-        self.client._refresh_counterparties()
-        return self
+        return {k: getattr(self, k) for k in keyset}
 
     def delete(self):
         if not self.id:
             raise ValueError("{} doesn't have an ID. Cannot delete.".format(self))
         self.client._delete("counterparty/{}".format(self.id))
-        del self.client._counterparties[self.id]  # type: ignore
+        self.client._remove_counterparty(self.id)
         self.id = None
 
 
@@ -311,6 +771,12 @@ class ExternalCounterparty(utils._UpdateFromKwargsMixin):
         )
 
     def save(self):
+        data = self.client._post("counterparty", data=self._save_data())
+        self.id = data["id"]
+        cpt = Counterparty(client=self.client, id=self.id)
+        return cpt.refresh()
+
+    def _save_data(self):
         if self.id:
             raise exceptions.CounterpartyAlreadyExists(
                 "The object's ID is set. It has been saved already."
@@ -340,11 +806,7 @@ class ExternalCounterparty(utils._UpdateFromKwargsMixin):
             v = getattr(self, k, None)
             if v:
                 reqdata[k] = v
-        data = self.client._post("counterparty", data=reqdata)
-        self.id = data["id"]
-        self.client._refresh_counterparties()
-        cpt = Counterparty(client=self.client, id=self.id)
-        return cpt.refresh()
+        return reqdata
 
 
 class CounterpartyAccount(utils._UpdateFromKwargsMixin):
@@ -398,10 +860,6 @@ class Transaction(utils._UpdateFromKwargsMixin):
     def __init__(self, **kwargs):
         self.client = kwargs.pop("client")
         self._update(**kwargs)
-        self.legs = self.legs or []
-        for leg in self.legs:
-            if "amount" in leg and not isinstance(leg["amount"], Decimal):
-                leg["amount"] = Decimal(leg["amount"])
 
     @property
     def direction(self):
@@ -419,11 +877,57 @@ class Transaction(utils._UpdateFromKwargsMixin):
     def _update(self, **kwargs):
         super(Transaction, self)._update(**kwargs)
         self.created_at = (
-            dateutil.parser.parse(self.created_at) if self.created_at else None
+            utils._parse_datetime(self.created_at) if self.created_at else None
         )
         self.updated_at = (
-            dateutil.parser.parse(self.updated_at) if self.updated_at else None
+            utils._parse_datetime(self.updated_at) if self.updated_at else None
         )
         self.completed_at = (
-            dateutil.parser.parse(self.completed_at) if self.completed_at else None
+            utils._parse_datetime(self.completed_at) if self.completed_at else None
         )
+        self.legs = self.legs or []
+        for leg in self.legs:
+            if "amount" in leg and not isinstance(leg["amount"], Decimal):
+                leg["amount"] = Decimal(leg["amount"])
+
+    def refresh(self):
+        data = self.client._get("transaction/{}".format(self.id))
+        self._update(**data)
+        return self
+
+
+class LazyTransaction(Transaction):
+    """A ``Transaction`` made of the response to a payment, which carries only a few of its
+    attributes, e.g. ``id``, ``state`` and ``created_at``. Accessing any of the others
+    fetches the complete record first."""
+
+    _fields = (
+        "type",
+        "state",
+        "reason_code",
+        "created_at",
+        "completed_at",
+        "updated_at",
+        "legs",
+        "request_id",
+        "reference",
+        "revertable",
+    )
+    _missing = frozenset()
+
+    def __init__(self, **kwargs):
+        super(LazyTransaction, self).__init__(**kwargs)
+        self._missing = frozenset(f for f in self._fields if f not in kwargs)
+
+    def __getattribute__(self, name):
+        if name in object.__getattribute__(self, "_missing"):
+            object.__getattribute__(self, "refresh")()
+        return object.__getattribute__(self, name)
+
+    def refresh(self):
+        missing, self._missing = self._missing, frozenset()
+        try:
+            return super(LazyTransaction, self).refresh()
+        except BaseException:
+            self._missing = missing
+            raise
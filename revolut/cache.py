@@ -0,0 +1,125 @@
+"""Expiring caches of the resources fetched by the clients.
+
+A ``ClientCache`` holds one ``TTLCache`` per resource: the ``accounts`` (with their
+balances), the ``counterparties`` and the ``bank_details`` of each account. Each resource has
+its own time to live in seconds, ``None`` meaning the entries never expire, which is the
+default. Long-running processes should set a TTL for the accounts to have the balances
+reloaded on a controlled schedule, e.g.::
+
+    cache = ClientCache(ttls={"accounts": 60, "counterparties": 3600})
+    cli = BusinessClient(session, cache=cache)
+"""
+from collections import OrderedDict
+import threading
+import time
+from typing import Optional
+
+__all__ = ("ClientCache", "TTLCache")
+
+
+class TTLCache(object):
+    """Keeps values for ``ttl`` seconds (forever if ``None``) and at most ``maxsize`` of
+    them, evicting the least recently used ones. Counts hits, misses and evictions."""
+
+    def __init__(
+        self,
+        ttl: Optional[float] = None,
+        maxsize: Optional[int] = None,
+        clock=time.monotonic,
+    ):
+        if ttl is not None and ttl < 0:
+            raise ValueError("TTL must not be negative, got {}".format(ttl))
+        if maxsize is not None and maxsize < 1:
+            raise ValueError("Max size must be positive, got {}".format(maxsize))
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._data = OrderedDict()  # key: (expiry time, value)
+        self.hits = self.misses = self.evictions = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        """Returns the value stored under ``key`` unless it has expired."""
+        with self._lock:
+            try:
+                expires, value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            if expires is not None and expires <= self._clock():
+                del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            expires = self._clock() + self.ttl if self.ttl is not None else None
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while self.maxsize is not None and len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key=None):
+        """Drops the value stored under ``key``, or all of them if ``key`` is ``None``."""
+        with self._lock:
+            if key is None:
+                self._data.clear()
+            else:
+                self._data.pop(key, None)
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self._data),
+        }
+
+
+class ClientCache(object):
+    """Per-resource ``TTLCache`` objects of a client. The ``ttls`` map the resource names
+    to their TTLs, overriding the defaults. ``maxsize`` limits the number of entries of each
+    resource, which matters for the ``bank_details`` kept per account."""
+
+    RESOURCES = ("accounts", "counterparties", "bank_details")
+    DEFAULT_TTLS = {"accounts": None, "counterparties": None, "bank_details": None}
+
+    def __init__(self, ttls=None, maxsize: Optional[int] = 1024, clock=time.monotonic):
+        ttls = dict(self.DEFAULT_TTLS, **(ttls or {}))
+        unknown = set(ttls) - set(self.RESOURCES)
+        if unknown:
+            raise ValueError(
+                "Unknown cached resources: {}".format(", ".join(sorted(unknown)))
+            )
+        self._caches = {
+            name: TTLCache(ttls[name], maxsize, clock) for name in self.RESOURCES
+        }
+
+    def __getitem__(self, resource):
+        return self._caches[resource]
+
+    def get(self, resource, key=None, default=None):
+        return self._caches[resource].get(key, default)
+
+    def set(self, resource, value, key=None):
+        self._caches[resource].set(key, value)
+
+    def invalidate(self, resource=None, key=None):
+        """Drops the ``key`` entry of the ``resource``, all entries of the ``resource`` if
+        ``key`` is ``None``, or everything if ``resource`` is ``None`` as well."""
+        if resource is None:
+            for cache in self._caches.values():
+                cache.invalidate()
+        else:
+            self._caches[resource].invalidate(key)
+
+    def stats(self):
+        """Returns the counters of each resource, as a dict keyed by resource name."""
+        return {name: cache.stats() for name, cache in self._caches.items()}
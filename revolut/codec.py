@@ -0,0 +1,114 @@
+"""JSON codecs used by the clients to encode request bodies and decode responses.
+
+Numbers with a fraction are decoded as ``Decimal`` and ``Decimal`` values are encoded as
+strings, or as numbers if so chosen, so that the amounts never go through binary floating
+point.
+"""
+from decimal import Decimal
+import json
+
+try:
+    import orjson
+except ImportError:  # pragma: nocover
+    orjson = None
+
+__all__ = ("JSONCodec", "OrjsonCodec", "default_codec")
+
+
+def _encode_decimal(o):
+    if isinstance(o, Decimal):
+        return str(o)
+    raise TypeError(
+        "Object of type {} is not JSON serializable".format(type(o).__name__)
+    )
+
+
+class JSONCodec(object):
+    """Codec based on the standard ``json`` module. The encoder and decoder are built once
+    and reused, rather than for every request.
+
+    With ``decimal_numbers`` set, ``Decimal`` values are written as JSON numbers with all
+    their digits, so that they're decoded back as equal ``Decimal`` values. Those without
+    a fraction or exponent, like ``Decimal("5")``, come back as ``int``."""
+
+    name = "json"
+
+    def __init__(self, decimal_numbers: bool = False):
+        self._encoder = json.JSONEncoder(
+            separators=(",", ":"), ensure_ascii=False, default=_encode_decimal
+        )
+        self._decoder = json.JSONDecoder(parse_float=Decimal)
+        self.decimal_numbers = decimal_numbers
+
+    def dumps(self, obj) -> bytes:
+        if self.decimal_numbers:
+            return "".join(self._iterencode(obj)).encode("utf-8")
+        return self._encoder.encode(obj).encode("utf-8")
+
+    def _iterencode(self, obj):
+        # NOTE: the json module can't write a number it doesn't know, so the containers
+        # holding Decimals are walked here and the other values left to it
+        if isinstance(obj, Decimal):
+            if not obj.is_finite():
+                raise ValueError("Out of range Decimal value: {}".format(obj))
+            yield str(obj)
+        elif isinstance(obj, dict):
+            yield "{"
+            for i, (key, value) in enumerate(obj.items()):
+                if not isinstance(key, str):
+                    raise TypeError(
+                        "Keys must be str, not {}".format(type(key).__name__)
+                    )
+                yield "," if i else ""
+                yield self._encoder.encode(key)
+                yield ":"
+                yield from self._iterencode(value)
+            yield "}"
+        elif isinstance(obj, (list, tuple)):
+            yield "["
+            for i, value in enumerate(obj):
+                yield "," if i else ""
+                yield from self._iterencode(value)
+            yield "]"
+        else:
+            yield self._encoder.encode(obj)
+
+    def loads(self, data):
+        if isinstance(data, (bytes, bytearray)):
+            data = data.decode("utf-8")
+        return self._decoder.decode(data)
+
+
+class OrjsonCodec(JSONCodec):
+    """Codec encoding with ``orjson``, which requires the ``orjson`` package.
+
+    The responses are still decoded by the ``json`` module: ``orjson`` parses the numbers
+    as floats only and converting them back to exact ``Decimal`` values costs more than the
+    faster parsing saves.
+    """
+
+    name = "orjson"
+
+    def __init__(self):
+        if orjson is None:
+            raise ImportError("OrjsonCodec requires the orjson package")
+        super(OrjsonCodec, self).__init__()
+
+    def dumps(self, obj) -> bytes:
+        try:
+            return orjson.dumps(obj, default=_encode_decimal)
+        except TypeError:
+            # NOTE: e.g. an integer beyond 64 bits; the json module raises if it's invalid
+            return super(OrjsonCodec, self).dumps(obj)
+
+
+_default = None
+
+
+def default_codec() -> JSONCodec:
+    """Returns the codec used by the clients created without one: ``OrjsonCodec`` if
+    ``orjson`` is installed, ``JSONCodec`` otherwise."""
+    global _default
+    if _default is None:
+        _default = OrjsonCodec() if orjson is not None else JSONCodec()
+    return _default
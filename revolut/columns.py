@@ -0,0 +1,184 @@
+"""Columnar representation of transactions and orders, for vectorised aggregations.
+
+The columns are built in a single pass over the data returned by the API, without creating
+model objects. Amounts are integers in 1/100ths of the currency unit, timestamps are UTC
+microseconds and the categorical columns hold integer codes indexing their categories (-1
+stands for a missing value). With NumPy installed the columns are arrays of ``int64``,
+``datetime64[us]`` and ``int32`` respectively, otherwise lists. ``Columns.to_dataframe()``
+requires pandas (and NumPy).
+"""
+import calendar
+
+try:
+    import numpy
+except ImportError:  # pragma: nocover
+    numpy = None
+
+from . import utils
+
+__all__ = ("Columns", "transaction_columns", "order_columns")
+
+_NAT = -(2**63)  # the int64 value of NaT
+
+
+class Columns(dict):
+    """Maps column names to the columns of equal length. The ``categories`` hold the list
+    of values for each of the categorical columns."""
+
+    def __init__(self, columns=(), categories=None):
+        super(Columns, self).__init__(columns)
+        self.categories = categories or {}
+
+    def __repr__(self):
+        return "<Columns {} x {}>".format(len(self), list(self))
+
+    @property
+    def rows(self):
+        return len(next(iter(self.values()))) if self else 0
+
+    def decode(self, name):
+        """Returns the values of the categorical column ``name``."""
+        categories = self.categories[name]
+        return [categories[c] if c >= 0 else None for c in self[name]]
+
+    def to_dataframe(self):
+        """Returns a ``pandas.DataFrame`` with the categorical columns converted to
+        ``pandas.Categorical``."""
+        try:
+            import pandas
+        except ImportError:
+            raise ImportError("Columns.to_dataframe() requires pandas to be installed")
+        frame = {}
+        for name, column in self.items():
+            if name in self.categories:
+                column = pandas.Categorical.from_codes(column, self.categories[name])
+            frame[name] = column
+        return pandas.DataFrame(frame)
+
+
+class _Builder(object):
+    def __init__(self, strings=(), categorical=(), amounts=(), timestamps=()):
+        self.kinds = {}
+        for kind, names in (
+            ("str", strings),
+            ("cat", categorical),
+            ("amount", amounts),
+            ("timestamp", timestamps),
+        ):
+            for name in names:
+                self.kinds[name] = kind
+        self.columns = {name: [] for name in self.kinds}
+        self.codes = {name: {} for name in categorical}
+
+    def code(self, name, value):
+        if value is None:
+            return -1
+        codes = self.codes[name]
+        try:
+            return codes[value]
+        except KeyError:
+            codes[value] = len(codes)
+            return codes[value]
+
+    def build(self):
+        categories = {name: list(codes) for name, codes in self.codes.items()}
+        if numpy is None:
+            return Columns(self.columns, categories)
+        dtypes = {
+            "str": object,
+            "cat": numpy.int32,
+            "amount": numpy.int64,
+            "timestamp": numpy.int64,
+        }
+        columns = {}
+        for name, values in self.columns.items():
+            column = numpy.array(values, dtype=dtypes[self.kinds[name]])
+            if self.kinds[name] == "timestamp":
+                column = column.view("datetime64[us]")
+            columns[name] = column
+        return Columns(columns, categories)
+
+
+def _micros(value):
+    if not value:
+        return _NAT
+    ts = utils._parse_datetime(value)
+    return calendar.timegm(ts.utctimetuple()) * 1000000 + ts.microsecond
+
+
+def _minor(value):
+    return utils._moneytointeger(value) if value is not None else 0
+
+
+def transaction_columns(data):
+    """Builds ``Columns`` with one row per leg of the transactions ``data``. Transactions
+    without legs are omitted."""
+    b = _Builder(
+        strings=(
+            "id",
+            "request_id",
+            "reference",
+            "leg_id",
+            "counterparty_id",
+            "description",
+        ),
+        categorical=("type", "state", "account_id", "currency"),
+        amounts=("amount",),
+        timestamps=("created_at", "updated_at", "completed_at"),
+    )
+    c = b.columns
+    for txdat in data:
+        # NOTE: the values shared by the legs are converted once
+        common = (
+            ("id", txdat.get("id")),
+            ("request_id", txdat.get("request_id")),
+            ("reference", txdat.get("reference")),
+            ("type", b.code("type", txdat.get("type"))),
+            ("state", b.code("state", txdat.get("state"))),
+            ("created_at", _micros(txdat.get("created_at"))),
+            ("updated_at", _micros(txdat.get("updated_at"))),
+            ("completed_at", _micros(txdat.get("completed_at"))),
+        )
+        for leg in txdat.get("legs") or ():
+            for name, value in common:
+                c[name].append(value)
+            c["leg_id"].append(leg.get("leg_id"))
+            c["account_id"].append(b.code("account_id", leg.get("account_id")))
+            c["counterparty_id"].append((leg.get("counterparty") or {}).get("id"))
+            c["amount"].append(_minor(leg.get("amount")))
+            c["currency"].append(b.code("currency", leg.get("currency")))
+            c["description"].append(leg.get("description"))
+    return b.build()
+
+
+def order_columns(data):
+    """Builds ``Columns`` with one row per order of the ``data``. Amounts which are absent
+    are set to 0."""
+    b = _Builder(
+        strings=("id", "merchant_order_ext_ref", "customer_id", "email"),
+        categorical=("type", "state", "capture_mode", "currency"),
+        amounts=("amount", "outstanding_amount", "refunded_amount"),
+        timestamps=("created_at", "updated_at", "completed_at"),
+    )
+    c = b.columns
+    for orddat in data:
+        amount = orddat.get("order_amount") or {}
+        c["id"].append(orddat.get("id"))
+        c["merchant_order_ext_ref"].append(orddat.get("merchant_order_ext_ref"))
+        c["customer_id"].append(orddat.get("customer_id"))
+        c["email"].append(orddat.get("email"))
+        c["type"].append(b.code("type", orddat.get("type")))
+        c["state"].append(b.code("state", orddat.get("state")))
+        c["capture_mode"].append(b.code("capture_mode", orddat.get("capture_mode")))
+        c["currency"].append(b.code("currency", amount.get("currency")))
+        c["amount"].append(amount.get("value") or 0)
+        c["outstanding_amount"].append(
+            (orddat.get("order_outstanding_amount") or {}).get("value") or 0
+        )
+        c["refunded_amount"].append(
+            (orddat.get("refunded_amount") or {}).get("value") or 0
+        )
+        c["created_at"].append(_micros(orddat.get("created_at")))
+        c["updated_at"].append(_micros(orddat.get("updated_at")))
+        c["completed_at"].append(_micros(orddat.get("completed_at")))
+    return b.build()
@@ -0,0 +1,378 @@
+"""Compact, read-only variants of the models, meant for holding large numbers of objects.
+
+The objects store the values of the decoded JSON payload in slots and have no instance
+``__dict__``. Timestamps, amounts and nested structures are kept as received and converted
+upon first access, then memoised. ``to_model()`` returns the regular model object, e.g. to
+call its methods.
+"""
+from decimal import Decimal
+import importlib
+import sys
+
+from . import utils
+
+__all__ = (
+    "CompactAccount",
+    "CompactCounterparty",
+    "CompactCounterpartyAccount",
+    "CompactCounterpartyExternalAccount",
+    "CompactTransaction",
+    "CompactOrder",
+)
+
+
+def _timestamp(v):
+    return utils._parse_datetime(v) if v else None
+
+
+def _legs(v):
+    legs = []
+    for leg in v or []:
+        if "amount" in leg and not isinstance(leg["amount"], Decimal):
+            leg = dict(leg, amount=Decimal(leg["amount"]))
+        legs.append(leg)
+    return legs
+
+
+def _money(amount):
+    if not amount or amount.get("value") is None:
+        return None
+    return utils._integertomoney(amount["value"])
+
+
+def _cptaccounts(v):
+    accounts = {}
+    for accdat in v or []:
+        Class = (
+            CompactCounterpartyAccount
+            if accdat["type"] == "revolut"
+            else CompactCounterpartyExternalAccount
+        )
+        acc = Class(**accdat)
+        accounts[acc.id] = acc
+    return accounts
+
+
+def _intern_values(d, keys):
+    for k in keys:
+        v = d.get(k)
+        if isinstance(v, str):
+            d[k] = sys.intern(v)
+
+
+def _lazy(name, convert, flag):
+    raw = "_" + name
+
+    def fget(self):
+        value = getattr(self, raw)
+        if not self._decoded & flag:
+            value = convert(value)
+            setattr(self, raw, value)
+            self._decoded |= flag
+        return value
+
+    return property(fget)
+
+
+class _CompactModel(object):
+    """Subclasses declare a slot for each of the ``_fields`` and an underscored one for
+    each of the ``_converters``, which holds the raw value until it gets converted."""
+
+    __slots__ = ("client", "_decoded", "_extra")
+    _model = None  # module and name of the regular model class
+    _fields = {}  # attributes with their defaults
+    _converters = {}  # attributes converted upon first access
+    _interned = ()  # attributes with few distinct values, shared among the objects
+
+    def __init_subclass__(cls, **kwargs):
+        super(_CompactModel, cls).__init_subclass__(**kwargs)
+        for i, (name, convert) in enumerate(cls._converters.items()):
+            setattr(cls, name, _lazy(name, convert, 1 << i))
+
+    def __init__(self, client=None, **data):
+        self.client = client
+        self._decoded = 0
+        self._extra = None
+        for k, v in data.items():
+            if k in self._converters:
+                k = "_" + k
+            elif k not in self._fields:
+                if self._extra is None:
+                    self._extra = {}
+                self._extra[k] = v
+                continue
+            elif k in self._interned and isinstance(v, str):
+                v = sys.intern(v)
+            setattr(self, k, v)
+
+    def __getattr__(self, name):
+        # NOTE: called only for the slots which haven't been set
+        if name in self._fields:
+            return self._fields[name]
+        if name.startswith("_") and name[1:] in self._converters:
+            return None
+        raise AttributeError(
+            "'{}' object has no attribute '{}'".format(type(self).__name__, name)
+        )
+
+    def __repr__(self):
+        return "<{} {}>".format(type(self).__name__, self.id)
+
+    def _payload(self):
+        data = dict(self._extra or {})
+        for name in self._fields:
+            try:
+                data[name] = object.__getattribute__(self, name)
+            except AttributeError:
+                pass
+        return data
+
+    def _model_class(self):
+        # NOTE: resolved lazily, as the models' modules import this one
+        module, name = self._model
+        return getattr(importlib.import_module("." + module, __package__), name)
+
+    def to_model(self):
+        data = self._payload()
+        converted = {}
+        for i, name in enumerate(self._converters):
+            value = getattr(self, "_" + name)
+            if self._decoded & 1 << i:
+                converted[name] = value
+            elif value is not None:
+                data[name] = value
+        obj = self._model_class()(client=self.client, **data)
+        for name, value in converted.items():
+            setattr(obj, name, value)
+        return obj
+
+
+class CompactAccount(_CompactModel):
+    __slots__ = (
+        "id",
+        "name",
+        "currency",
+        "state",
+        "public",
+        "_balance",
+        "_created_at",
+        "_updated_at",
+    )
+    _model = ("business", "Account")
+    _fields = {
+        "id": None,
+        "name": None,
+        "currency": None,
+        "state": None,
+        "public": False,
+    }
+    _converters = {
+        "balance": lambda v: Decimal(v or 0),
+        "created_at": _timestamp,
+        "updated_at": _timestamp,
+    }
+    _interned = ("currency", "state")
+
+    def __str__(self):
+        return "Id: {}, {:.2f} {:3s}".format(self.id, self.balance, self.currency)
+
+
+class CompactCounterparty(_CompactModel):
+    __slots__ = (
+        "id",
+        "name",
+        "email",
+        "phone",
+        "profile_type",
+        "country",
+        "state",
+        "_accounts",
+        "_created_at",
+        "_updated_at",
+    )
+    _model = ("business", "Counterparty")
+    _fields = {
+        "id": None,
+        "name": None,
+        "email": None,
+        "phone": None,
+        "profile_type": None,
+        "country": None,
+        "state": None,
+    }
+    _converters = {
+        "accounts": _cptaccounts,
+        "created_at": _timestamp,
+        "updated_at": _timestamp,
+    }
+    _interned = ("profile_type", "country", "state")
+
+    def to_model(self):
+        cpt = super(CompactCounterparty, self).to_model()
+        cpt.accounts = {
+            accid: acc.to_model() if isinstance(acc, _CompactModel) else acc
+            for accid, acc in cpt.accounts.items()
+        }
+        return cpt
+
+
+class CompactCounterpartyAccount(_CompactModel):
+    __slots__ = ("id", "name", "currency", "type")
+    _model = ("business", "CounterpartyAccount")
+    _fields = {"id": None, "name": None, "currency": None, "type": "revolut"}
+
+    def to_model(self):
+        return self._model_class()(**self._payload())
+
+
+class CompactCounterpartyExternalAccount(CompactCounterpartyAccount):
+    __slots__ = (
+        "account_no",
+        "iban",
+        "sort_code",
+        "routing_number",
+        "bic",
+        "email",
+        "bank_country",
+        "recipient_charges",
+        "bsb_code",
+    )
+    _model = ("business", "CounterpartyExternalAccount")
+    _fields = dict(
+        CompactCounterpartyAccount._fields,
+        type="external",
+        account_no=None,
+        iban=None,
+        sort_code=None,
+        routing_number=None,
+        bic=None,
+        email=None,
+        bank_country=None,
+        recipient_charges=None,
+        bsb_code=None,
+    )
+
+
+class CompactTransaction(_CompactModel):
+    __slots__ = (
+        "id",
+        "type",
+        "state",
+        "reason_code",
+        "request_id",
+        "reference",
+        "revertable",
+        "_legs",
+        "_created_at",
+        "_updated_at",
+        "_completed_at",
+    )
+    _model = ("business", "Transaction")
+    _fields = {
+        "id": None,
+        "type": None,
+        "state": None,
+        "reason_code": None,
+        "request_id": None,
+        "reference": None,
+        "revertable": False,
+    }
+    _converters = {
+        "legs": _legs,
+        "created_at": _timestamp,
+        "updated_at": _timestamp,
+        "completed_at": _timestamp,
+    }
+    _interned = ("type", "state", "reason_code")
+
+    def __init__(self, client=None, **data):
+        super(CompactTransaction, self).__init__(client, **data)
+        for leg in self._legs or ():
+            _intern_values(leg, ("account_id", "currency"))
+            if isinstance(leg.get("counterparty"), dict):
+                _intern_values(leg["counterparty"], ("id", "account_id", "type"))
+
+    @property
+    def direction(self):
+        if len(self.legs) == 2:
+            return "both"
+        return "out" if self.legs[0]["amount"] < 0 else "in"
+
+
+class CompactOrder(_CompactModel):
+    __slots__ = (
+        "id",
+        "public_id",
+        "merchant_order_ext_ref",
+        "type",
+        "state",
+        "capture_mode",
+        "order_amount",
+        "order_outstanding_amount",
+        "refunded_amount",
+        "description",
+        "metadata",
+        "customer_id",
+        "email",
+        "phone",
+        "payments",
+        "related",
+        "shipping_address",
+        "checkout_url",
+        "_created_at",
+        "_updated_at",
+        "_completed_at",
+    )
+    _model = ("merchant", "Order")
+    _fields = {
+        "id": "",
+        "public_id": "",
+        "merchant_order_ext_ref": "",
+        "type": "",
+        "state": "",
+        "capture_mode": "",
+        "order_amount": None,
+        "order_outstanding_amount": None,
+        "refunded_amount": None,
+        "description": None,
+        "metadata": "",
+        "customer_id": None,
+        "email": None,
+        "phone": "",
+        "payments": None,
+        "related": None,
+        "shipping_address": None,
+        "checkout_url": "",
+    }
+    _converters = {
+        "created_at": _timestamp,
+        "updated_at": _timestamp,
+        "completed_at": lambda v: utils._parse_datetime(v) if v else "",
+    }
+    _interned = ("type", "state", "capture_mode")
+
+    def __init__(self, client=None, **data):
+        super(CompactOrder, self).__init__(client, **data)
+        for amount in (
+            self.order_amount,
+            self.order_outstanding_amount,
+            self.refunded_amount,
+        ):
+            if isinstance(amount, dict):
+                _intern_values(amount, ("currency",))
+
+    @property
+    def currency(self):
+        return self.order_amount.get("currency", None)
+
+    @property
+    def value(self):
+        return _money(self.order_amount)
+
+    @property
+    def outstanding_value(self):
+        return _money(self.order_outstanding_amount)
+
+    @property
+    def refunded_value(self):
+        return _money(self.refunded_amount)
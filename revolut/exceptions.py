@@ -3,8 +3,11 @@ class RevolutError(Exception):
 
 
 class RevolutHttpError(RevolutError):
-    def __init__(self, status_code, message):
+    retry_after = None  # seconds, as requested by the server
+
+    def __init__(self, status_code, message, retry_after=None):
         self.status_code = status_code
+        self.retry_after = retry_after
         super(RevolutHttpError, self).__init__(message)
 
 
@@ -118,3 +121,21 @@ class CurrencyMismatch(ValueError, RevolutError):
 
 class DestinationNotFound(ValueError, RevolutError):
     pass
+
+
+class WebhookError(RevolutError):
+    """A webhook request that cannot be accepted, e.g. with malformed payload."""
+
+    pass
+
+
+class InvalidSignature(WebhookError):
+    """The signature of a webhook request is missing, invalid or too old."""
+
+    pass
+
+
+class WebhookOverloaded(RevolutError):
+    """The webhook events are not processed as fast as they arrive."""
+
+    pass
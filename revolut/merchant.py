@@ -1,10 +1,18 @@
+from concurrent import futures
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date, datetime
-import dateutil.parser
 from decimal import Decimal
-import requests
-from typing import Optional, Union
+from typing import Iterable, Iterator, Optional, Union
 
-from . import base, utils
+from . import base, columns, utils
+from .codec import JSONCodec
+from .compact import CompactOrder
+from .metrics import Metrics
+from .ratelimit import RateLimiter
+from .retry import RetryPolicy
+from .transport import Transport
+
+ORDERS_PAGE_SIZE = 1000  # the maximum accepted by the API
 
 
 class Order(utils._UpdateFromKwargsMixin):
@@ -42,13 +50,13 @@ class Order(utils._UpdateFromKwargsMixin):
     def _update(self, **kwargs):
         super(Order, self)._update(**kwargs)
         self.created_at = (
-            dateutil.parser.parse(self.created_at) if self.created_at else None
+            utils._parse_datetime(self.created_at) if self.created_at else None
         )
         self.updated_at = (
-            dateutil.parser.parse(self.updated_at) if self.updated_at else None
+            utils._parse_datetime(self.updated_at) if self.updated_at else None
         )
         self.completed_at = (
-            dateutil.parser.parse(self.completed_at) if self.completed_at else ""
+            utils._parse_datetime(self.completed_at) if self.completed_at else ""
         )
         self.shipping_address = kwargs.get("shipping_address", {})
 
@@ -99,6 +107,10 @@ class Order(utils._UpdateFromKwargsMixin):
         return utils._integertomoney(self.refunded_amount["value"])
 
     def save(self) -> None:
+        respdata = self.client._patch(f"orders/{self.id}", self._save_data())
+        self._update(**respdata)
+
+    def _save_data(self) -> dict:
         data = {}
         for k in (
             "merchant_order_ext_ref",
@@ -113,8 +125,25 @@ class Order(utils._UpdateFromKwargsMixin):
             if v is not None and v != {}:
                 data[k] = v
         data["amount"] = self.order_amount["value"]
-        respdata = self.client._patch(f"orders/{self.id}", data)
-        self._update(**respdata)
+        return data
+
+
+class OrderResult(object):
+    """The outcome of one of the items of ``MerchantClient.create_orders()`` or
+    ``get_orders()``: either the resulting ``order`` or the ``error`` raised."""
+
+    order = None
+    error = None
+
+    def __init__(self, item):
+        self.item = item
+
+    def __repr__(self):
+        return "<OrderResult {} {}>".format(self.item, self.order or repr(self.error))
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
 
 
 class MerchantClient(base.BaseClient):
@@ -126,6 +155,11 @@ class MerchantClient(base.BaseClient):
         merchant_key: str,
         sandbox: bool = False,
         timeout: Optional[Union[int, float]] = None,
+        retry: Optional[RetryPolicy] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        transport: Optional[Transport] = None,
+        codec: Optional[JSONCodec] = None,
+        metrics: Optional[Metrics] = None,
     ):
         """
         Client to the Merchant API. The authorization is based upon the secret key
@@ -133,6 +167,12 @@ class MerchantClient(base.BaseClient):
 
         As there's no simple distinction between production and sandbox, the environment
         is determined upon the state of the ``sandbox`` flag.
+
+        Failed requests are repeated according to the ``retry`` policy and paced by the
+        ``rate_limiter``, if given. The HTTP connections are taken from the ``transport``,
+        by default the one shared within the process. The request and response bodies go
+        through the ``codec``, by default the fastest one available. The requests are
+        recorded in the ``metrics``, if given.
         """
         self.sandbox = sandbox
         if sandbox:
@@ -141,9 +181,15 @@ class MerchantClient(base.BaseClient):
             self.base_url = "https://merchant.revolut.com/api/1.0/"  # pragma: nocover
         self.merchant_key = merchant_key
         self.timeout = timeout
-        self._requester = requests.Session()
-        self._requester.headers.update(
-            {"Authorization": "Bearer {}".format(self.merchant_key)}
+        self.retry = retry
+        self.rate_limiter = rate_limiter
+        self.metrics = metrics
+        self._set_transport(transport)
+        self._set_codec(codec)
+
+    def _do_request(self, method, path, data=None, headers=None):
+        return super(MerchantClient, self)._do_request(
+            method, path, data, {"Authorization": "Bearer {}".format(self.merchant_key)}
         )
 
     def create_order(
@@ -155,18 +201,21 @@ class MerchantClient(base.BaseClient):
         **WARNING:** The amount of the order has to be specified in regular currency units, even
         though Revolut uses integer denomination of 1/100th of the unit.
         """
-        amount = utils._moneytointeger(amount)
         data = self._post(
-            "orders",
-            data={
-                "amount": amount,
-                "currency": currency,
-                "merchant_order_ext_ref": merchant_reference,
-            }
-            or None,
+            "orders", data=self._order_data(amount, currency, merchant_reference)
         )
         return Order(client=self, **data)
 
+    @staticmethod
+    def _order_data(
+        amount: Union[Decimal, int], currency: str, merchant_reference: str
+    ) -> dict:
+        return {
+            "amount": utils._moneytointeger(amount),
+            "currency": currency,
+            "merchant_order_ext_ref": merchant_reference,
+        }
+
     def get_order(self, order_id: str) -> Order:
         """
         Retrieves ``Order`` with the given ID.
@@ -174,30 +223,124 @@ class MerchantClient(base.BaseClient):
         data = self._get(f"orders/{order_id}")
         return Order(client=self, **data)
 
+    def create_orders(self, orders: Iterable[tuple], workers: int = 8) -> [OrderResult]:
+        """
+        Creates the ``orders``, each being a tuple of ``create_order()`` arguments:
+        ``(amount, currency, merchant_reference)``. The requests are made by a pool of at
+        most ``workers`` threads, which should not exceed the connection pool size of the
+        transport.
+
+        Returns a list of ``OrderResult`` objects in the order of ``orders``. A failure of
+        any item is reported in its result instead of being raised. Creating an order is
+        not idempotent, so before repeating a failed one check whether it hasn't been
+        created after all, e.g. by its ``merchant_reference``.
+        """
+        return self._map_orders(lambda item: self.create_order(*item), orders, workers)
+
+    def get_orders(self, order_ids: Iterable[str], workers: int = 8) -> [OrderResult]:
+        """
+        Retrieves the orders with the given IDs, like ``create_orders()`` does create them.
+        """
+        return self._map_orders(self.get_order, order_ids, workers)
+
+    @staticmethod
+    def _map_orders(func, items, workers):
+        results, pending = [], {}
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for item in items:
+                result = OrderResult(item)
+                results.append(result)
+                pending[pool.submit(func, item)] = result
+            for fut in futures.as_completed(pending):
+                result = pending[fut]
+                try:
+                    result.order = fut.result()
+                except Exception as e:
+                    result.error = e
+        return results
+
     def orders(
         self,
         from_date: Optional[Union[date, datetime]] = None,
         to_date: Optional[Union[date, datetime]] = None,
+        compact: bool = False,
     ) -> [Order]:
         """
         Retrieves a list of ``Order``s, optionally within the given time span.
+        With ``compact`` set, the more lightweight ``CompactOrder`` objects are returned.
         """
         orders = []
+        data = self._get(path="orders", data=self._orders_query(from_date, to_date))
+        Class = CompactOrder if compact else Order
+        with self._timing("GET", "orders", "models"):
+            for txdat in data:
+                txn = Class(client=self, **txdat)
+                orders.append(txn)
+        return orders
+
+    def iter_orders(
+        self,
+        from_date: Optional[Union[date, datetime]] = None,
+        to_date: Optional[Union[date, datetime]] = None,
+        limit: int = ORDERS_PAGE_SIZE,
+        compact: bool = False,
+        seen_ids: Iterable[str] = (),
+    ) -> Iterator[Order]:
+        """
+        Yields ``Order``s (``CompactOrder``s if ``compact`` is set) from the newest to the
+        oldest, fetching them page by page with at most ``limit`` items each. Only a single
+        page is held in memory.
+
+        To resume an interrupted iteration, pass the ``created_at`` of the last order seen
+        as ``to_date`` and the IDs of the orders already seen with that very timestamp as
+        ``seen_ids``.
+        """
+        reqdata = self._orders_query(from_date, to_date)
+        reqdata["limit"] = limit
+        Class = CompactOrder if compact else Order
+        for orddat in self._iter_orders_data(reqdata, seen_ids):
+            yield Class(client=self, **orddat)
+
+    def _iter_orders_data(self, reqdata, seen_ids=()):
+        return self._iter_pages("orders", reqdata, "limit", "to_created_date", seen_ids)
+
+    def order_columns(
+        self,
+        from_date: Optional[Union[date, datetime]] = None,
+        to_date: Optional[Union[date, datetime]] = None,
+        limit: int = ORDERS_PAGE_SIZE,
+    ) -> columns.Columns:
+        """
+        Retrieves orders like ``iter_orders()`` and returns them as ``columns.Columns``,
+        without creating ``Order`` objects. Use ``.to_dataframe()`` of the result to get
+        a ``pandas.DataFrame``.
+        """
+        reqdata = self._orders_query(from_date, to_date)
+        reqdata["limit"] = limit
+        return columns.order_columns(self._iter_orders_data(reqdata))
+
+    @staticmethod
+    def _orders_query(
+        from_date: Optional[Union[date, datetime]] = None,
+        to_date: Optional[Union[date, datetime]] = None,
+    ) -> dict:
         reqdata = {}
         if from_date:
-            reqdata["from_created_date"] = utils._datetime(from_date)
+            reqdata["from_created_date"] = utils._datetime(
+                utils._to_datetime(from_date)
+            )
         if to_date:
-            reqdata["to_created_date"] = utils._datetime(to_date)
-        data = self._get(path="orders", data=reqdata)
-        for txdat in data:
-            txn = Order(client=self, **txdat)
-            orders.append(txn)
-        return orders
+            reqdata["to_created_date"] = utils._datetime(utils._to_datetime(to_date))
+        return reqdata
 
     def webhook(self, url, events):
+        _ = self._post(f"webhooks", data=self._webhook_data(url, events))
+
+    @staticmethod
+    def _webhook_data(url, events) -> dict:
         reqdata = {}
         if url:
             reqdata["url"] = url
         if events:
             reqdata["events"] = events
-        _ = self._post(f"webhooks", data=reqdata)
+        return reqdata
@@ -0,0 +1,274 @@
+"""Per-endpoint request metrics of the clients.
+
+The requests are grouped by method and endpoint template, i.e. the path with the IDs
+replaced by ``{id}``, like ``GET accounts/{id}/bank-details``. For each group the
+``Metrics`` count the calls, retries, rate limiter waits, response statuses and exceptions,
+and keep histograms of the time spent in each phase of a call: ``network`` (the HTTP
+exchange), ``decode`` (JSON decoding of the response) and ``models`` (construction of the
+objects from the decoded data).
+"""
+from bisect import bisect_left
+import contextlib
+import functools
+import math
+import re
+import threading
+import time
+from typing import Optional
+
+__all__ = ("Metrics", "endpoint_template")
+
+DEFAULT_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+PHASES = ("network", "decode", "models")
+
+# NOTE: the segments following these are IDs, whatever they look like (e.g. a request_id)
+_COLLECTIONS = frozenset(
+    (
+        "accounts",
+        "counterparty",
+        "counterparties",
+        "transaction",
+        "transactions",
+        "orders",
+        "customers",
+        "webhooks",
+    )
+)
+_ID = re.compile(r"[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-|\d+$")
+
+
+@functools.lru_cache(maxsize=4096)
+def endpoint_template(path: str) -> str:
+    """Returns the ``path`` without the query and with the IDs replaced by ``{id}``."""
+    segments = path.split("?", 1)[0].strip("/").split("/")
+    for i in range(1, len(segments)):
+        if segments[i - 1] in _COLLECTIONS or _ID.match(segments[i]):
+            segments[i] = "{id}"
+    return "/".join(segments)
+
+
+class _Histogram(object):
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def snapshot(self):
+        cumulative, buckets = 0, {}
+        for le, count in zip(self.buckets + (math.inf,), self.counts):
+            cumulative += count
+            buckets[le] = cumulative
+        return {"count": self.count, "sum": self.sum, "buckets": buckets}
+
+
+class _EndpointMetrics(object):
+    def __init__(self, method, endpoint, buckets):
+        self.method = method
+        self.endpoint = endpoint
+        self.calls = 0
+        self.retries = 0
+        self.throttled = 0
+        self.throttle_seconds = 0.0
+        self.statuses = {}
+        self.exceptions = {}
+        self.phases = {phase: _Histogram(buckets) for phase in PHASES}
+
+    def snapshot(self):
+        return {
+            "method": self.method,
+            "endpoint": self.endpoint,
+            "calls": self.calls,
+            "retries": self.retries,
+            "throttled": self.throttled,
+            "throttle_seconds": self.throttle_seconds,
+            "statuses": dict(self.statuses),
+            "exceptions": dict(self.exceptions),
+            "phases": {
+                phase: hist.snapshot()
+                for phase, hist in self.phases.items()
+                if hist.count
+            },
+        }
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metrics(object):
+    """Collects the metrics of the requests made by the clients it's passed to as the
+    ``metrics`` argument. May be shared by many clients and threads.
+
+    ``buckets`` are the upper bounds of the latency histograms, in seconds.
+    """
+
+    def __init__(self, buckets: Optional[tuple] = None, clock=time.perf_counter):
+        self.buckets = tuple(sorted(buckets or DEFAULT_BUCKETS))
+        self.clock = clock
+        self._endpoints = {}
+        self._lock = threading.Lock()
+
+    def _get(self, method, path):
+        endpoint = endpoint_template(path)
+        try:
+            return self._endpoints[(method, endpoint)]
+        except KeyError:
+            with self._lock:
+                return self._endpoints.setdefault(
+                    (method, endpoint),
+                    _EndpointMetrics(method, endpoint, self.buckets),
+                )
+
+    def call(self, method, path):
+        ep = self._get(method, path)
+        with self._lock:
+            ep.calls += 1
+
+    def retry(self, method, path):
+        ep = self._get(method, path)
+        with self._lock:
+            ep.retries += 1
+
+    def throttle(self, method, path, waited):
+        ep = self._get(method, path)
+        with self._lock:
+            ep.throttled += 1
+            ep.throttle_seconds += waited
+
+    def status(self, method, path, status_code):
+        ep = self._get(method, path)
+        with self._lock:
+            ep.statuses[status_code] = ep.statuses.get(status_code, 0) + 1
+
+    def exception(self, method, path, exc):
+        ep, name = self._get(method, path), type(exc).__name__
+        with self._lock:
+            ep.exceptions[name] = ep.exceptions.get(name, 0) + 1
+
+    def observe(self, method, path, phase, seconds):
+        ep = self._get(method, path)
+        with self._lock:
+            ep.phases[phase].observe(seconds)
+
+    @contextlib.contextmanager
+    def timing(self, method, path, phase):
+        """Observes the time spent within the context as the ``phase`` of a call."""
+        started = self.clock()
+        try:
+            yield
+        finally:
+            self.observe(method, path, phase, self.clock() - started)
+
+    def snapshot(self) -> dict:
+        """Returns the metrics keyed by ``"<method> <endpoint template>"``."""
+        with self._lock:
+            return {
+                "{} {}".format(method, endpoint): ep.snapshot()
+                for (method, endpoint), ep in sorted(self._endpoints.items())
+            }
+
+    def reset(self):
+        with self._lock:
+            self._endpoints = {}
+
+    def prometheus(self, prefix: str = "revolut_client") -> str:
+        """Returns the metrics in the Prometheus text exposition format."""
+        snapshot = self.snapshot().values()
+        lines = []
+
+        def family(name, kind, doc, samples):
+            lines.append("# HELP {}_{} {}".format(prefix, name, doc))
+            lines.append("# TYPE {}_{} {}".format(prefix, name, kind))
+            for suffix, labels, value in samples:
+                lines.append(
+                    "{}_{}{}{{{}}} {}".format(
+                        prefix,
+                        name,
+                        suffix,
+                        ",".join('{}="{}"'.format(k, _label(v)) for k, v in labels),
+                        _number(value),
+                    )
+                )
+
+        def labels(ep, *extra):
+            return (("method", ep["method"]), ("endpoint", ep["endpoint"])) + extra
+
+        for name, key, doc in (
+            ("calls_total", "calls", "Calls made, not counting retries."),
+            ("retries_total", "retries", "Calls repeated after a failure."),
+            ("throttled_total", "throttled", "Requests delayed by the rate limiter."),
+            (
+                "throttle_seconds_total",
+                "throttle_seconds",
+                "Time spent waiting for the rate limiter.",
+            ),
+        ):
+            family(name, "counter", doc, [("", labels(ep), ep[key]) for ep in snapshot])
+        family(
+            "responses_total",
+            "counter",
+            "Responses received, by HTTP status.",
+            [
+                ("", labels(ep, ("status", status)), count)
+                for ep in snapshot
+                for status, count in sorted(ep["statuses"].items())
+            ],
+        )
+        family(
+            "exceptions_total",
+            "counter",
+            "Failed requests, by exception class.",
+            [
+                ("", labels(ep, ("exception", exc)), count)
+                for ep in snapshot
+                for exc, count in sorted(ep["exceptions"].items())
+            ],
+        )
+        samples = []
+        for ep in snapshot:
+            for phase, hist in ep["phases"].items():
+                for le, count in hist["buckets"].items():
+                    samples.append(
+                        (
+                            "_bucket",
+                            labels(ep, ("phase", phase), ("le", _number(le))),
+                            count,
+                        )
+                    )
+                samples.append(("_sum", labels(ep, ("phase", phase)), hist["sum"]))
+                samples.append(("_count", labels(ep, ("phase", phase)), hist["count"]))
+        family(
+            "phase_seconds",
+            "histogram",
+            "Time spent in the network, decode and models phases of the calls.",
+            samples,
+        )
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,356 @@
+from concurrent import futures
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from decimal import Decimal
+import logging
+import sqlite3
+from typing import Optional
+import uuid
+
+from . import exceptions, utils
+
+__all__ = ("PaymentOutbox", "OutboxPayment")
+
+_log = logging.getLogger(__name__)
+
+PENDING = "pending"  # journaled, to be sent
+SENDING = "sending"  # sent or being sent, the outcome unknown
+SENT = "sent"  # the transaction has been made
+FAILED = "failed"  # rejected, no transaction made or the transaction failed
+
+# NOTE: the states of transactions which have been made but moved no money
+_FAILED_TRANSACTION_STATES = frozenset(("declined", "failed", "reverted"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS payments (
+    request_id TEXT PRIMARY KEY,
+    account_id TEXT NOT NULL,
+    dest TEXT NOT NULL,
+    amount TEXT NOT NULL,
+    currency TEXT NOT NULL,
+    reference TEXT,
+    state TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    transaction_id TEXT,
+    transaction_state TEXT,
+    error TEXT,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS payments_state ON payments (state, created_at);
+"""
+_COLUMNS = (
+    "request_id",
+    "account_id",
+    "dest",
+    "amount",
+    "currency",
+    "reference",
+    "state",
+    "attempts",
+    "transaction_id",
+    "transaction_state",
+    "error",
+    "created_at",
+    "updated_at",
+)
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _outcome(exc):
+    """Returns the state of a payment whose request failed with ``exc``."""
+    if isinstance(exc, exceptions.RevolutHttpError):
+        if exc.status_code in (401, 403, 429):
+            return PENDING  # NOTE: certainly not made, may succeed later
+        if 400 <= exc.status_code < 500 and exc.status_code not in (408, 409):
+            return FAILED
+        return SENDING
+    if isinstance(exc, (exceptions.RequestDataError, exceptions.TransactionError)):
+        return FAILED
+    # NOTE: e.g. a timeout or an undecodable response, the request might have got through
+    return SENDING
+
+
+class OutboxPayment(utils._UpdateFromKwargsMixin):
+    """A payment recorded in the ``PaymentOutbox``."""
+
+    request_id: str = ""
+    account_id: str = ""
+    dest: str = ""
+    amount: Optional[Decimal] = None
+    currency: str = ""
+    reference: Optional[str] = None
+    state: str = PENDING
+    attempts: int = 0
+    transaction_id: Optional[str] = None
+    transaction_state: Optional[str] = None
+    error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+    def __init__(self, **kwargs):
+        self._update(**kwargs)
+        self.amount = Decimal(self.amount)
+        self.created_at = datetime.fromisoformat(self.created_at)
+        self.updated_at = datetime.fromisoformat(self.updated_at)
+
+    def __repr__(self):
+        return "<OutboxPayment {} {}>".format(self.request_id, self.state)
+
+
+class PaymentOutbox(object):
+    """Journals payments in a local SQLite database before they are sent by a
+    ``BusinessClient``, so that none is lost or made twice if the process dies.
+
+    Each payment is committed with its ``request_id`` by ``add()`` and only then sent by
+    ``run()``, on a pool of ``workers`` threads in batches of ``batch_size``. Before the
+    requests of a batch are made, its payments are marked as being sent. A payment which
+    ends up in this state, because the process died or the outcome of the request is
+    unknown (e.g. after a timeout), gets reconciled at the beginning of the next ``run()``:
+    its transaction is looked up by the ``request_id`` and, if not found, the payment is
+    sent again. As Revolut makes at most one transaction per ``request_id``, payments are
+    submitted at least once and made exactly once.
+
+    Payments rejected by the API or before sending (e.g. for an unknown destination) are
+    marked as ``failed`` and not retried, as are those whose transaction turns out to be
+    ``declined``, ``failed`` or ``reverted``; the latter keep the transaction's ID and state
+    and aren't counted as made. Those which were not made because of authorization or rate
+    limits stay ``pending``.
+    """
+
+    workers: int = 8
+    batch_size: int = 100
+
+    def __init__(
+        self,
+        client,
+        path,
+        workers: Optional[int] = None,
+        batch_size: Optional[int] = None,
+    ):
+        self.client = client
+        self.workers = workers or self.workers
+        self.batch_size = batch_size or self.batch_size
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA journal_mode = WAL")
+        self.db.execute("PRAGMA synchronous = FULL")
+        self.db.executescript(_SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def add(
+        self, account, dest, amount, currency, request_id=None, reference=None
+    ) -> str:
+        """Journals a payment, with arguments like ``Account.send()``. Returns the
+        ``request_id``, generated unless given. Adding a ``request_id`` again is ignored."""
+        (request_id,) = self.add_many(
+            [(account, dest, amount, currency, request_id, reference)]
+        )
+        return request_id
+
+    def add_many(self, payments) -> [str]:
+        """Journals the ``payments``, each being a tuple of ``add()`` arguments, in a single
+        transaction. Returns the list of their request IDs."""
+        now, rows = _now(), []
+        for payment in payments:
+            account, dest, amount, currency = payment[:4]
+            request_id = (payment[4] if len(payment) > 4 else None) or str(uuid.uuid4())
+            reference = payment[5] if len(payment) > 5 else None
+            rows.append(
+                (
+                    request_id,
+                    utils._obj2id(account),
+                    str(utils._obj2id(dest)),
+                    str(Decimal(amount)),
+                    currency,
+                    reference,
+                    PENDING,
+                    now,
+                    now,
+                )
+            )
+        with self.db:
+            self.db.executemany(
+                "INSERT OR IGNORE INTO payments (request_id, account_id, dest, amount, "
+                "currency, reference, state, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+        return [row[0] for row in rows]
+
+    def payments(self, state=None) -> [OutboxPayment]:
+        """Returns the journaled payments, oldest first, optionally of the given ``state``:
+        ``pending``, ``sending``, ``sent`` or ``failed``."""
+        query, params = "SELECT {} FROM payments".format(", ".join(_COLUMNS)), ()
+        if state:
+            query, params = query + " WHERE state = ?", (state,)
+        return [
+            OutboxPayment(**dict(zip(_COLUMNS, row)))
+            for row in self.db.execute(query + " ORDER BY created_at, rowid", params)
+        ]
+
+    def counts(self) -> dict:
+        """Returns the numbers of payments in each state."""
+        return dict(
+            self.db.execute("SELECT state, COUNT(*) FROM payments GROUP BY state")
+        )
+
+    def run(self) -> int:
+        """Reconciles the payments of unknown outcome, then sends all pending ones.
+        Returns the number of payments made."""
+        _ = self.client.accounts, self.client.counterparties  # NOTE: load them once
+        made = 0
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            made += self._reconcile(pool)
+            # NOTE: the payments put back to pending in the course of this run are left
+            # for the next one, as are those added meanwhile
+            started = _now()
+            while True:
+                batch = self._claim(started)
+                if not batch:
+                    break
+                made += self._send(pool, batch)
+        return made
+
+    def reconcile(self) -> int:
+        """Looks up the transactions of payments of unknown outcome. Those found are marked
+        as sent, or failed along with their transaction, the others as pending. Returns the
+        number of payments found to be made."""
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            return self._reconcile(pool)
+
+    def _reconcile(self, pool):
+        request_ids = [
+            rid
+            for (rid,) in self.db.execute(
+                "SELECT request_id FROM payments WHERE state = ?", (SENDING,)
+            )
+        ]
+        jobs = {
+            pool.submit(self.client.transaction_by_request_id, rid): rid
+            for rid in request_ids
+        }
+        made = 0
+        with self.db:
+            for fut in futures.as_completed(jobs):
+                rid = jobs[fut]
+                try:
+                    txn = fut.result()
+                except exceptions.NotFound:
+                    self._set_state(rid, PENDING)
+                    continue
+                except Exception as e:
+                    _log.warning("Cannot reconcile payment {}: {}".format(rid, e))
+                    continue
+                made += self._made(rid, txn)
+        if request_ids:
+            _log.info(
+                "Reconciled {:d} payments, {:d} found made".format(
+                    len(request_ids), made
+                )
+            )
+        return made
+
+    def _claim(self, before):
+        """Marks a batch of payments pending since ``before`` as being sent and returns
+        them."""
+        with self.db:
+            batch = [
+                OutboxPayment(**dict(zip(_COLUMNS, row)))
+                for row in self.db.execute(
+                    "SELECT {} FROM payments WHERE state = ? AND updated_at < ? "
+                    "ORDER BY created_at, rowid LIMIT ?".format(", ".join(_COLUMNS)),
+                    (PENDING, before, self.batch_size),
+                )
+            ]
+            self.db.executemany(
+                "UPDATE payments SET state = ?, attempts = attempts + 1, updated_at = ? "
+                "WHERE request_id = ?",
+                [(SENDING, _now(), payment.request_id) for payment in batch],
+            )
+        return batch
+
+    def _send(self, pool, batch):
+        jobs = {}
+        made = 0
+        # NOTE: the results are committed once per batch; if they get lost, the payments
+        # are reconciled by the next run
+        with self.db:
+            for payment in batch:
+                try:
+                    account, path, reqdata = self._prepare(payment)
+                except Exception as e:
+                    # NOTE: raised before sending, so certainly not made
+                    _log.warning(
+                        "Payment {} failed ({}): {!r}".format(
+                            payment.request_id, FAILED, e
+                        )
+                    )
+                    self._set_state(payment.request_id, FAILED, error=repr(e))
+                    continue
+                jobs[pool.submit(account._send, path, reqdata, False)] = payment
+            for fut in futures.as_completed(jobs):
+                payment = jobs[fut]
+                try:
+                    txn = fut.result()
+                except Exception as e:
+                    state = _outcome(e)
+                    _log.warning(
+                        "Payment {} failed ({}): {!r}".format(
+                            payment.request_id, state, e
+                        )
+                    )
+                    self._set_state(payment.request_id, state, error=repr(e))
+                    continue
+                made += self._made(payment.request_id, txn)
+        return made
+
+    def _made(self, request_id, transaction):
+        """Records the transaction of a payment. Returns 1 if it has been made, 0 if it
+        has failed."""
+        if transaction.state in _FAILED_TRANSACTION_STATES:
+            _log.warning(
+                "Payment {} failed: transaction {} is {}".format(
+                    request_id, transaction.id, transaction.state
+                )
+            )
+            self._set_state(request_id, FAILED, transaction=transaction)
+            return 0
+        self._set_state(request_id, SENT, transaction=transaction)
+        return 1
+
+    def _prepare(self, payment):
+        """Resolves the source account and destination of the payment. Returns the account
+        along with the endpoint path and request data."""
+        try:
+            account = self.client.accounts[payment.account_id]
+        except KeyError:
+            raise exceptions.DestinationNotFound(
+                "Unknown source account {}".format(payment.account_id)
+            )
+        path, reqdata = account._payment(
+            payment.dest,
+            payment.amount,
+            payment.currency,
+            payment.request_id,
+            payment.reference,
+        )
+        return account, path, reqdata
+
+    def _set_state(self, request_id, state, transaction=None, error=None):
+        self.db.execute(
+            "UPDATE payments SET state = ?, transaction_id = ?, transaction_state = ?, "
+            "error = ?, updated_at = ? WHERE request_id = ?",
+            (
+                state,
+                transaction.id if transaction is not None else None,
+                transaction.state if transaction is not None else None,
+                error,
+                _now(),
+                request_id,
+            ),
+        )
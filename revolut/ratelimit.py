@@ -0,0 +1,137 @@
+"""Client-side pacing of requests with token buckets.
+
+A ``RateLimiter`` assigns each request to an endpoint class (``read``, ``write`` or
+``payment``) and takes a token from the bucket configured for that class, waiting until one
+becomes available. ``TokenBucket`` is shared among threads of one process, ``FileTokenBucket``
+keeps its state in a locked file and is shared by all processes on the host using the same
+path (it relies on ``fcntl`` and therefore works on POSIX systems only).
+"""
+try:
+    import fcntl
+except ImportError:  # pragma: nocover
+    fcntl = None
+import os
+import struct
+import threading
+import time
+from typing import Optional
+
+__all__ = ("RateLimiter", "TokenBucket", "FileTokenBucket")
+
+
+class TokenBucket(object):
+    """Allows ``rate`` requests per second on average and bursts of up to ``burst``, by
+    default ``rate`` but at least one request."""
+
+    def __init__(
+        self, rate: float, burst: Optional[float] = None, clock=time.monotonic
+    ):
+        if rate <= 0:
+            raise ValueError("Rate must be positive, got {}".format(rate))
+        self.rate = float(rate)
+        self.burst = float(burst) if burst else max(1.0, self.rate)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._tokens = self.burst
+        self._updated = clock()
+
+    def _take(self, tokens, available, updated, now):
+        if tokens > self.burst:
+            raise ValueError(
+                "Cannot take {} tokens from a bucket of {}".format(tokens, self.burst)
+            )
+        available = min(self.burst, available + (now - updated) * self.rate)
+        if available >= tokens:
+            return 0.0, available - tokens
+        return (tokens - available) / self.rate, available
+
+    def reserve(self, tokens: float = 1) -> float:
+        """Takes ``tokens`` if available and returns 0. Otherwise takes nothing and returns
+        the number of seconds to wait before trying again."""
+        with self._lock:
+            now = self._clock()
+            delay, self._tokens = self._take(tokens, self._tokens, self._updated, now)
+            self._updated = now
+            return delay
+
+    def acquire(self, tokens: float = 1) -> float:
+        """Blocks until ``tokens`` are taken. Returns the total time spent waiting."""
+        waited = 0.0
+        while True:
+            delay = self.reserve(tokens)
+            if not delay:
+                return waited
+            time.sleep(delay)
+            waited += delay
+
+
+class FileTokenBucket(TokenBucket):
+    """A ``TokenBucket`` with state stored in the file at ``path``, shared by processes."""
+
+    _format = "dd"  # available tokens, time of update
+
+    def __init__(self, path, rate: float, burst: Optional[float] = None):
+        if fcntl is None:  # pragma: nocover
+            raise NotImplementedError("FileTokenBucket requires fcntl (POSIX systems)")
+        super(FileTokenBucket, self).__init__(rate, burst, clock=time.time)
+        self.path = path
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        self._file = os.fdopen(fd, "r+b", buffering=0)
+
+    def close(self):
+        self._file.close()
+
+    def reserve(self, tokens: float = 1) -> float:
+        with self._lock:
+            fcntl.flock(self._file, fcntl.LOCK_EX)
+            try:
+                now = self._clock()
+                self._file.seek(0)
+                state = self._file.read(struct.calcsize(self._format))
+                if len(state) == struct.calcsize(self._format):
+                    available, updated = struct.unpack(self._format, state)
+                else:
+                    available, updated = self.burst, now
+                delay, available = self._take(tokens, available, updated, now)
+                self._file.seek(0)
+                self._file.write(struct.pack(self._format, available, now))
+                return delay
+            finally:
+                fcntl.flock(self._file, fcntl.LOCK_UN)
+
+
+class RateLimiter(object):
+    """Paces requests using a separate bucket for each endpoint class.
+
+    The ``payment`` class covers POSTs to ``pay`` and ``transfer``, ``write`` all other
+    non-GET requests and ``read`` the rest. Requests of a class without a bucket are not
+    limited, unless the ``default`` bucket is given.
+    """
+
+    payment_paths = ("pay", "transfer")
+
+    def __init__(self, read=None, write=None, payment=None, default=None):
+        self.buckets = {"read": read, "write": write, "payment": payment}
+        self.default = default
+
+    def classify(self, method, path):
+        method = method.upper()
+        if method in ("GET", "HEAD", "OPTIONS"):
+            return "read"
+        if method == "POST" and path.split("?")[0] in self.payment_paths:
+            return "payment"
+        return "write"
+
+    def bucket(self, method, path):
+        return self.buckets.get(self.classify(method, path)) or self.default
+
+    def reserve(self, method, path) -> float:
+        """Non-blocking variant of ``acquire()``, suitable for event loops. Returns 0 if
+        the request may proceed or the number of seconds to wait before trying again."""
+        bucket = self.bucket(method, path)
+        return bucket.reserve() if bucket is not None else 0.0
+
+    def acquire(self, method, path) -> float:
+        """Blocks until the request may proceed. Returns the time spent waiting."""
+        bucket = self.bucket(method, path)
+        return bucket.acquire() if bucket is not None else 0.0
@@ -0,0 +1,98 @@
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+import random
+import requests
+from typing import Optional
+
+from . import exceptions
+
+__all__ = ("RetryPolicy",)
+
+
+class RetryPolicy(object):
+    """Describes how clients retry failed requests.
+
+    Only the requests which are safe to repeat are retried: those using idempotent HTTP verbs
+    and POSTs to the endpoints which deduplicate by ``request_id`` (``pay`` and ``transfer``),
+    provided the ``request_id`` is present in the data. A request is retried on HTTP errors
+    with one of the ``statuses`` and on connection errors and timeouts, up to ``max_attempts``
+    attempts in total.
+
+    The delay grows exponentially from ``backoff`` seconds up to ``max_backoff``, with full
+    jitter applied if ``jitter`` is set. A ``Retry-After`` sent by the server takes precedence,
+    though it's capped at ``max_backoff`` too.
+    """
+
+    max_attempts: int = 4
+    backoff: float = 0.5
+    max_backoff: float = 30.0
+    jitter: bool = True
+    statuses = (429, 500, 502, 503, 504)
+    idempotent_methods = ("GET", "HEAD", "OPTIONS", "PUT", "DELETE")
+    idempotent_posts = ("pay", "transfer")
+    transport_errors = (requests.ConnectionError, requests.Timeout)
+
+    def __init__(
+        self,
+        max_attempts: Optional[int] = None,
+        backoff: Optional[float] = None,
+        max_backoff: Optional[float] = None,
+        jitter: Optional[bool] = None,
+        statuses=None,
+    ):
+        self.max_attempts = (
+            max_attempts if max_attempts is not None else self.max_attempts
+        )
+        self.backoff = backoff if backoff is not None else self.backoff
+        self.max_backoff = max_backoff if max_backoff is not None else self.max_backoff
+        self.jitter = jitter if jitter is not None else self.jitter
+        self.statuses = tuple(statuses) if statuses is not None else self.statuses
+
+    def is_idempotent(self, method, path, data=None):
+        method = method.upper()
+        if method in self.idempotent_methods:
+            return True
+        return (
+            method == "POST"
+            and path.split("?")[0] in self.idempotent_posts
+            and bool((data or {}).get("request_id"))
+        )
+
+    def is_retryable(self, exc, transport_errors=()):
+        if isinstance(exc, exceptions.RevolutHttpError):
+            return exc.status_code in self.statuses
+        return isinstance(exc, self.transport_errors + tuple(transport_errors))
+
+    def should_retry(self, method, path, data, exc, attempt, transport_errors=()):
+        """Tells whether to repeat the request after ``attempt`` failed with ``exc``.
+        The ``transport_errors`` extend the ones of ``requests`` for other HTTP libraries."""
+        return (
+            attempt < self.max_attempts
+            and self.is_retryable(exc, transport_errors)
+            and self.is_idempotent(method, path, data)
+        )
+
+    def delay(self, attempt, retry_after=None):
+        """Returns the number of seconds to wait after the ``attempt`` failed."""
+        if retry_after is not None:
+            # NOTE: a server asking for e.g. an hour would hold the caller that long
+            return min(self.max_backoff, retry_after)
+        delay = min(self.max_backoff, self.backoff * 2 ** (attempt - 1))
+        return random.uniform(0, delay) if self.jitter else delay
+
+
+def _parse_retry_after(value):
+    """Converts the ``Retry-After`` header, either in seconds or a HTTP date, to seconds."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
@@ -1,10 +1,11 @@
 from datetime import datetime, timedelta
-import json
 import logging
-import requests
+import threading
+from typing import Optional
 from urllib.parse import urljoin
 from . import exceptions
 from . import utils
+from .transport import default_transport
 
 __all__ = ("TemporarySession", "RenewableSession", "TokenProvider")
 
@@ -12,10 +13,13 @@ _log = logging.getLogger(__name__)
 
 
 class BaseSession(utils._SetEnv):
-    _timeout: int = 10
+    _timeout = None  # defaults to the transport's timeouts
+    transport = None  # transport.Transport()
     _access_token: str = ""
+    access_token_expires: Optional[datetime] = None
+    renewable: bool = False
 
-    def refresh_access_token(self):
+    def refresh_access_token(self, stale_token=None):
         raise NotImplementedError(
             "{} doesn't support refreshing an access token".format(type(self).__name__)
         )
@@ -24,6 +28,10 @@ class BaseSession(utils._SetEnv):
     def access_token(self):
         return self._access_token
 
+    def _needs_token(self):
+        """Tells whether the access token is missing or expired and has to be requested."""
+        return False
+
 
 class TemporarySession(BaseSession):
     """Accepts access token and maintains a temporary session limited by the token's lifetime."""
@@ -37,67 +45,153 @@ class RenewableSession(BaseSession):
     """Maintains long-term session, allowing to refresh the access tokens.
 
     You may provide it with existing `access_token`. If missing, it will obtain a new one.
+    The token is refreshed `refresh_margin` before it expires. The session may be shared
+    among threads; only one of them requests a new token at a time.
+
+    With a `token_store` (see `revolut.tokenstore`) the tokens are shared by all sessions
+    using it, also in other processes. The store is consulted before requesting a token
+    and updated with the new tokens, including the rotated refresh token.
     """
 
     refresh_token: str = ""
-
-    def __init__(self, refresh_token, client_id, jwt, access_token=None, timeout=None):
+    refresh_margin: timedelta = timedelta(seconds=30)
+    renewable: bool = True
+    token_store = None
+
+    def __init__(
+        self,
+        refresh_token,
+        client_id,
+        jwt,
+        access_token=None,
+        timeout=None,
+        refresh_margin=None,
+        token_store=None,
+        transport=None,
+    ):
         self._access_token = access_token or self._access_token
         self._set_env(refresh_token)
         self.refresh_token = refresh_token
         self.client_id = client_id
         self.jwt = jwt
         self._timeout = timeout or self._timeout
-
-    def refresh_access_token(self):
-        self._request_token()
-        return self._access_token
+        self.refresh_margin = (
+            refresh_margin if refresh_margin is not None else self.refresh_margin
+        )
+        self.token_store = token_store
+        self.transport = transport
+        self._token_lock = threading.Lock()
+
+    def refresh_access_token(self, stale_token=None):
+        """Obtains a new access token and returns it. If the ``stale_token`` is given, the
+        refresh happens only if it's still the current one, i.e. no other thread has
+        replaced it in the meantime."""
+        with self._token_lock:
+            if stale_token is None or stale_token == self._access_token:
+                self._renew(self._access_token)
+            return self._access_token
 
     @property
     def access_token(self):
-        if not self._access_token or (
-            self.access_token_expires and datetime.utcnow() >= self.access_token_expires
-        ):
-            return self.refresh_access_token()
+        if self._needs_token():
+            with self._token_lock:
+                # NOTE: another thread might have refreshed it while we were waiting
+                if self._needs_token():
+                    self._renew()
         return self._access_token
 
-    def _request_token(self):
-        self._do_request_token(
-            grant_type="refresh_token", refresh_token=self.refresh_token
+    def _renew(self, stale_token=None):
+        """Takes the tokens from the store or, if they're missing, expired or equal
+        to the ``stale_token``, requests new ones and saves them in the store."""
+        if self.token_store is None:
+            self._request_token()
+            return
+        key = self._store_key()
+        with self.token_store.lock(key):
+            self._load_token(self.token_store.load(key))
+            if self._needs_token() or (
+                stale_token and stale_token == self._access_token
+            ):
+                self._request_token()
+                self.token_store.save(key, self._dump_token())
+
+    def _store_key(self):
+        return self.client_id
+
+    def _dump_token(self):
+        return {
+            "access_token": self._access_token,
+            "access_token_expires": self.access_token_expires.isoformat()
+            if self.access_token_expires
+            else None,
+            "refresh_token": self.refresh_token,
+        }
+
+    def _load_token(self, data):
+        if not data:
+            return
+        self._access_token = data["access_token"]
+        self.access_token_expires = (
+            datetime.fromisoformat(data["access_token_expires"])
+            if data.get("access_token_expires")
+            else None
         )
+        self.refresh_token = data.get("refresh_token") or self.refresh_token
 
-    def _do_request_token(self, **params):
+    def _needs_token(self):
+        return not self._access_token or bool(
+            self.access_token_expires
+            and datetime.utcnow() >= self.access_token_expires - self.refresh_margin
+        )
+
+    def _grant_params(self):
+        return {"grant_type": "refresh_token", "refresh_token": self.refresh_token}
+
+    def _request_token(self):
+        self._do_request_token(**self._grant_params())
+
+    def _token_request_data(self, **params):
         data = {
             "client_id": self.client_id,
             "client_assertion_type": "urn:ietf:params:oauth:client-assertion-type:jwt-bearer",
             "client_assertion": self.jwt,
         }
         data.update(params)
-        _log.debug(
-            "{:s} request data: {}".format(
-                type(self).__name__, json.dumps(data, indent=2, sort_keys=True)
+        if _log.isEnabledFor(logging.DEBUG):
+            _log.debug(
+                "{:s} request data: {}".format(
+                    type(self).__name__, utils._loggable(data)
+                )
             )
-        )
+        return data
+
+    def _do_request_token(self, **params):
+        data = self._token_request_data(**params)
         now = datetime.utcnow()
-        rsp = requests.post(
+        transport = self.transport or default_transport()
+        rsp = transport.session.post(
             urljoin(self.base_url, "auth/token"),
             headers={"Content-Type": "application/x-www-form-urlencoded"},
             data=data,
-            timeout=self._timeout,
+            timeout=self._timeout or transport.timeout,
         )
-        result = rsp.json()
-        _log.debug(
-            "{:s} result: {}".format(
-                type(self).__name__, json.dumps(result, indent=2, sort_keys=True)
+        self._set_token(rsp.status_code, rsp.json(), now)
+
+    def _set_token(self, status_code, result, requested_at):
+        """Stores the tokens from the ``auth/token`` response obtained at ``requested_at``."""
+        if _log.isEnabledFor(logging.DEBUG):
+            _log.debug(
+                "{:s} result: {}".format(type(self).__name__, utils._loggable(result))
             )
-        )
-        if rsp.status_code != 200:
+        if status_code != 200:
             message = result.get("error") or ""
             if "error_description" in result:
                 message += ": {:s}".format(result["error_description"])
-            raise exceptions.RevolutHttpError(rsp.status_code, message)
+            raise exceptions.RevolutHttpError(status_code, message)
         self._access_token = result["access_token"]
-        self.access_token_expires = now + timedelta(seconds=result["expires_in"])
+        self.access_token_expires = requested_at + timedelta(
+            seconds=result["expires_in"]
+        )
         self.refresh_token = result.get("refresh_token", self.refresh_token)
 
 
@@ -111,24 +205,27 @@ class TokenProvider(RenewableSession):
 
     auth_code_spent: bool = False
 
-    def __init__(self, auth_code, client_id, jwt, timeout=None):
+    def __init__(
+        self, auth_code, client_id, jwt, timeout=None, token_store=None, transport=None
+    ):
         self._set_env(auth_code)
         self.auth_code = auth_code
         self.client_id = client_id
         self.jwt = jwt
         self._timeout = timeout or self._timeout
+        self.token_store = token_store
+        self.transport = transport
+        self._token_lock = threading.Lock()
         self._request_token()
+        if token_store is not None:
+            with token_store.lock(self._store_key()):
+                token_store.save(self._store_key(), self._dump_token())
 
-    @property
-    def access_token(self):
-        if not self._access_token:
-            self._request_token()
-        elif (
-            self.access_token_expires and datetime.utcnow() >= self.access_token_expires
-        ):
-            return self.refresh_access_token()
-        return self._access_token
+    def _grant_params(self):
+        if self.auth_code_spent:
+            return super(TokenProvider, self)._grant_params()
+        return {"grant_type": "authorization_code", "code": self.auth_code}
 
     def _request_token(self):
-        self._do_request_token(grant_type="authorization_code", code=self.auth_code)
+        super(TokenProvider, self)._request_token()
         self.auth_code_spent = True
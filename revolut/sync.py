@@ -0,0 +1,182 @@
+from datetime import datetime, timedelta, timezone
+import logging
+import sqlite3
+from typing import Optional
+
+from . import business, codec, utils
+
+__all__ = ("TransactionSync",)
+
+_log = logging.getLogger(__name__)
+
+# NOTE: the amounts are stored as JSON numbers, to be read back as equal Decimals
+_CODEC = codec.JSONCodec(decimal_numbers=True)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS transactions (
+    id TEXT PRIMARY KEY,
+    type TEXT,
+    state TEXT,
+    request_id TEXT,
+    reference TEXT,
+    created_at TEXT,
+    updated_at TEXT,
+    completed_at TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS transactions_created_at ON transactions (created_at);
+CREATE TABLE IF NOT EXISTS legs (
+    transaction_id TEXT NOT NULL REFERENCES transactions (id) ON DELETE CASCADE,
+    leg_id TEXT NOT NULL,
+    account_id TEXT,
+    counterparty_id TEXT,
+    amount TEXT,
+    currency TEXT,
+    description TEXT,
+    PRIMARY KEY (transaction_id, leg_id)
+);
+CREATE INDEX IF NOT EXISTS legs_account_id ON legs (account_id);
+CREATE TABLE IF NOT EXISTS sync_state (
+    account_id TEXT PRIMARY KEY,
+    high_water TEXT NOT NULL,
+    synced_at TEXT NOT NULL
+);
+"""
+
+
+def _isoformat(v):
+    """Formats the timestamp as naive UTC, so that the stored values compare properly."""
+    v = utils._to_datetime(v)
+    if v.tzinfo is not None:
+        v = v.astimezone(timezone.utc).replace(tzinfo=None)
+    return v.isoformat()
+
+
+class TransactionSync(object):
+    """Mirrors transactions of a ``BusinessClient`` into a local SQLite database.
+
+    Each call to ``sync()`` fetches only the transactions created since the newest one seen
+    by the previous sync of the same account (the high-water mark), reaching ``lookback``
+    further into the past in order to catch state changes of recent transactions, e.g.
+    from ``pending`` to ``completed`` or ``reverted``. The stored transactions are then
+    queried locally with ``transactions()``.
+    """
+
+    lookback: timedelta = timedelta(days=7)
+
+    def __init__(self, client, path, lookback: Optional[timedelta] = None):
+        self.client = client
+        self.lookback = lookback if lookback is not None else self.lookback
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA foreign_keys = ON")
+        self.db.executescript(_SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def high_water(self, account=None) -> Optional[datetime]:
+        """Returns creation time of the newest transaction synced for the ``account``
+        (or for all of them if not given), ``None`` if never synced."""
+        row = self.db.execute(
+            "SELECT high_water FROM sync_state WHERE account_id = ?",
+            (self._state_key(account),),
+        ).fetchone()
+        return datetime.fromisoformat(row[0]) if row else None
+
+    def sync(self, account=None, count=business.TRANSACTIONS_PAGE_SIZE) -> int:
+        """Fetches new and recently changed transactions of the ``account`` (or all accounts
+        if not given) and stores them. Returns the number of transactions stored."""
+        high_water = self.high_water(account)
+        from_date = high_water - self.lookback if high_water else None
+        reqdata = self.client._transactions_query(from_date=from_date, account=account)
+        reqdata["count"] = count
+        newest, stored = None, 0
+        with self.db:
+            for txdat in self.client._iter_transactions_data(reqdata):
+                self._store(txdat)
+                stored += 1
+                created_at = datetime.fromisoformat(_isoformat(txdat["created_at"]))
+                if newest is None or created_at > newest:
+                    newest = created_at
+            if high_water and (newest is None or newest < high_water):
+                newest = high_water
+            if newest is not None:
+                self.db.execute(
+                    "INSERT OR REPLACE INTO sync_state VALUES (?, ?, ?)",
+                    (
+                        self._state_key(account),
+                        newest.isoformat(),
+                        datetime.utcnow().isoformat(),
+                    ),
+                )
+        _log.info(
+            "Synced {:d} transactions of {:s} since {}".format(
+                stored, self._state_key(account) or "all accounts", from_date
+            )
+        )
+        return stored
+
+    def transactions(
+        self, account=None, from_date=None, to_date=None, state=None
+    ) -> [business.Transaction]:
+        """Returns stored transactions, newest first, optionally filtered by the ``account``
+        one of their legs belongs to, creation time span and ``state``."""
+        query, params = ["SELECT data FROM transactions t WHERE 1"], []
+        if account:
+            query.append(
+                "AND EXISTS (SELECT 1 FROM legs l "
+                "WHERE l.transaction_id = t.id AND l.account_id = ?)"
+            )
+            params.append(utils._obj2id(account))
+        if from_date:
+            query.append("AND created_at >= ?")
+            params.append(_isoformat(from_date))
+        if to_date:
+            query.append("AND created_at <= ?")
+            params.append(_isoformat(to_date))
+        if state:
+            query.append("AND state = ?")
+            params.append(state)
+        query.append("ORDER BY created_at DESC")
+        return [
+            business.Transaction(client=self.client, **_CODEC.loads(data))
+            for (data,) in self.db.execute(" ".join(query), params)
+        ]
+
+    def _state_key(self, account):
+        return utils._obj2id(account) or ""
+
+    def _store(self, txdat):
+        def _timestamp(key):
+            return _isoformat(txdat[key]) if txdat.get(key) else None
+
+        self.db.execute(
+            "INSERT OR REPLACE INTO transactions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                txdat["id"],
+                txdat.get("type"),
+                txdat.get("state"),
+                txdat.get("request_id"),
+                txdat.get("reference"),
+                _timestamp("created_at"),
+                _timestamp("updated_at"),
+                _timestamp("completed_at"),
+                _CODEC.dumps(txdat).decode("utf-8"),
+            ),
+        )
+        self.db.execute("DELETE FROM legs WHERE transaction_id = ?", (txdat["id"],))
+        self.db.executemany(
+            "INSERT INTO legs VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    txdat["id"],
+                    leg.get("leg_id") or str(i),
+                    leg.get("account_id"),
+                    (leg.get("counterparty") or {}).get("id"),
+                    str(leg["amount"]) if "amount" in leg else None,
+                    leg.get("currency"),
+                    leg.get("description"),
+                )
+                for i, leg in enumerate(txdat.get("legs") or [])
+            ],
+        )
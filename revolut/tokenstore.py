@@ -0,0 +1,163 @@
+"""Token stores let ``RenewableSession`` objects share the tokens, also between processes.
+
+A session consults the store before requesting a new access token and saves the tokens it
+obtains, including the refresh token rotated by Revolut. The requests are done while holding
+the store's ``lock()``, so only one of the processes sharing the store performs them.
+"""
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # pragma: nocover
+    fcntl = None
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+
+__all__ = ("TokenStore", "MemoryTokenStore", "FileTokenStore", "SQLiteTokenStore")
+
+
+class TokenStore(object):
+    def load(self, key):
+        """Returns the token data stored under the ``key`` or ``None``."""
+        raise NotImplementedError(
+            "{} doesn't implement loading tokens".format(type(self).__name__)
+        )
+
+    def save(self, key, data):
+        """Stores the token data under the ``key``. It should be called while holding
+        ``lock()``, which serializes the writers."""
+        raise NotImplementedError(
+            "{} doesn't implement saving tokens".format(type(self).__name__)
+        )
+
+    @contextmanager
+    def lock(self, key):
+        """Grants exclusive access to the tokens stored under the ``key``."""
+        yield
+
+
+class MemoryTokenStore(TokenStore):
+    """Keeps the tokens in a dictionary, shared by the sessions of one process."""
+
+    def __init__(self):
+        self.data = {}
+        self._lock = threading.RLock()
+
+    def load(self, key):
+        return self.data.get(key)
+
+    def save(self, key, data):
+        self.data[key] = dict(data)
+
+    @contextmanager
+    def lock(self, key):
+        with self._lock:
+            yield
+
+
+class FileTokenStore(TokenStore):
+    """Keeps the tokens in a JSON file at ``path``, replaced atomically on each save.
+    Writers are serialized with ``fcntl`` lock on a companion ``.lock`` file, which limits
+    this store to POSIX systems."""
+
+    def __init__(self, path):
+        if fcntl is None:  # pragma: nocover
+            raise NotImplementedError("FileTokenStore requires fcntl (POSIX systems)")
+        self.path = path
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._lockfile = None
+
+    def _read(self):
+        try:
+            with open(self.path, "r") as fh:
+                return json.load(fh)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def load(self, key):
+        return self._read().get(key)
+
+    def save(self, key, data):
+        content = self._read()
+        content[key] = data
+        fd, tmppath = tempfile.mkstemp(
+            dir=os.path.dirname(os.path.abspath(self.path)), prefix=".tokens-"
+        )
+        try:
+            with os.fdopen(fd, "w") as fh:
+                json.dump(content, fh)
+                fh.flush()
+                os.fsync(fh.fileno())
+            os.chmod(tmppath, 0o600)
+            os.replace(tmppath, self.path)
+        except BaseException:
+            os.unlink(tmppath)
+            raise
+
+    @contextmanager
+    def lock(self, key):
+        # NOTE: flock is held per open file, so nested use within a process is counted
+        with self._lock:
+            if not self._depth:
+                self._lockfile = open(self.path + ".lock", "a")
+                fcntl.flock(self._lockfile, fcntl.LOCK_EX)
+            self._depth += 1
+            try:
+                yield
+            finally:
+                self._depth -= 1
+                if not self._depth:
+                    fcntl.flock(self._lockfile, fcntl.LOCK_UN)
+                    self._lockfile.close()
+                    self._lockfile = None
+
+
+class SQLiteTokenStore(TokenStore):
+    """Keeps the tokens in a SQLite database at ``path``."""
+
+    def __init__(self, path):
+        self._lock = threading.RLock()
+        self._depth = 0
+        self.db = sqlite3.connect(
+            path, timeout=30, isolation_level=None, check_same_thread=False
+        )
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS tokens (key TEXT PRIMARY KEY, data TEXT NOT NULL)"
+        )
+
+    def close(self):
+        self.db.close()
+
+    def load(self, key):
+        with self._lock:
+            row = self.db.execute(
+                "SELECT data FROM tokens WHERE key = ?", (key,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save(self, key, data):
+        with self._lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO tokens VALUES (?, ?)", (key, json.dumps(data))
+            )
+
+    @contextmanager
+    def lock(self, key):
+        with self._lock:
+            if not self._depth:
+                self.db.execute("BEGIN IMMEDIATE")
+            self._depth += 1
+            try:
+                yield
+            except BaseException:
+                self._depth -= 1
+                if not self._depth:
+                    self.db.execute("ROLLBACK")
+                raise
+            self._depth -= 1
+            if not self._depth:
+                self.db.execute("COMMIT")
@@ -0,0 +1,90 @@
+import requests
+from requests.adapters import HTTPAdapter
+import ssl
+import threading
+from typing import Optional
+
+__all__ = ("Transport", "default_transport")
+
+
+class _SSLContextAdapter(HTTPAdapter):
+    def __init__(self, ssl_context, **kwargs):
+        self.ssl_context = ssl_context
+        super(_SSLContextAdapter, self).__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs["ssl_context"] = self.ssl_context
+        return super(_SSLContextAdapter, self).init_poolmanager(*args, **kwargs)
+
+
+class Transport(object):
+    """Pooled HTTP transport to be shared by sessions and clients.
+
+    Connections are kept alive and reused, so the TCP and TLS handshakes are paid once per
+    connection rather than once per request. ``pool_connections`` is the number of hosts to
+    keep pools for and ``pool_maxsize`` the number of connections kept per host; it should
+    match the number of threads using the transport concurrently. The optional
+    ``ssl_context`` allows tuning the TLS settings of all connections.
+
+    The ``connect_timeout`` and ``read_timeout`` apply to clients and sessions which don't
+    specify their own ``timeout``.
+    """
+
+    pool_connections: int = 4
+    pool_maxsize: int = 10
+    connect_timeout: float = 5
+    read_timeout: float = 30
+    keep_alive: bool = True
+
+    def __init__(
+        self,
+        pool_connections: Optional[int] = None,
+        pool_maxsize: Optional[int] = None,
+        connect_timeout: Optional[float] = None,
+        read_timeout: Optional[float] = None,
+        keep_alive: Optional[bool] = None,
+        ssl_context: Optional[ssl.SSLContext] = None,
+    ):
+        self.pool_connections = pool_connections or self.pool_connections
+        self.pool_maxsize = pool_maxsize or self.pool_maxsize
+        self.connect_timeout = (
+            connect_timeout if connect_timeout is not None else self.connect_timeout
+        )
+        self.read_timeout = (
+            read_timeout if read_timeout is not None else self.read_timeout
+        )
+        self.keep_alive = keep_alive if keep_alive is not None else self.keep_alive
+        self.ssl_context = ssl_context
+        self.session = requests.Session()
+        adapter_kwargs = {
+            "pool_connections": self.pool_connections,
+            "pool_maxsize": self.pool_maxsize,
+        }
+        if ssl_context is None:
+            adapter = HTTPAdapter(**adapter_kwargs)
+        else:
+            adapter = _SSLContextAdapter(ssl_context, **adapter_kwargs)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        if not self.keep_alive:
+            self.session.headers["Connection"] = "close"
+
+    @property
+    def timeout(self):
+        return (self.connect_timeout, self.read_timeout)
+
+    def close(self):
+        self.session.close()
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def default_transport() -> Transport:
+    """Returns the transport shared by all sessions and clients created without one."""
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = Transport()
+        return _default
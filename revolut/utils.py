@@ -1,8 +1,15 @@
 import datetime
 import dateutil.parser
+import dateutil.tz
 from decimal import Decimal
 import json
 import jwt
+import re
+
+_ISO_DATETIME = re.compile(
+    r"(\d{4})-(\d\d)-(\d\d)[T ](\d\d):(\d\d):(\d\d)(?:\.(\d{1,6})\d*)?"
+    r"(?:(Z)|([+-])(\d\d):?(\d\d))?$"
+)
 
 
 def _obj2id(obj):
@@ -17,9 +24,59 @@ def _date(v):
     return v
 
 
+def _parse_datetime(v):
+    """Parses the ISO-8601 timestamps as sent by Revolut, e.g. ``2022-08-25T14:43:13.630804Z``,
+    without the overhead of ``dateutil``, which handles any other format."""
+    m = _ISO_DATETIME.match(v)
+    if m is None:
+        return dateutil.parser.parse(v)
+    year, month, day, hour, minute, second, fraction, utc, sign, tzh, tzm = m.groups()
+    if utc:
+        tzinfo = dateutil.tz.UTC
+    elif sign:
+        offset = (int(tzh) * 60 + int(tzm)) * 60
+        if not offset:
+            tzinfo = dateutil.tz.UTC
+        else:
+            tzinfo = dateutil.tz.tzoffset(None, offset if sign == "+" else -offset)
+    else:
+        tzinfo = None
+    try:
+        return datetime.datetime(
+            int(year),
+            int(month),
+            int(day),
+            int(hour),
+            int(minute),
+            int(second),
+            int(fraction.ljust(6, "0")) if fraction else 0,
+            tzinfo=tzinfo,
+        )
+    except ValueError:
+        return dateutil.parser.parse(v)
+
+
+def _to_datetime(v):
+    if isinstance(v, datetime.datetime):
+        return v
+    if isinstance(v, datetime.date):
+        return datetime.datetime.combine(v, datetime.time())
+    return _parse_datetime(v)
+
+
+def _naive_utc(v):
+    """Converts an aware datetime to a naive one in UTC, as the API expects and
+    ``datetime.utcnow()`` returns. Naive ones are assumed to be in UTC already."""
+    if isinstance(v, datetime.datetime) and v.tzinfo is not None:
+        v = v.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return v
+
+
 def _datetime(v):
     if not isinstance(v, (datetime.date, datetime.datetime)):
         v = datetime.date.fromisoformat(v)
+    # NOTE: e.g. the parsed ``created_at`` of an item, passed back as a query cursor
+    v = _naive_utc(v)
     return v.strftime("%Y-%m-%dT%H:%M:%S.%f%zZ")
 
 
@@ -64,6 +121,61 @@ class JSONWithDecimalEncoder(json.JSONEncoder):
         return super(JSONWithDecimalEncoder, self).default(o)
 
 
+LOG_PAYLOAD_ITEMS = 10  # items of a list shown in the debug log
+LOG_PAYLOAD_CHARS = 4000  # the logged payload is cut beyond that
+_SECRET_KEYS = frozenset(
+    (
+        "access_token",
+        "refresh_token",
+        "id_token",
+        "client_assertion",
+        "code",
+        "jwt",
+        "secret",
+        "signing_secret",
+        "password",
+        "authorization",
+    )
+)
+_SECRET_VALUE = re.compile(
+    r"\beyJ[\w-]+\.[\w-]+\.[\w-]*|\b(?:oa|sk|wsk)_(?:prod|sand|test|live)?_?[\w-]{8,}"
+)
+_REDACTED = "<redacted>"
+
+
+def _redact(data):
+    """Returns a copy of ``data`` with the secrets masked and the lists shortened to
+    ``LOG_PAYLOAD_ITEMS``."""
+    if isinstance(data, dict):
+        return {
+            k: _REDACTED
+            if isinstance(v, str) and v and str(k).lower() in _SECRET_KEYS
+            else _redact(v)
+            for k, v in data.items()
+        }
+    if isinstance(data, (list, tuple)):
+        redacted = [_redact(v) for v in data[:LOG_PAYLOAD_ITEMS]]
+        if len(data) > LOG_PAYLOAD_ITEMS:
+            redacted.append("... {:d} more items".format(len(data) - LOG_PAYLOAD_ITEMS))
+        return redacted
+    if isinstance(data, str):
+        return _SECRET_VALUE.sub(_REDACTED, data)
+    return data
+
+
+def _loggable(data):
+    """Formats the request or response ``data`` for the debug log, with the secrets masked
+    and the size capped. It's costly, so call it only if the debug level is enabled."""
+    text = json.dumps(
+        _redact(data), cls=JSONWithDecimalEncoder, indent=2, sort_keys=True
+    )
+    if len(text) > LOG_PAYLOAD_CHARS:
+        text = "{}... ({:d} chars more)".format(
+            text[:LOG_PAYLOAD_CHARS], len(text) - LOG_PAYLOAD_CHARS
+        )
+    return text
+
+
 def get_jwt(prvkey, issuer, client_id):
     """Generates JWT signed with the private key"""
     return jwt.encode(
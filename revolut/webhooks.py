@@ -0,0 +1,563 @@
+"""Receiving the webhook events of the Merchant API.
+
+A ``WebhookHandler`` verifies the ``Revolut-Signature`` of each request, parses the payload
+into a ``WebhookEvent`` of the class matching its ``event`` field and calls the handlers
+registered for that class or any of its bases. The handler is a WSGI application itself and
+``handler.asgi`` is the ASGI one; other frameworks may pass the raw request body and the
+signature headers to ``handle()``::
+
+    handler = WebhookHandler(signing_secret)
+
+    @handler.on(OrderCompleted)
+    def completed(event):
+        ...
+
+The application responds with 204 once all handlers have returned, with 401 to requests
+failing the verification, with 400 to malformed ones and with 500 if a handler raised, which
+makes Revolut deliver the event again later.
+
+Revolut retries the deliveries, so the same event may arrive more than once and events of
+an order may overlap. An ``EventPipeline`` registered as a handler drops the duplicates and
+processes the events of each order one at a time and in the order of arrival, on a pool of
+worker threads. Once ``capacity`` events are waiting, further requests block for a while and
+then get 503, so Revolut delivers them later::
+
+    pipeline = EventPipeline(fulfil, dedup=SQLiteDeduplicator("webhooks.db"))
+    handler.on(OrderEvent)(pipeline.submit)
+"""
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from decimal import Decimal
+import hashlib
+import hmac
+import inspect
+import json
+import logging
+import sqlite3
+import threading
+import time
+from typing import Iterable, Optional, Union
+
+from . import exceptions
+
+__all__ = (
+    "WebhookHandler",
+    "WebhookEvent",
+    "OrderEvent",
+    "OrderAuthorised",
+    "OrderCompleted",
+    "OrderCancelled",
+    "OrderPaymentAuthenticated",
+    "OrderPaymentDeclined",
+    "OrderPaymentFailed",
+    "EventPipeline",
+    "LRUDeduplicator",
+    "SQLiteDeduplicator",
+    "sign",
+    "verify_signature",
+)
+
+SIGNATURE_VERSION = "v1"
+SIGNATURE_TOLERANCE = 300  # seconds between sending and receiving of a request
+MAX_BODY_SIZE = 64 * 1024
+
+_log = logging.getLogger(__name__)
+
+
+class WebhookEvent(object):
+    """An event of the type not covered by any of the subclasses. The complete payload
+    is available as ``data`` and the time of sending as ``timestamp``."""
+
+    event_type: Optional[str] = None
+
+    def __init__(self, data: dict, timestamp: Optional[datetime] = None):
+        self.data = data
+        self.event = data.get("event")
+        self.timestamp = timestamp
+
+    def __repr__(self):
+        return "<{} {}>".format(type(self).__name__, self.event)
+
+    @property
+    def key(self) -> str:
+        """Identifies the event among redeliveries, for deduplication."""
+        digest = hashlib.sha256(
+            json.dumps(self.data, sort_keys=True, default=str).encode()
+        )
+        return digest.hexdigest()
+
+    @property
+    def serial_key(self) -> str:
+        """The events sharing it are processed one at a time by ``EventPipeline``."""
+        return self.key
+
+
+class OrderEvent(WebhookEvent):
+    def __init__(self, data: dict, timestamp: Optional[datetime] = None):
+        super(OrderEvent, self).__init__(data, timestamp)
+        self.order_id = data.get("order_id")
+        self.merchant_order_ext_ref = data.get("merchant_order_ext_ref")
+
+    def __repr__(self):
+        return "<{} {}>".format(type(self).__name__, self.order_id)
+
+    @property
+    def key(self) -> str:
+        return "{}:{}".format(self.event, self.order_id)
+
+    @property
+    def serial_key(self) -> str:
+        return self.order_id or self.key
+
+
+class OrderAuthorised(OrderEvent):
+    event_type = "ORDER_AUTHORISED"
+
+
+class OrderCompleted(OrderEvent):
+    event_type = "ORDER_COMPLETED"
+
+
+class OrderCancelled(OrderEvent):
+    event_type = "ORDER_CANCELLED"
+
+
+class OrderPaymentAuthenticated(OrderEvent):
+    event_type = "ORDER_PAYMENT_AUTHENTICATED"
+
+
+class OrderPaymentDeclined(OrderEvent):
+    event_type = "ORDER_PAYMENT_DECLINED"
+
+
+class OrderPaymentFailed(OrderEvent):
+    event_type = "ORDER_PAYMENT_FAILED"
+
+
+EVENT_CLASSES = {
+    cls.event_type: cls
+    for cls in (
+        OrderAuthorised,
+        OrderCompleted,
+        OrderCancelled,
+        OrderPaymentAuthenticated,
+        OrderPaymentDeclined,
+        OrderPaymentFailed,
+    )
+}
+
+
+def parse_event(body: bytes, timestamp: Optional[datetime] = None) -> WebhookEvent:
+    """Returns the ``WebhookEvent`` subclass instance matching the payload ``body``."""
+    try:
+        data = json.loads(body, parse_float=Decimal)
+    except ValueError as e:
+        raise exceptions.WebhookError("Malformed payload: {}".format(e))
+    if not isinstance(data, dict):
+        raise exceptions.WebhookError("Malformed payload: not an object")
+    return EVENT_CLASSES.get(data.get("event"), WebhookEvent)(data, timestamp)
+
+
+def _payload(timestamp, body):
+    return "{}.{}.".format(SIGNATURE_VERSION, timestamp).encode() + body
+
+
+def sign(secret: str, timestamp: Union[int, str], body: bytes) -> str:
+    """Returns the ``Revolut-Signature`` header value of the request ``body`` sent at
+    the ``timestamp`` (in milliseconds since the epoch)."""
+    digest = hmac.new(secret.encode(), _payload(timestamp, body), hashlib.sha256)
+    return "{}={}".format(SIGNATURE_VERSION, digest.hexdigest())
+
+
+def verify_signature(
+    secrets: Union[str, Iterable[str]],
+    body: bytes,
+    timestamp: Optional[str],
+    signature: Optional[str],
+    tolerance: float = SIGNATURE_TOLERANCE,
+    now: Optional[float] = None,
+) -> None:
+    """Raises ``exceptions.InvalidSignature`` unless the ``signature`` header (which may
+    list several comma-separated signatures) matches the ``body`` signed at ``timestamp``
+    with any of the ``secrets``, and the ``timestamp`` is within ``tolerance`` seconds
+    from ``now``."""
+    if isinstance(secrets, str):
+        secrets = (secrets,)
+    macs = [hmac.new(s.encode(), digestmod=hashlib.sha256) for s in secrets]
+    _verify(
+        macs, body, timestamp, signature, tolerance, time.time() if now is None else now
+    )
+
+
+def _verify(macs, body, timestamp, signature, tolerance, now):
+    if not signature or not timestamp:
+        raise exceptions.InvalidSignature("Missing signature or timestamp")
+    try:
+        sent = int(timestamp) / 1000.0
+    except ValueError:
+        raise exceptions.InvalidSignature("Malformed timestamp: {}".format(timestamp))
+    if abs(now - sent) > tolerance:
+        raise exceptions.InvalidSignature(
+            "Timestamp out of tolerance: {}".format(timestamp)
+        )
+    payload = _payload(timestamp, body)
+    candidates = [s.strip().encode() for s in signature.split(",")]
+    valid = False
+    for mac in macs:
+        mac = mac.copy()  # NOTE: the key is processed once, upon creating the original
+        mac.update(payload)
+        expected = "{}={}".format(SIGNATURE_VERSION, mac.hexdigest()).encode()
+        for candidate in candidates:
+            # NOTE: compare all in constant time, not to leak which one matched
+            valid |= hmac.compare_digest(expected, candidate)
+    if not valid:
+        raise exceptions.InvalidSignature("Signature mismatch")
+
+
+def _status(exc):
+    if isinstance(exc, exceptions.InvalidSignature):
+        _log.warning("Rejected webhook request: {}".format(exc))
+        return 401
+    if isinstance(exc, exceptions.WebhookOverloaded):
+        _log.warning("Webhook request deferred: {}".format(exc))
+        return 503
+    if isinstance(exc, exceptions.WebhookError):
+        _log.warning("Malformed webhook request: {}".format(exc))
+        return 400
+    _log.exception("Webhook handler failed")
+    return 500
+
+
+_REASONS = {
+    204: "No Content",
+    400: "Bad Request",
+    401: "Unauthorized",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+}
+
+
+class WebhookHandler(object):
+    """Verifies and dispatches webhook requests signed with any of the ``secrets`` (more
+    than one are accepted during rotation) and sent within ``tolerance`` seconds from now.
+    Requests with bodies over ``max_body_size`` bytes are rejected."""
+
+    def __init__(
+        self,
+        secrets: Union[str, Iterable[str]],
+        tolerance: float = SIGNATURE_TOLERANCE,
+        max_body_size: int = MAX_BODY_SIZE,
+        clock=time.time,
+    ):
+        if isinstance(secrets, str):
+            secrets = (secrets,)
+        self._macs = [hmac.new(s.encode(), digestmod=hashlib.sha256) for s in secrets]
+        if not self._macs:
+            raise ValueError("At least one signing secret is required")
+        self.tolerance = tolerance
+        self.max_body_size = max_body_size
+        self._clock = clock
+        self._handlers = {}  # event class: [handler]
+        self._resolved = {}  # event class: handlers of the class and its bases
+
+    def on(self, *event_classes):
+        """Registers the decorated function as a handler of the ``event_classes``
+        (all events if none given). Coroutine functions are supported by ``asgi`` only."""
+
+        def register(func):
+            for cls in event_classes or (WebhookEvent,):
+                self._handlers.setdefault(cls, []).append(func)
+            self._resolved = {}
+            return func
+
+        return register
+
+    def handlers(self, event_class):
+        try:
+            return self._resolved[event_class]
+        except KeyError:
+            handlers = [
+                func
+                for cls in reversed(event_class.__mro__)
+                for func in self._handlers.get(cls, ())
+            ]
+            self._resolved[event_class] = handlers
+            return handlers
+
+    def parse(
+        self, body: bytes, timestamp: Optional[str], signature: Optional[str]
+    ) -> WebhookEvent:
+        """Verifies the request and returns the event it carries. The ``timestamp`` and
+        ``signature`` are the values of the ``Revolut-Request-Timestamp`` and
+        ``Revolut-Signature`` headers respectively."""
+        _verify(self._macs, body, timestamp, signature, self.tolerance, self._clock())
+        sent = datetime.fromtimestamp(int(timestamp) / 1000.0, tz=timezone.utc)
+        return parse_event(body, sent)
+
+    def handle(
+        self, body: bytes, timestamp: Optional[str], signature: Optional[str]
+    ) -> WebhookEvent:
+        """Verifies the request, calls the handlers of the event and returns it."""
+        event = self.parse(body, timestamp, signature)
+        for func in self.handlers(type(event)):
+            func(event)
+        return event
+
+    async def ahandle(
+        self, body: bytes, timestamp: Optional[str], signature: Optional[str]
+    ) -> WebhookEvent:
+        """Like ``handle()``, awaiting the results of the handlers which are awaitable."""
+        event = self.parse(body, timestamp, signature)
+        for func in self.handlers(type(event)):
+            result = func(event)
+            if inspect.isawaitable(result):
+                await result
+        return event
+
+    def __call__(self, environ, start_response):
+        status = 405
+        if environ["REQUEST_METHOD"] == "POST":
+            try:
+                length = int(environ.get("CONTENT_LENGTH") or 0)
+            except ValueError:
+                length = -1
+            if length < 0:
+                _log.warning(
+                    "Malformed webhook request: Content-Length {!r}".format(
+                        environ.get("CONTENT_LENGTH")
+                    )
+                )
+                status = 400
+            elif length > self.max_body_size:
+                status = 413
+            else:
+                try:
+                    self.handle(
+                        environ["wsgi.input"].read(length),
+                        environ.get("HTTP_REVOLUT_REQUEST_TIMESTAMP"),
+                        environ.get("HTTP_REVOLUT_SIGNATURE"),
+                    )
+                    status = 204
+                except Exception as e:
+                    status = _status(e)
+        start_response(
+            "{} {}".format(status, _REASONS[status]), [("Content-Length", "0")]
+        )
+        return [b""]
+
+    async def asgi(self, scope, receive, send):
+        """The ASGI application."""
+        if scope["type"] == "lifespan":
+            while True:
+                message = await receive()
+                if message["type"] == "lifespan.startup":
+                    await send({"type": "lifespan.startup.complete"})
+                elif message["type"] == "lifespan.shutdown":
+                    await send({"type": "lifespan.shutdown.complete"})
+                    return
+        if scope["type"] == "websocket":
+            await receive()  # NOTE: websocket.connect, answered by closing it
+            await send({"type": "websocket.close"})
+            return
+        if scope["type"] != "http":
+            raise ValueError("Unsupported ASGI scope type {}".format(scope["type"]))
+        status = 405
+        if scope["method"] == "POST":
+            headers = dict(scope["headers"])
+            chunks, size, more = [], 0, True
+            while more:
+                message = await receive()
+                chunk = message.get("body", b"")
+                size += len(chunk)
+                chunks.append(chunk)
+                more = message.get("more_body", False) and size <= self.max_body_size
+            if size > self.max_body_size:
+                status = 413
+            else:
+                timestamp = headers.get(b"revolut-request-timestamp")
+                signature = headers.get(b"revolut-signature")
+                try:
+                    await self.ahandle(
+                        b"".join(chunks),
+                        timestamp.decode("latin-1") if timestamp else None,
+                        signature.decode("latin-1") if signature else None,
+                    )
+                    status = 204
+                except Exception as e:
+                    status = _status(e)
+        await send(
+            {
+                "type": "http.response.start",
+                "status": status,
+                "headers": [(b"content-length", b"0")],
+            }
+        )
+        await send({"type": "http.response.body", "body": b""})
+
+
+class LRUDeduplicator(object):
+    """Remembers the keys of the ``maxsize`` most recently seen events, in memory."""
+
+    def __init__(self, maxsize: int = 100000):
+        self.maxsize = maxsize
+        self._keys = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, key: str) -> bool:
+        """Records the ``key`` and returns ``True`` if it hasn't been seen before."""
+        with self._lock:
+            if key in self._keys:
+                self._keys.move_to_end(key)
+                return False
+            self._keys[key] = None
+            if len(self._keys) > self.maxsize:
+                self._keys.popitem(last=False)
+            return True
+
+    def discard(self, key: str) -> None:
+        """Forgets the ``key``, e.g. of an event which failed to be processed."""
+        with self._lock:
+            self._keys.pop(key, None)
+
+
+class SQLiteDeduplicator(object):
+    """Remembers the keys of the ``maxsize`` most recently seen events in the SQLite
+    database at ``path``, so they survive restarts and are shared among processes."""
+
+    _prune_every = 1000  # additions
+
+    def __init__(self, path, maxsize: int = 1000000):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._added = 0
+        self.db = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self.db.execute("PRAGMA journal_mode = WAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS webhook_events "
+            "(key TEXT PRIMARY KEY, seen_at REAL NOT NULL)"
+        )
+
+    def close(self):
+        self.db.close()
+
+    def add(self, key: str) -> bool:
+        with self._lock, self.db:
+            cursor = self.db.execute(
+                "INSERT OR IGNORE INTO webhook_events VALUES (?, ?)", (key, time.time())
+            )
+            self._added += 1
+            if self._added % self._prune_every == 0:
+                self.db.execute(
+                    "DELETE FROM webhook_events WHERE key IN (SELECT key "
+                    "FROM webhook_events ORDER BY seen_at DESC LIMIT -1 OFFSET ?)",
+                    (self.maxsize,),
+                )
+            return cursor.rowcount == 1
+
+    def discard(self, key: str) -> None:
+        with self._lock, self.db:
+            self.db.execute("DELETE FROM webhook_events WHERE key = ?", (key,))
+
+
+class EventPipeline(object):
+    """Processes the submitted events with ``process`` on a pool of ``workers`` threads.
+
+    Events with the same ``serial_key`` (the order ID for order events) are processed one
+    at a time, in the order of submission, while different orders proceed in parallel.
+    The duplicates recognised by ``dedup`` (an ``LRUDeduplicator`` or ``SQLiteDeduplicator``)
+    are dropped. At most ``capacity`` events are accepted and not yet processed; beyond that
+    ``submit()`` waits up to ``timeout`` seconds, then raises
+    ``exceptions.WebhookOverloaded``. Under ASGI, where waiting would block the event loop,
+    set ``timeout`` to 0.
+
+    A failure of ``process`` is logged and passed to ``on_error``, if given, which is the
+    only place it's reported: the webhook request has been answered on submission, so
+    Revolut doesn't deliver the event again. The event is forgotten by ``dedup``, so that
+    it may be submitted again, e.g. by ``on_error`` or a later reconciliation."""
+
+    def __init__(
+        self,
+        process,
+        workers: int = 8,
+        capacity: int = 1000,
+        timeout: Optional[float] = 10,
+        dedup=None,
+        on_error=None,
+    ):
+        self.process = process
+        self.timeout = timeout
+        self.dedup = dedup
+        self.on_error = on_error
+        self._slots = threading.BoundedSemaphore(capacity)
+        self._lock = threading.Lock()
+        self._queues = {}  # serial key: deque of events waiting for the one in progress
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self, wait: bool = True) -> None:
+        """Stops accepting events. With ``wait`` set, returns once the accepted ones
+        are processed."""
+        self._executor.shutdown(wait=wait)
+
+    def submit(self, event: WebhookEvent) -> bool:
+        """Accepts the ``event`` for processing. Returns ``False`` if it's a duplicate."""
+        if not self._slots.acquire(timeout=self.timeout):
+            raise exceptions.WebhookOverloaded(
+                "Event processing is behind, rejecting {}".format(event.key)
+            )
+        if self.dedup is not None and not self.dedup.add(event.key):
+            self._slots.release()
+            _log.debug("Dropped duplicate webhook event {}".format(event.key))
+            return False
+        skey = event.serial_key
+        with self._lock:
+            queue = self._queues.get(skey)
+            if queue is not None:
+                queue.append(event)
+                return True
+            self._queues[skey] = deque()
+        try:
+            self._executor.submit(self._run, skey, event)
+        except RuntimeError:  # NOTE: closed
+            with self._lock:
+                del self._queues[skey]
+            self._forget(event)
+            self._slots.release()
+            raise
+        return True
+
+    def _run(self, skey, event):
+        while event is not None:
+            self._process(event)
+            self._slots.release()
+            with self._lock:
+                queue = self._queues[skey]
+                if queue:
+                    event = queue.popleft()
+                else:
+                    del self._queues[skey]
+                    event = None
+
+    def _process(self, event):
+        try:
+            self.process(event)
+        except Exception as e:
+            _log.exception("Processing of webhook event {} failed".format(event.key))
+            self._forget(event)
+            if self.on_error is not None:
+                try:
+                    self.on_error(event, e)
+                except Exception:
+                    _log.exception("Error callback of webhook event failed")
+
+    def _forget(self, event):
+        if self.dedup is not None:
+            self.dedup.discard(event.key)
@@ -31,6 +31,11 @@ setup(
     url="https://github.com/emesik/revolut-python/",
     long_description=open("README.rst", "rb").read().decode("utf-8"),
     install_requires=open("requirements.txt", "r").read().splitlines(),
+    extras_require={
+        "aio": ["aiohttp>=3.7"],
+        "orjson": ["orjson>=3"],
+        "pandas": ["numpy", "pandas"],
+    },
     tests_require=open("test_requirements.txt", "r").read().splitlines(),
     setup_requires=[
         "pytest-runner",
@@ -10,3 +10,37 @@ class JSONResponsesMixin(object):
         caller_name = inspect.getouterframes(inspect.currentframe(), 2)[1][3]
         with open(os.path.join(DATA_DIR, caller_name, name), "r") as fh:
             return json.loads(fh.read())
+
+
+class FakeClock(object):
+    """A clock for the ``clock`` arguments, which shows ``now`` until moved."""
+
+    now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def transaction_data(n, created_at, legs=None, state="completed", account_id="acc-1"):
+    """Returns the data of transaction ``tx-<n>``, by default with a single leg of the
+    ``account_id`` paying ``1.5 * n`` GBP to ``cpt-1``."""
+    if legs is None:
+        legs = [
+            {
+                "leg_id": "leg-{}".format(n),
+                "account_id": account_id,
+                "amount": -1.5 * n,
+                "balance": 100.1,
+                "currency": "GBP",
+                "counterparty": {"id": "cpt-1"},
+            }
+        ]
+    return {
+        "id": "tx-{}".format(n),
+        "type": "transfer",
+        "state": state,
+        "request_id": "req-{}".format(n),
+        "created_at": created_at,
+        "updated_at": created_at,
+        "legs": legs,
+    }
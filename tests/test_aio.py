@@ -0,0 +1,349 @@
+import asyncio
+import contextlib
+from datetime import datetime
+from decimal import Decimal
+import json
+import re
+from unittest import IsolatedAsyncioTestCase
+
+from aioresponses import CallbackResult, aioresponses
+
+from revolut import exceptions
+from revolut.aio import (
+    AsyncAccount,
+    AsyncBusinessClient,
+    AsyncCounterparty,
+    AsyncMerchantClient,
+    AsyncOrder,
+)
+from revolut.business import Transaction
+from revolut.retry import RetryPolicy
+from revolut.session import RenewableSession, TemporarySession
+from revolut.tokenstore import MemoryTokenStore
+
+from . import JSONResponsesMixin
+
+
+class _LockTracingStore(MemoryTokenStore):
+    def __init__(self):
+        super(_LockTracingStore, self).__init__()
+        self.events = []
+
+    @contextlib.contextmanager
+    def lock(self, key):
+        with super(_LockTracingStore, self).lock(key):
+            self.events.append("lock")
+            yield
+            self.events.append("unlock")
+
+    def load(self, key):
+        self.events.append("load")
+        return super(_LockTracingStore, self).load(key)
+
+    def save(self, key, data):
+        self.events.append("save")
+        super(_LockTracingStore, self).save(key, data)
+
+
+class TestAsyncBusiness(IsolatedAsyncioTestCase, JSONResponsesMixin):
+    access_token = "oa_sand_lI35rv-tpvl0qsKa5OJGW5yiiXtKg7uZYB6b0jmLSCk"
+    base_url = "https://sandbox-b2b.revolut.com/api/1.0/"
+
+    async def test_404(self):
+        with aioresponses() as m:
+            m.get(
+                self.base_url + "whatever",
+                payload={"message": "The requested resource not found"},
+                status=404,
+            )
+            async with AsyncBusinessClient(TemporarySession(self.access_token)) as cli:
+                with self.assertRaises(exceptions.NotFound), self.assertLogs(
+                    "revolut.aio", "DEBUG"
+                ) as logs:
+                    await cli._get("whatever")
+            (call,) = [c for calls in m.requests.values() for c in calls]
+        self.assertEqual(["DEBUG:revolut.aio:whatever"], logs.output)
+        # without a timeout given, the class default applies rather than none at all
+        self.assertEqual(10, call.kwargs["timeout"].total)
+        self.assertEqual(10, AsyncMerchantClient("sk_test", sandbox=True).timeout)
+
+    async def test_retry(self):
+        with aioresponses() as m:
+            m.get(
+                self.base_url + "accounts",
+                payload={"message": "Too many requests"},
+                status=429,
+                headers={"Retry-After": "0"},
+            )
+            m.get(self.base_url + "accounts", payload=[])
+            async with AsyncBusinessClient(
+                TemporarySession(self.access_token), retry=RetryPolicy()
+            ) as cli:
+                self.assertEqual({}, await cli.get_accounts())
+
+    async def test_retry_gateway_error(self):
+        with aioresponses() as m:
+            m.get(
+                self.base_url + "accounts",
+                body="<html><body>502 Bad Gateway</body></html>",
+                status=502,
+                content_type="text/html",
+            )
+            m.get(self.base_url + "accounts", payload=[])
+            async with AsyncBusinessClient(
+                TemporarySession(self.access_token), retry=RetryPolicy(backoff=0)
+            ) as cli:
+                self.assertEqual({}, await cli.get_accounts())
+
+    async def test_accounts(self):
+        refresh_id = "be8932d2-bf0d-4311-808f-fe9439d592df"
+        with aioresponses() as m:
+            m.get(self.base_url + "accounts", payload=self._read("10-accounts.json"))
+            m.get(
+                self.base_url + "accounts/{}".format(refresh_id),
+                payload=self._read("20-account-{}.json".format(refresh_id)),
+            )
+            async with AsyncBusinessClient(TemporarySession(self.access_token)) as cli:
+                self.assertRaises(RuntimeError, getattr, cli, "accounts")
+                accounts = await cli.get_accounts()
+                self.assertEqual(6, len(accounts))
+                self.assertIs(accounts, cli.accounts)
+                self.assertIs(accounts, await cli.get_accounts())
+                acc = accounts[refresh_id]
+                self.assertIsInstance(acc, AsyncAccount)
+                self.assertIsInstance(acc.balance, Decimal)
+                self.assertIs(acc, await acc.refresh())
+                self.assertIsInstance(acc.updated_at, datetime)
+
+    async def test_refresh_balances(self):
+        accid = "be8932d2-bf0d-4311-808f-fe9439d592df"
+        with aioresponses() as m:
+            m.get(
+                self.base_url + "accounts",
+                payload=self._read("10-accounts.json"),
+                repeat=True,
+            )
+            m.get(
+                self.base_url + "accounts/{}".format(accid),
+                payload=self._read("20-account-{}.json".format(accid)),
+            )
+            async with AsyncBusinessClient(TemporarySession(self.access_token)) as cli:
+                snapshot = await cli.refresh_balances()
+                self.assertEqual(6, len(snapshot))
+                acc = cli.accounts[accid]
+                few = await cli.refresh_balances([accid])
+                self.assertEqual({accid: Decimal("999.5")}, few)
+                self.assertEqual(Decimal("999.5"), acc.balance)
+                self.assertEqual(Decimal(1000000), snapshot[accid])
+            async with AsyncBusinessClient(TemporarySession(self.access_token)) as cli:
+                self.assertEqual({}, await cli.refresh_balances([]))
+                self.assertEqual(6, len(cli.accounts))
+
+    async def test_pay_to_revolut(self):
+        tx_id = "a67b182e-91f0-4d03-9c04-8a5e24aff4b0"
+        with aioresponses() as m:
+            m.get(self.base_url + "accounts", payload=self._read("10-accounts.json"))
+            m.get(
+                self.base_url + "counterparties",
+                payload=self._read("20-counterparties.json"),
+            )
+            m.post(
+                self.base_url + "pay",
+                payload=self._read("30-pay-{}.json".format(tx_id)),
+            )
+            m.get(
+                self.base_url + "transaction/{}".format(tx_id),
+                payload=self._read("40-transaction-{}.json".format(tx_id)),
+            )
+            async with AsyncBusinessClient(TemporarySession(self.access_token)) as cli:
+                accounts = await cli.get_accounts()
+                tx = await accounts["be8932d2-bf0d-4311-808f-fe9439d592df"].send(
+                    "2d689cbd-1dc5-4e1b-a1bb-bc2b17c75a6c",
+                    1,
+                    "GBP",
+                    "req-{}".format(datetime.now().isoformat()),
+                    reference="A test payment of 1 GBP",
+                )
+        self.assertIsInstance(tx, Transaction)
+        self.assertEqual(tx.id, tx_id)
+        self.assertIsInstance(tx.legs[0]["amount"], Decimal)
+        self.assertIsInstance(
+            cli.counterparties[tx.legs[0]["counterparty"]["id"]], AsyncCounterparty
+        )
+
+    async def test_send_many(self):
+        txdat = self._read("40-transaction.json")
+
+        def pay(url, data, **kwargs):
+            reqdata = json.loads(data)
+            if reqdata["request_id"] == "req-1":
+                return CallbackResult(status=400, payload={"message": "Failed"})
+            return CallbackResult(payload={"id": "tx-" + reqdata["request_id"]})
+
+        def transaction(url, **kwargs):
+            return CallbackResult(payload=dict(txdat, id=url.path.rsplit("/", 1)[1]))
+
+        with aioresponses() as m:
+            m.get(self.base_url + "accounts", payload=self._read("10-accounts.json"))
+            m.get(
+                self.base_url + "counterparties",
+                payload=self._read("20-counterparties.json"),
+            )
+            m.post(self.base_url + "pay", callback=pay, repeat=True)
+            m.get(
+                re.compile(self.base_url + "transaction/.*"),
+                callback=transaction,
+                repeat=True,
+            )
+            async with AsyncBusinessClient(TemporarySession(self.access_token)) as cli:
+                accounts = await cli.get_accounts()
+                results = await accounts[
+                    "be8932d2-bf0d-4311-808f-fe9439d592df"
+                ].send_many(
+                    [
+                        ("2d689cbd-1dc5-4e1b-a1bb-bc2b17c75a6c", 1, "GBP", "req-0"),
+                        ("2d689cbd-1dc5-4e1b-a1bb-bc2b17c75a6c", 2, "GBP", "req-1"),
+                        ("2d689cbd-1dc5-4e1b-a1bb-bc2b17c75a6c", 3, "PLN", "req-2"),
+                    ],
+                    workers=2,
+                )
+        self.assertEqual("tx-req-0", results[0].transaction.id)
+        self.assertIsInstance(results[1].error, exceptions.RevolutHttpError)
+        self.assertIsInstance(results[2].error, exceptions.CurrencyMismatch)
+
+    async def test_add_counterparty_personal(self):
+        cpt_id = "6aa7d45f-ea8a-42cf-b69a-c53848d1ffd1"
+        with aioresponses() as m:
+            m.post(
+                self.base_url + "counterparty",
+                payload=self._read("10-counterparty-{}.json".format(cpt_id)),
+            )
+            m.get(
+                self.base_url + "counterparties",
+                payload=self._read("20-counterparties.json"),
+            )
+            m.post(
+                self.base_url + "counterparty",
+                payload={"message": "This counterparty already exists"},
+                status=422,
+            )
+            async with AsyncBusinessClient(TemporarySession(self.access_token)) as cli:
+                self.assertEqual(2, len(await cli.get_counterparties()))
+                cpt = AsyncCounterparty(
+                    client=cli,
+                    profile_type="personal",
+                    name="Alice Tester",
+                    phone="+4412345678901",
+                )
+                self.assertIs(cpt, await cpt.save())
+                self.assertEqual(cpt.id, cpt_id)
+                self.assertIs(cpt, cli.counterparties[cpt_id])
+                self.assertIs(cpt, cli.find_counterparty(phone="+44 1234 5678901"))
+                cpt = AsyncCounterparty(
+                    client=cli,
+                    profile_type="personal",
+                    name="Bob Tester",
+                    phone="+4412345678901",
+                )
+                with self.assertRaises(exceptions.CounterpartyAlreadyExists):
+                    await cpt.save()
+
+    async def test_refresh_token_via_renewable_session(self):
+        refresh_token = "oa_sand_gg-_wDV66wYfKKpnF4RIrpOZs2oPTwNp4TXOra5pS0g"
+        token = self._read("token-refresh_token.json")
+
+        async def issue(url, **kwargs):
+            await asyncio.sleep(0.01)  # let the other requests find no token
+            return CallbackResult(payload=token)
+
+        with aioresponses() as m:
+            m.post(self.base_url + "auth/token", callback=issue, repeat=True)
+            m.get(self.base_url + "accounts", payload=[], repeat=True)
+            sess = RenewableSession(refresh_token, "client-id", "jwt")
+            async with AsyncBusinessClient(sess) as cli, AsyncBusinessClient(
+                sess
+            ) as other:
+                await asyncio.gather(
+                    *(c._get("accounts") for c in (cli, other) for _ in range(5))
+                )
+            token_calls = [
+                c for (meth, url), c in m.requests.items() if url.path.endswith("token")
+            ]
+        # concurrent requests of the clients sharing a session trigger a single refresh
+        self.assertEqual(1, len(token_calls[0]))
+        self.assertTrue(sess.access_token)
+        self.assertIsNotNone(sess.access_token_expires)
+
+    async def test_refresh_token_via_token_store(self):
+        refresh_token = "oa_sand_gg-_wDV66wYfKKpnF4RIrpOZs2oPTwNp4TXOra5pS0g"
+        store = _LockTracingStore()
+        token = self._read("token-refresh_token.json")
+
+        def issue(url, **kwargs):
+            store.events.append("request")
+            return CallbackResult(payload=token)
+
+        with aioresponses() as m:
+            m.post(self.base_url + "auth/token", callback=issue)
+            m.get(self.base_url + "accounts", payload=[], repeat=True)
+            sess = RenewableSession(
+                refresh_token, "client-id", "jwt", token_store=store
+            )
+            async with AsyncBusinessClient(sess) as cli:
+                await asyncio.gather(*(cli._get("accounts") for _ in range(3)))
+        # the store isn't kept locked while the token is being requested
+        self.assertEqual(
+            ["lock", "load", "unlock", "request", "lock", "save", "unlock"],
+            store.events,
+        )
+        self.assertEqual(token["access_token"], store.load("client-id")["access_token"])
+
+
+class TestAsyncMerchant(IsolatedAsyncioTestCase, JSONResponsesMixin):
+    merchant_key = "sk_3TKDCGJff10gMl4nzrB0KPuwso7uZS9ASWTCebCz027E8bpRp67YK5m4gnMweCr5"
+    base_url = "https://sandbox-merchant.revolut.com/api/1.0/"
+
+    async def test_order_update(self):
+        ORDER_ID = "0f1e2ffc-6cd4-45be-8fb6-da3705cf321f"
+        with aioresponses() as m:
+            m.get(
+                self.base_url + "orders/{}".format(ORDER_ID),
+                payload=self._read("10-get_order.json"),
+            )
+            m.patch(
+                self.base_url + "orders/{}".format(ORDER_ID),
+                payload=self._read("20-order_save.json"),
+            )
+            async with AsyncMerchantClient(self.merchant_key, sandbox=True) as cli:
+                order = await cli.get_order(ORDER_ID)
+                self.assertIsInstance(order, AsyncOrder)
+                self.assertEqual(order.value, Decimal("12.34"))
+                order.value = Decimal("3.12")
+                order.currency = "EUR"
+                await order.save()
+        self.assertEqual(order.value, Decimal("3.12"))
+        self.assertEqual(order.currency, "EUR")
+
+    async def test_bulk_orders(self):
+        def get(url, **kwargs):
+            order_id = url.path.rsplit("/", 1)[1]
+            if order_id == "missing":
+                return CallbackResult(status=404, payload={"message": "Not found"})
+            return CallbackResult(payload={"id": order_id, "state": "COMPLETED"})
+
+        def create(url, data, **kwargs):
+            reqdata = json.loads(data)
+            return CallbackResult(
+                payload={"id": "order-" + reqdata["merchant_order_ext_ref"]}
+            )
+
+        with aioresponses() as m:
+            m.get(re.compile(self.base_url + "orders/.*"), callback=get, repeat=True)
+            m.post(self.base_url + "orders", callback=create, repeat=True)
+            async with AsyncMerchantClient(self.merchant_key, sandbox=True) as cli:
+                results = await cli.get_orders(["order-a", "missing", "order-b"], 2)
+                created = await cli.create_orders([(1, "GBP", "ref-0")])
+        self.assertEqual("order-a", results[0].order.id)
+        self.assertIsInstance(results[1].error, exceptions.NotFound)
+        self.assertIsInstance(results[2].order, AsyncOrder)
+        self.assertEqual("order-ref-0", created[0].order.id)
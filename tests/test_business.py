@@ -1,16 +1,21 @@
-from datetime import datetime, date
+from datetime import datetime, date, timedelta, timezone
 from decimal import Decimal
+import json
 import operator
+import re
 import responses
+import threading
 from unittest import TestCase
 
 from revolut import exceptions, utils
 from revolut.business import (
     BusinessClient,
     Account,
+    BalanceSnapshot,
     Counterparty,
     ExternalCounterparty,
     CounterpartyAccount,
+    LazyTransaction,
     Transaction,
 )
 from revolut.session import TemporarySession, RenewableSession, TokenProvider
@@ -53,6 +58,104 @@ class TestTokens(TestCase, JSONResponsesMixin):
         self.assertIsNotNone(sess.access_token)
         self.assertIn("grant_type=refresh_token", responses.calls[0].request.body)
 
+    @responses.activate
+    def test_debug_log_redacted(self):
+        access_token = "oa_prod_rPo9OmbMAuguhQffR6RLR4nvmzpx4NJtpdyvGKkrS3U"
+        responses.post(
+            self.request_url,
+            json={
+                "access_token": access_token,
+                "token_type": "bearer",
+                "expires_in": 604800,
+            },
+        )
+        with self.assertLogs("revolut.session", "DEBUG") as logs:
+            sess = RenewableSession(self.refresh_token, self.client_id, self.jwt)
+            self.assertEqual(access_token, sess.access_token)
+        output = "\n".join(logs.output)
+        self.assertIn('"access_token": "<redacted>"', output)
+        self.assertIn('"grant_type": "refresh_token"', output)
+        for secret in (self.refresh_token, self.jwt, access_token):
+            self.assertNotIn(secret, output)
+
+    @responses.activate
+    def test_proactive_refresh(self):
+        responses.add(
+            responses.POST,
+            self.request_url,
+            json={"access_token": "oa_prod_new", "expires_in": 2399},
+            status=200,
+        )
+        sess = RenewableSession(
+            self.refresh_token, self.client_id, self.jwt, access_token="oa_prod_old"
+        )
+        self.assertEqual("oa_prod_old", sess.access_token)
+        self.assertEqual(0, len(responses.calls))
+        sess.access_token_expires = datetime.utcnow() + timedelta(seconds=10)
+        self.assertEqual("oa_prod_new", sess.access_token)
+        self.assertEqual(1, len(responses.calls))
+        self.assertEqual("oa_prod_new", sess.access_token)
+        self.assertEqual(1, len(responses.calls))
+
+    @responses.activate
+    def test_concurrent_refresh(self):
+        responses.add(
+            responses.POST,
+            self.request_url,
+            json={"access_token": "oa_prod_new", "expires_in": 2399},
+            status=200,
+        )
+        sess = RenewableSession(self.refresh_token, self.client_id, self.jwt)
+        tokens = []
+        threads = [
+            threading.Thread(target=lambda: tokens.append(sess.access_token))
+            for _ in range(8)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(["oa_prod_new"] * 8, tokens)
+        self.assertEqual(1, len(responses.calls))
+        # a stale token is not refreshed again
+        self.assertEqual("oa_prod_new", sess.refresh_access_token("oa_prod_old"))
+        self.assertEqual(1, len(responses.calls))
+
+    @responses.activate
+    def test_unauthorized_retried_with_fresh_token(self):
+        responses.add(
+            responses.POST,
+            self.request_url,
+            json={"access_token": "oa_prod_new", "expires_in": 2399},
+            status=200,
+        )
+        accounts_url = "https://b2b.revolut.com/api/1.0/accounts"
+        responses.get(accounts_url, json={"message": "Unauthorized"}, status=401)
+        responses.get(accounts_url, json=[], status=200)
+        sess = RenewableSession(
+            self.refresh_token, self.client_id, self.jwt, access_token="oa_prod_old"
+        )
+        cli = BusinessClient(sess)
+        self.assertEqual({}, cli.accounts)
+        self.assertEqual(
+            "Bearer oa_prod_old", responses.calls[0].request.headers["Authorization"]
+        )
+        self.assertIn("grant_type=refresh_token", responses.calls[1].request.body)
+        self.assertEqual(
+            "Bearer oa_prod_new", responses.calls[2].request.headers["Authorization"]
+        )
+
+    @responses.activate
+    def test_unauthorized_temporary_session(self):
+        responses.get(
+            "https://b2b.revolut.com/api/1.0/accounts",
+            json={"message": "Unauthorized"},
+            status=401,
+        )
+        cli = BusinessClient(TemporarySession(self.refresh_token))
+        self.assertRaises(exceptions.Unauthorized, getattr, cli, "accounts")
+        self.assertEqual(1, len(responses.calls))
+
 
 class TestRevolutBusiness(TestCase, JSONResponsesMixin):
     access_token = "oa_sand_lI35rv-tpvl0qsKa5OJGW5yiiXtKg7uZYB6b0jmLSCk"
@@ -115,6 +218,43 @@ class TestRevolutBusiness(TestCase, JSONResponsesMixin):
         self.assertIsInstance(acc.created_at, datetime)
         self.assertIsInstance(acc.updated_at, datetime)
 
+    @responses.activate
+    def test_refresh_balances(self):
+        accid = "be8932d2-bf0d-4311-808f-fe9439d592df"
+        listing = responses.get(
+            "https://sandbox-b2b.revolut.com/api/1.0/accounts",
+            json=self._read("10-accounts.json"),
+        )
+        single = responses.get(
+            "https://sandbox-b2b.revolut.com/api/1.0/accounts/{}".format(accid),
+            json=self._read("20-account-{}.json".format(accid)),
+        )
+        cli = BusinessClient(TemporarySession(self.access_token))
+        snapshot = cli.refresh_balances()
+        self.assertIsInstance(snapshot, BalanceSnapshot)
+        self.assertEqual(6, len(snapshot))
+        self.assertEqual(1, listing.call_count)
+        self.assertIsNotNone(snapshot.fetched_at.tzinfo)
+        acc = cli.accounts[accid]
+
+        few = cli.refresh_balances([acc])
+        self.assertEqual(1, listing.call_count)
+        self.assertEqual(1, single.call_count)
+        self.assertIs(acc, cli.accounts[accid])
+        self.assertEqual({accid: Decimal("999.5")}, few)
+        self.assertEqual(Decimal(1000000), snapshot[accid])  # not affected
+        self.assertEqual({"GBP": Decimal("999.5")}, few.totals())
+
+        cli.refresh_balances(list(cli.accounts)[:4])
+        self.assertEqual(2, listing.call_count)
+        self.assertEqual(1, single.call_count)
+        self.assertRaises(KeyError, cli.refresh_balances, ["nonexistent"])
+        # no accounts selected, whether the accounts have to be loaded or not
+        self.assertEqual({}, cli.refresh_balances([]))
+        cli = BusinessClient(TemporarySession(self.access_token))
+        self.assertEqual({}, cli.refresh_balances([]))
+        self.assertEqual(3, listing.call_count)
+
     @responses.activate
     def test_counterparties(self):
         responses.add(
@@ -169,6 +309,69 @@ class TestRevolutBusiness(TestCase, JSONResponsesMixin):
             # The original mocked response would return an error here (excess counterparty)
             self.assertNotIn(cptid, cli.counterparties)
 
+    @responses.activate
+    def test_counterparty_indexes(self):
+        cpt_id = "d7d28bee-d895-4e14-a212-813babffdd8f"
+        responses.get(
+            "https://sandbox-b2b.revolut.com/api/1.0/counterparties",
+            json=self._read("10-counterparties.json"),
+        )
+        responses.post(
+            "https://sandbox-b2b.revolut.com/api/1.0/counterparty",
+            json=self._read("20-counterparty.json"),
+        )
+        responses.get(
+            "https://sandbox-b2b.revolut.com/api/1.0/counterparty/{}".format(cpt_id),
+            json=self._read("30-counterparty.json"),
+        )
+        responses.delete(
+            "https://sandbox-b2b.revolut.com/api/1.0/counterparty/{}".format(cpt_id),
+            status=204,
+        )
+        tssn = TemporarySession(self.access_token)
+        cli = BusinessClient(tssn)
+        acc = cli.find_counterparty_account(iban="DE89 3704 0044 0532 0130 00")
+        self.assertEqual("766b9814-4f87-48c6-8c9a-dbcc1b3f05c5", acc.id)
+        acc = cli.find_counterparty_account(account_no="12345678", sort_code="12-34-56")
+        self.assertEqual("GBP", acc.currency)
+        self.assertEqual("Taxalab Ltd.", cli._cptbyaccount[acc.id].name)
+        self.assertEqual(
+            "Taxalab Ltd.", cli.find_counterparty(email="Accounts@Taxalab.co.uk").name
+        )
+        self.assertEqual(
+            "Foo Bar", cli.find_counterparty(phone="+44 1234 567 8907").name
+        )
+        self.assertIsNone(cli.find_counterparty(phone="+48000000000"))
+        self.assertIsNone(
+            cli.find_counterparty_account(iban="PL50102055581111148825600052")
+        )
+
+        ncpt = ExternalCounterparty(
+            client=cli,
+            company_name="Kogucik S.A.",
+            bank_country="PL",
+            currency="PLN",
+            iban="PL50102055581111148825600052",
+        ).save()
+        self.assertIs(ncpt, cli.counterparties[cpt_id])
+        acc = cli.find_counterparty_account(iban="PL50102055581111148825600052")
+        self.assertIs(ncpt, cli._cptbyaccount[acc.id])
+        self.assertEqual(5, len(cli.counterparties))
+
+        ncpt.delete()
+        self.assertNotIn(cpt_id, cli.counterparties)
+        self.assertNotIn(acc.id, cli._cptbyaccount)
+        self.assertIsNone(
+            cli.find_counterparty_account(iban="PL50102055581111148825600052")
+        )
+        # the list has been downloaded only once
+        self.assertEqual(
+            1,
+            len(
+                [c for c in responses.calls if c.request.url.endswith("counterparties")]
+            ),
+        )
+
     @responses.activate
     def test_add_counterparty_personal(self):
         cpt_id = "6aa7d45f-ea8a-42cf-b69a-c53848d1ffd1"
@@ -451,6 +654,47 @@ class TestRevolutBusiness(TestCase, JSONResponsesMixin):
         self.assertEqual(tx.id, txns[0].id)
         self.assertEqual("<Transaction {}>".format(tx.id), repr(txns[0]))
 
+    @responses.activate
+    def test_pay_to_revolut_without_fetch(self):
+        tx_id = "a67b182e-91f0-4d03-9c04-8a5e24aff4b0"
+        responses.get(
+            "https://sandbox-b2b.revolut.com/api/1.0/accounts",
+            json=self._read("10-accounts.json"),
+        )
+        responses.get(
+            "https://sandbox-b2b.revolut.com/api/1.0/counterparties",
+            json=self._read("20-counterparties.json"),
+        )
+        responses.post(
+            "https://sandbox-b2b.revolut.com/api/1.0/pay",
+            json=self._read("30-pay-{}.json".format(tx_id)),
+        )
+        responses.get(
+            "https://sandbox-b2b.revolut.com/api/1.0/transaction/{}".format(tx_id),
+            json=self._read("40-transaction-{}.json".format(tx_id)),
+        )
+        tssn = TemporarySession(self.access_token)
+        cli = BusinessClient(tssn)
+        tx = cli.accounts["be8932d2-bf0d-4311-808f-fe9439d592df"].send(
+            "2d689cbd-1dc5-4e1b-a1bb-bc2b17c75a6c",
+            1,
+            "GBP",
+            "req-2018-11-21T14:09:57.138951",
+            reference="A test payment of 1 GBP",
+            fetch=False,
+        )
+        self.assertIsInstance(tx, LazyTransaction)
+        self.assertEqual(tx_id, tx.id)
+        self.assertEqual("completed", tx.state)
+        self.assertEqual(2018, tx.created_at.year)
+        self.assertEqual("req-2018-11-21T14:09:57.138951", tx.request_id)
+        self.assertEqual("A test payment of 1 GBP", tx.reference)
+        self.assertEqual(3, len(responses.calls))
+        self.assertEqual(Decimal(-1), tx.legs[0]["amount"])
+        self.assertEqual("transfer", tx.type)
+        self.assertEqual("out", tx.direction)
+        self.assertEqual(4, len(responses.calls))
+
     @responses.activate
     def test_pay_to_revolut_with_conversion(self):
         tx_id = "ab22ad5b-e8d7-40d9-b55c-adac6777e95b"
@@ -540,6 +784,161 @@ class TestRevolutBusiness(TestCase, JSONResponsesMixin):
             "req-{}".format(datetime.now().isoformat()),
         )
 
+    @responses.activate
+    def test_iter_transactions(self):
+        for name, query in (
+            ("10-transactions.json", {"count": "3", "from": "2022-03-01"}),
+            (
+                "20-transactions.json",
+                {
+                    "count": "3",
+                    "from": "2022-03-01",
+                    "to": "2022-03-03T12:00:00.000000Z",
+                },
+            ),
+            (
+                "30-transactions.json",
+                {
+                    "count": "3",
+                    "from": "2022-03-01",
+                    "to": "2022-03-02T12:00:00.000000Z",
+                },
+            ),
+        ):
+            responses.get(
+                "https://sandbox-b2b.revolut.com/api/1.0/transactions",
+                json=self._read(name),
+                status=200,
+                match=[responses.matchers.query_param_matcher(query)],
+            )
+        tssn = TemporarySession(self.access_token)
+        cli = BusinessClient(tssn)
+        txns = cli.iter_transactions(from_date=date(2022, 3, 1), count=3)
+        first = next(txns)
+        self.assertIsInstance(first, Transaction)
+        self.assertEqual(1, len(responses.calls))
+        txns = [first] + list(txns)
+        self.assertEqual(3, len(responses.calls))
+        self.assertEqual(
+            ["leg-{}".format(i) for i in range(1, 7)],
+            [tx.legs[0]["leg_id"] for tx in txns],
+        )
+        self.assertEqual(len(txns), len(set(tx.id for tx in txns)))
+
+    @responses.activate
+    def test_backfill_transactions(self):
+        start = datetime(2022, 3, 1)
+        dataset = [
+            {
+                "id": "tx-{:02d}".format(i),
+                "type": "transfer",
+                "state": "completed",
+                "created_at": (start + timedelta(hours=7 * i)).strftime(
+                    "%Y-%m-%dT%H:%M:%S.%fZ"
+                ),
+                "legs": [{"amount": -i, "currency": "GBP"}],
+            }
+            for i in range(40)
+        ]
+
+        def transactions(request):
+            query = request.params
+            count = int(query["count"])
+            body = [
+                txdat
+                for txdat in reversed(dataset)
+                if query["from"] <= txdat["created_at"] <= query["to"]
+            ][:count]
+            return (200, {}, json.dumps(body))
+
+        responses.add_callback(
+            responses.GET,
+            "https://sandbox-b2b.revolut.com/api/1.0/transactions",
+            callback=transactions,
+        )
+        tssn = TemporarySession(self.access_token)
+        cli = BusinessClient(tssn)
+        txns = cli.backfill_transactions(
+            start, start + timedelta(days=20), shards=3, workers=2, count=5
+        )
+        self.assertEqual(
+            [txdat["id"] for txdat in reversed(dataset)], [tx.id for tx in txns]
+        )
+        # some shards hit the page cap and had to be split
+        self.assertGreater(len(responses.calls), 8)
+        self.assertRaises(ValueError, cli.backfill_transactions, start, start)
+        for shards in (0, -2):
+            with self.assertRaises(ValueError):
+                cli.backfill_transactions(
+                    start, start + timedelta(days=1), shards=shards
+                )
+        # aware datetimes and ISO strings in UTC, with the end defaulting to now
+        aware = datetime(2022, 3, 1, 1, tzinfo=timezone(timedelta(hours=1)))
+        for args in ((aware, "2022-03-21T00:00:00Z"), (aware,)):
+            txns = cli.backfill_transactions(*args, shards=3, workers=2, count=5)
+            self.assertEqual(
+                [txdat["id"] for txdat in reversed(dataset)], [tx.id for tx in txns]
+            )
+
+    @responses.activate
+    def test_send_many(self):
+        txdat = self._read("40-transaction.json")
+        responses.get(
+            "https://sandbox-b2b.revolut.com/api/1.0/accounts",
+            json=self._read("10-accounts.json"),
+        )
+        responses.get(
+            "https://sandbox-b2b.revolut.com/api/1.0/counterparties",
+            json=self._read("20-counterparties.json"),
+        )
+
+        def pay(request):
+            reqdata = json.loads(request.body)
+            if reqdata["request_id"] == "req-3":
+                return (400, {}, json.dumps({"message": "Insufficient balance"}))
+            body = {"id": "tx-" + reqdata["request_id"], "state": "completed"}
+            return (200, {}, json.dumps(body))
+
+        def transaction(request):
+            body = dict(txdat, id=request.url.rsplit("/", 1)[1])
+            return (200, {}, json.dumps(body))
+
+        responses.add_callback(
+            responses.POST, "https://sandbox-b2b.revolut.com/api/1.0/pay", callback=pay
+        )
+        responses.add_callback(
+            responses.GET,
+            re.compile("https://sandbox-b2b.revolut.com/api/1.0/transaction/.*"),
+            callback=transaction,
+        )
+        tssn = TemporarySession(self.access_token)
+        cli = BusinessClient(tssn)
+        payments = [
+            (
+                "2d689cbd-1dc5-4e1b-a1bb-bc2b17c75a6c",
+                1,
+                "GBP",
+                "req-{}".format(i),
+                "Salary {}".format(i),
+            )
+            for i in range(10)
+        ]
+        payments[5] = ("no-such-destination", 1, "GBP", "req-5")
+        results = cli.accounts["be8932d2-bf0d-4311-808f-fe9439d592df"].send_many(
+            payments, workers=4
+        )
+        self.assertEqual(
+            ["req-{}".format(i) for i in range(10)], [r.request_id for r in results]
+        )
+        self.assertEqual([3, 5], [i for i, r in enumerate(results) if not r.ok])
+        self.assertIsInstance(results[3].error, exceptions.RevolutHttpError)
+        self.assertIsInstance(results[5].error, exceptions.DestinationNotFound)
+        self.assertIsNone(results[5].transaction)
+        self.assertEqual("tx-req-0", results[0].transaction.id)
+        self.assertIsInstance(results[0].transaction, Transaction)
+        # accounts and counterparties loaded once, 9 payments, 8 transactions fetched
+        self.assertEqual(2 + 9 + 8, len(responses.calls))
+
 
 class TestUtils(TestCase):
     def test_date(self):
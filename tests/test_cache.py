@@ -0,0 +1,102 @@
+import json
+import responses
+from unittest import TestCase
+
+from revolut.business import BusinessClient
+from revolut.cache import ClientCache, TTLCache
+from revolut.session import TemporarySession
+
+from . import FakeClock, JSONResponsesMixin
+
+
+class TestTTLCache(TestCase):
+    def test_expiry(self):
+        clock = FakeClock()
+        cache = TTLCache(ttl=10, clock=clock)
+        self.assertIsNone(cache.get("a"))
+        cache.set("a", 1)
+        self.assertEqual(1, cache.get("a"))
+        clock.now = 9.9
+        self.assertEqual(1, cache.get("a"))
+        clock.now = 10
+        self.assertEqual("gone", cache.get("a", "gone"))
+        self.assertEqual(0, len(cache))
+        self.assertEqual(
+            {"hits": 2, "misses": 2, "evictions": 0, "size": 0}, cache.stats()
+        )
+
+    def test_eviction(self):
+        cache = TTLCache(maxsize=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")  # makes "b" the least recently used
+        cache.set("c", 3)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual((1, 3), (cache.get("a"), cache.get("c")))
+        self.assertEqual(1, cache.evictions)
+        cache.invalidate("a")
+        self.assertIsNone(cache.get("a"))
+        cache.invalidate()
+        self.assertEqual(0, len(cache))
+        self.assertRaises(ValueError, TTLCache, -1)
+        self.assertRaises(ValueError, TTLCache, maxsize=0)
+
+    def test_client_cache(self):
+        cache = ClientCache(ttls={"accounts": 5})
+        self.assertEqual(5, cache["accounts"].ttl)
+        self.assertIsNone(cache["bank_details"].ttl)
+        cache.set("bank_details", {"iban": "X"}, "acc-1")
+        cache.set("accounts", {})
+        cache.invalidate("bank_details")
+        self.assertIsNone(cache.get("bank_details", "acc-1"))
+        self.assertEqual({}, cache.get("accounts"))
+        cache.invalidate()
+        self.assertIsNone(cache.get("accounts"))
+        self.assertEqual(1, cache.stats()["accounts"]["hits"])
+        self.assertRaises(ValueError, ClientCache, ttls={"balances": 1})
+
+
+class TestClientCaching(TestCase, JSONResponsesMixin):
+    access_token = "oa_sand_lI35rv-tpvl0qsKa5OJGW5yiiXtKg7uZYB6b0jmLSCk"
+
+    @responses.activate
+    def test_accounts_ttl(self):
+        data = self._read("10-accounts.json")
+        accid = data[0]["id"]
+        rsp = responses.get(
+            "https://sandbox-b2b.revolut.com/api/1.0/accounts", json=data
+        )
+        details = responses.get(
+            "https://sandbox-b2b.revolut.com/api/1.0/accounts/{}/bank-details".format(
+                accid
+            ),
+            json=[{"iban": "GB00REVO00000000000000", "bic": "REVOGB21"}],
+        )
+        clock = FakeClock()
+        cli = BusinessClient(
+            TemporarySession(self.access_token),
+            cache=ClientCache(ttls={"accounts": 60}, clock=clock),
+        )
+        acc = cli.accounts[accid]
+        self.assertIs(acc, cli.accounts[accid])
+        self.assertEqual(1, rsp.call_count)
+
+        clock.now = 61
+        data[0]["balance"] = 5
+        rsp.body = json.dumps(data)
+        self.assertIs(acc, cli.accounts[accid])
+        self.assertEqual(2, rsp.call_count)
+        self.assertEqual(5, acc.balance)
+        cli.refresh_accounts()
+        self.assertEqual(3, rsp.call_count)
+
+        self.assertEqual(acc.details(), acc.details())
+        self.assertEqual(1, details.call_count)
+        acc.details(refresh=True)
+        self.assertEqual(2, details.call_count)
+        cli.invalidate_cache("bank_details")
+        acc.details()
+        self.assertEqual(3, details.call_count)
+        stats = cli.cache.stats()
+        self.assertEqual(1, stats["bank_details"]["hits"])
+        self.assertEqual(2, stats["bank_details"]["misses"])
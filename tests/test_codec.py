@@ -0,0 +1,78 @@
+from decimal import Decimal
+import json
+import responses
+from unittest import TestCase
+
+from revolut.codec import JSONCodec, OrjsonCodec, default_codec
+from revolut.merchant import MerchantClient
+
+
+class TestCodecs(TestCase):
+    codecs = (JSONCodec(), OrjsonCodec())
+
+    def test_decimals(self):
+        body = (
+            b'{"amount": 0.1, "balance": 12345678901234567.89, "fee": 1.10,'
+            b' "count": 3, "big": 123456789012345678901234567890,'
+            b' "legs": [{"amount": -1e-7, "description": "Za\xc5\xbc\xc3\xb3\xc5\x82\xc4\x87"}]}'
+        )
+        for codec in self.codecs:
+            result = codec.loads(body)
+            self.assertEqual(result, codec.loads(body.decode("utf-8")))
+            self.assertEqual(Decimal("0.1"), result["amount"])
+            self.assertEqual("12345678901234567.89", str(result["balance"]))
+            self.assertEqual("1.10", str(result["fee"]))
+            self.assertEqual(3, result["count"])
+            self.assertEqual(123456789012345678901234567890, result["big"])
+            self.assertEqual(Decimal("-1e-7"), result["legs"][0]["amount"])
+            self.assertEqual("Zażółć", result["legs"][0]["description"])
+
+            encoded = codec.dumps(result)
+            self.assertIsInstance(encoded, bytes)
+            self.assertEqual(
+                dict(result, amount="0.1", balance="12345678901234567.89", fee="1.10"),
+                dict(json.loads(encoded), legs=result["legs"]),
+            )
+            self.assertEqual("-1E-7", json.loads(encoded)["legs"][0]["amount"])
+            self.assertRaises(TypeError, codec.dumps, {"when": object()})
+            self.assertRaises(ValueError, codec.loads, b"<html>Bad Gateway</html>")
+
+    def test_decimal_numbers(self):
+        codec = JSONCodec(decimal_numbers=True)
+        data = {
+            "amount": Decimal("-1.10"),
+            "rate": Decimal("1E-7"),
+            "legs": [{"balance": Decimal("12345678901234567.89"), "fee": None}],
+            "count": 3,
+            "description": "Zażółć",
+        }
+        encoded = codec.dumps(data)
+        self.assertEqual(
+            '{"amount":-1.10,"rate":1E-7,"legs":[{"balance":12345678901234567.89,'
+            '"fee":null}],"count":3,"description":"Zażółć"}',
+            encoded.decode("utf-8"),
+        )
+        result = codec.loads(encoded)
+        self.assertEqual(data, result)
+        self.assertEqual("-1.10", str(result["amount"]))
+        self.assertRaises(ValueError, codec.dumps, {"amount": Decimal("NaN")})
+        self.assertRaises(TypeError, codec.dumps, {1: Decimal("1.5")})
+
+    def test_default(self):
+        self.assertIsInstance(default_codec(), OrjsonCodec)
+        self.assertIs(default_codec(), default_codec())
+
+    @responses.activate
+    def test_client(self):
+        codec = JSONCodec()
+        cli = MerchantClient("sk_test", sandbox=True, codec=codec)
+        self.assertIs(codec, cli.codec)
+        self.assertIs(default_codec(), MerchantClient("sk_test", sandbox=True).codec)
+        responses.post(
+            "https://sandbox-merchant.revolut.com/api/1.0/orders",
+            body=b'{"id": "order-1", "order_amount": {"value": 1050, "currency": "EUR"},'
+            b' "metadata": {"rate": 4.2735}}',
+        )
+        result = cli._post("orders", {"amount": Decimal("10.50")})
+        self.assertEqual(b'{"amount":"10.50"}', responses.calls[0].request.body)
+        self.assertEqual(Decimal("4.2735"), result["metadata"]["rate"])
@@ -0,0 +1,120 @@
+from decimal import Decimal
+import responses
+from unittest import TestCase, mock, skipIf
+
+from revolut import columns
+from revolut.business import BusinessClient
+from revolut.merchant import MerchantClient
+from revolut.session import TemporarySession
+
+from . import JSONResponsesMixin, transaction_data
+
+try:
+    import pandas
+except ImportError:  # pragma: nocover
+    pandas = None
+
+
+TRANSACTIONS = [
+    transaction_data(
+        1,
+        "2022-03-01T10:00:00.123Z",
+        [
+            {
+                "leg_id": "leg-1a",
+                "account_id": "acc-1",
+                "amount": Decimal("-10.5"),
+                "currency": "GBP",
+                "description": "To EUR",
+            },
+            {
+                "leg_id": "leg-1b",
+                "account_id": "acc-2",
+                "amount": Decimal("12.01"),
+                "currency": "EUR",
+                "description": "From GBP",
+            },
+        ],
+    ),
+    transaction_data(
+        2,
+        "2022-03-02T10:00:00Z",
+        [
+            {
+                "leg_id": "leg-2",
+                "account_id": "acc-1",
+                "counterparty": {"id": "cpt-1", "type": "revolut"},
+                "amount": Decimal("-3"),
+                "currency": "GBP",
+            }
+        ],
+    ),
+    transaction_data(3, "2022-03-03T10:00:00Z", []),
+]
+
+
+class TestColumns(TestCase, JSONResponsesMixin):
+    access_token = "oa_sand_lI35rv-tpvl0qsKa5OJGW5yiiXtKg7uZYB6b0jmLSCk"
+
+    def test_transaction_columns(self):
+        cols = columns.transaction_columns(TRANSACTIONS)
+        self.assertEqual(3, cols.rows)
+        self.assertEqual(["tx-1", "tx-1", "tx-2"], list(cols["id"]))
+        self.assertEqual([-1050, 1201, -300], list(cols["amount"]))
+        self.assertEqual(["GBP", "EUR", "GBP"], cols.decode("currency"))
+        self.assertEqual(["acc-1", "acc-2", "acc-1"], cols.decode("account_id"))
+        self.assertEqual([None, None, "cpt-1"], list(cols["counterparty_id"]))
+        self.assertEqual(["transfer"], cols.categories["type"])
+        if columns.numpy is not None:
+            self.assertEqual("int64", cols["amount"].dtype)
+            self.assertEqual(
+                columns.numpy.datetime64("2022-03-01T10:00:00.123"),
+                cols["created_at"][0],
+            )
+            self.assertTrue(columns.numpy.isnat(cols["completed_at"]).all())
+            self.assertEqual(-1350, cols["amount"][cols["currency"] == 0].sum())  # GBP
+
+    def test_without_numpy(self):
+        with mock.patch.object(columns, "numpy", None):
+            cols = columns.transaction_columns(TRANSACTIONS)
+        self.assertIsInstance(cols["amount"], list)
+        self.assertEqual([-1050, 1201, -300], cols["amount"])
+        self.assertEqual(1646128800123000, cols["created_at"][0])
+        self.assertEqual(columns._NAT, cols["completed_at"][0])
+
+    @skipIf(pandas is None, "pandas not installed")
+    def test_to_dataframe(self):
+        df = columns.transaction_columns(TRANSACTIONS).to_dataframe()
+        self.assertEqual("category", df["currency"].dtype.name)
+        self.assertEqual(
+            {"EUR": 1201, "GBP": -1350},
+            df.groupby("currency", observed=True)["amount"].sum().to_dict(),
+        )
+        self.assertEqual(pandas.Timestamp("2022-03-02 10:00"), df["created_at"][2])
+
+    @responses.activate
+    def test_client_columns(self):
+        responses.get(
+            "https://sandbox-b2b.revolut.com/api/1.0/transactions",
+            json=[
+                dict(
+                    tx,
+                    legs=[dict(leg, amount=float(leg["amount"])) for leg in tx["legs"]],
+                )
+                for tx in TRANSACTIONS
+            ],
+        )
+        cli = BusinessClient(TemporarySession(self.access_token))
+        cols = cli.transaction_columns()
+        self.assertEqual([-1050, 1201, -300], list(cols["amount"]))
+
+        responses.get(
+            "https://sandbox-merchant.revolut.com/api/1.0/orders",
+            json=self._read("10-orders.json"),
+        )
+        cols = MerchantClient("sk_test", sandbox=True).order_columns()
+        self.assertEqual(2, cols.rows)
+        self.assertEqual([1234, 500], list(cols["amount"]))
+        self.assertEqual([0, 500], list(cols["refunded_amount"]))
+        self.assertEqual(["PLN", "GBP"], cols.decode("currency"))
+        self.assertEqual(["PENDING", "COMPLETED"], cols.decode("state"))
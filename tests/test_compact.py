@@ -0,0 +1,88 @@
+from datetime import datetime
+from dateutil.tz import tzutc
+import responses
+from unittest import TestCase
+
+from revolut.business import BusinessClient, Counterparty, Transaction
+from revolut.compact import (
+    CompactCounterparty,
+    CompactCounterpartyExternalAccount,
+    CompactOrder,
+    CompactTransaction,
+)
+from revolut.merchant import MerchantClient, Order
+from revolut.session import TemporarySession
+
+from . import JSONResponsesMixin
+
+
+class TestCompactModels(TestCase, JSONResponsesMixin):
+    access_token = "oa_sand_lI35rv-tpvl0qsKa5OJGW5yiiXtKg7uZYB6b0jmLSCk"
+
+    def test_transaction(self):
+        txdat = self._read("10-transactions.json")[0]
+        txn = CompactTransaction(client=None, **txdat)
+        ref = Transaction(client=None, **txdat)
+        self.assertFalse(hasattr(txn, "__dict__"))
+        self.assertEqual(0, txn._decoded)
+        self.assertIsInstance(txn._created_at, str)
+        for attr in ("id", "type", "state", "request_id", "reference", "direction"):
+            self.assertEqual(getattr(ref, attr), getattr(txn, attr), attr)
+        self.assertEqual(ref.created_at, txn.created_at)
+        self.assertIs(txn.created_at, txn.created_at)
+        self.assertEqual(ref.completed_at, txn.completed_at)
+        self.assertEqual(ref.legs, txn.legs)
+        self.assertIsNone(txn.reason_code)
+        with self.assertRaises(AttributeError):
+            txn.nonexistent
+
+        model = txn.to_model()
+        self.assertIsInstance(model, Transaction)
+        self.assertEqual(ref.created_at, model.created_at)
+        self.assertEqual(ref.updated_at, model.updated_at)
+        self.assertEqual(ref.legs, model.legs)
+
+    def test_counterparty(self):
+        cptdat = self._read("10-counterparty-d7d28bee-d895-4e14-a212-813babffdd8f.json")
+        cpt = CompactCounterparty(client=None, **cptdat)
+        ref = Counterparty(client=None, **cptdat)
+        self.assertEqual(ref.name, cpt.name)
+        self.assertEqual(ref.created_at, cpt.created_at)
+        self.assertEqual(set(ref.accounts), set(cpt.accounts))
+        acc = list(cpt.accounts.values())[0]
+        self.assertIsInstance(acc, CompactCounterpartyExternalAccount)
+        self.assertEqual(ref.accounts[acc.id].iban, acc.iban)
+
+        model = cpt.to_model()
+        self.assertIsInstance(model, Counterparty)
+        self.assertEqual(type(ref.accounts[acc.id]), type(model.accounts[acc.id]))
+
+    def test_order(self):
+        orddat = self._read("30-order.json")
+        order = CompactOrder(client=None, **orddat)
+        ref = Order(client=None, **orddat)
+        for attr in ("id", "state", "currency", "value", "created_at", "completed_at"):
+            self.assertEqual(getattr(ref, attr), getattr(order, attr), attr)
+        self.assertEqual(
+            datetime(2022, 8, 25, 14, 43, 13, 630804, tzinfo=tzutc()),
+            order.to_model().created_at,
+        )
+
+    @responses.activate
+    def test_clients(self):
+        responses.get(
+            "https://sandbox-b2b.revolut.com/api/1.0/transactions",
+            json=self._read("30-transactions.json"),
+        )
+        responses.get(
+            "https://sandbox-merchant.revolut.com/api/1.0/orders",
+            json=[self._read("30-order.json")],
+        )
+        cli = BusinessClient(TemporarySession(self.access_token))
+        txns = cli.transactions(compact=True)
+        self.assertTrue(txns)
+        self.assertTrue(all(isinstance(tx, CompactTransaction) for tx in txns))
+        self.assertIs(cli, txns[0].client)
+        mcli = MerchantClient("sk_test", sandbox=True)
+        orders = mcli.orders(compact=True)
+        self.assertIsInstance(orders[0], CompactOrder)
@@ -1,8 +1,11 @@
-from datetime import datetime
+from datetime import datetime, timedelta
 from decimal import Decimal
+import json
+import re
 import responses
 from unittest import TestCase
 
+from revolut import exceptions
 from revolut.merchant import (
     MerchantClient,
     Order,
@@ -147,3 +150,152 @@ class TestRevolutMerchant(TestCase, JSONResponsesMixin):
         self.assertEqual(order.value, Decimal("3.12"))
         self.assertEqual(order.currency, "EUR")
         self.assertEqual(rsp20.call_count, 1)
+
+    @responses.activate
+    def test_iter_orders(self):
+        start = datetime(2022, 3, 1)
+        dataset = [
+            {
+                "id": "order-{:02d}".format(i),
+                "type": "PAYMENT",
+                "state": "COMPLETED",
+                # pairs of orders share their creation time
+                "created_at": (start + timedelta(hours=i // 2)).strftime(
+                    "%Y-%m-%dT%H:%M:%S.%fZ"
+                ),
+                "order_amount": {"value": 100 * i, "currency": "GBP"},
+            }
+            for i in range(11)
+        ]
+
+        def orders(request):
+            query = request.params
+            body = [
+                orddat
+                for orddat in reversed(dataset)
+                if orddat["created_at"] <= query.get("to_created_date", "9")
+            ][: int(query["limit"])]
+            return (200, {}, json.dumps(body))
+
+        responses.add_callback(
+            responses.GET,
+            "https://sandbox-merchant.revolut.com/api/1.0/orders",
+            callback=orders,
+        )
+        cli = MerchantClient(self.merchant_key, sandbox=True)
+        expected = [orddat["id"] for orddat in reversed(dataset)]
+        self.assertEqual(expected, [o.id for o in cli.iter_orders(limit=3)])
+        self.assertEqual(6, len(responses.calls))
+
+        it = cli.iter_orders(limit=3)
+        seen = [next(it) for _ in range(4)]
+        self.assertIsInstance(seen[-1], Order)
+        last = seen[-1]
+        resumed = cli.iter_orders(
+            to_date=last.created_at,
+            limit=3,
+            seen_ids=[o.id for o in seen if o.created_at == last.created_at],
+        )
+        self.assertEqual(expected[4:], [o.id for o in resumed])
+        # resuming from the raw timestamp, as sent by the API
+        (created_at,) = [o["created_at"] for o in dataset if o["id"] == last.id]
+        resumed = cli.iter_orders(
+            to_date=created_at,
+            limit=3,
+            seen_ids=[o.id for o in seen if o.created_at == last.created_at],
+        )
+        self.assertEqual(expected[4:], [o.id for o in resumed])
+        self.assertEqual(
+            expected, [o.id for o in cli.iter_orders(limit=3, compact=True)]
+        )
+
+    @responses.activate
+    def test_iter_orders_same_time(self):
+        dataset = [
+            {
+                "id": "order-{:02d}".format(i),
+                "type": "PAYMENT",
+                "state": "COMPLETED",
+                # more orders than fit a page share their creation time
+                "created_at": "2022-03-01T10:00:00.{:06d}Z".format(0 if i < 7 else i),
+                "order_amount": {"value": 100 * i, "currency": "GBP"},
+            }
+            for i in range(9)
+        ]
+        limits = []
+
+        def orders(request):
+            query = request.params
+            limits.append(int(query["limit"]))
+            body = [
+                orddat
+                for orddat in reversed(dataset)
+                if orddat["created_at"] <= query.get("to_created_date", "9")
+            ][: int(query["limit"])]
+            return (200, {}, json.dumps(body))
+
+        responses.add_callback(
+            responses.GET,
+            "https://sandbox-merchant.revolut.com/api/1.0/orders",
+            callback=orders,
+        )
+        cli = MerchantClient(self.merchant_key, sandbox=True)
+        self.assertEqual(
+            sorted(orddat["id"] for orddat in dataset),
+            sorted(o.id for o in cli.iter_orders(limit=2)),
+        )
+        self.assertEqual([2, 2, 2, 4, 6, 8], limits)
+
+    @responses.activate
+    def test_bulk_orders(self):
+        def create(request):
+            reqdata = json.loads(request.body)
+            if reqdata["merchant_order_ext_ref"] == "ref-1":
+                return (400, {}, json.dumps({"message": "Invalid currency"}))
+            return (
+                200,
+                {},
+                json.dumps(
+                    {
+                        "id": "order-" + reqdata["merchant_order_ext_ref"],
+                        "state": "PENDING",
+                        "order_amount": {
+                            "value": reqdata["amount"],
+                            "currency": reqdata["currency"],
+                        },
+                    }
+                ),
+            )
+
+        def get(request):
+            order_id = request.path_url.rsplit("/", 1)[1]
+            if order_id == "missing":
+                return (404, {}, json.dumps({"message": "Not found"}))
+            return (200, {}, json.dumps({"id": order_id, "state": "COMPLETED"}))
+
+        responses.add_callback(
+            responses.POST,
+            "https://sandbox-merchant.revolut.com/api/1.0/orders",
+            callback=create,
+        )
+        responses.add_callback(
+            responses.GET,
+            re.compile("https://sandbox-merchant.revolut.com/api/1.0/orders/.*"),
+            callback=get,
+        )
+        cli = MerchantClient(self.merchant_key, sandbox=True)
+        results = cli.create_orders(
+            [(Decimal(i), "GBP", "ref-{}".format(i)) for i in range(5)], workers=3
+        )
+        self.assertEqual(
+            [True, False, True, True, True], [result.ok for result in results]
+        )
+        self.assertEqual("order-ref-4", results[4].order.id)
+        self.assertEqual(Decimal("4.00"), results[4].order.value)
+        self.assertIsInstance(results[1].error, exceptions.BadRequest)
+        self.assertEqual((Decimal(1), "GBP", "ref-1"), results[1].item)
+
+        results = cli.get_orders(["order-a", "missing", "order-b"])
+        self.assertEqual("order-a", results[0].order.id)
+        self.assertIsInstance(results[1].error, exceptions.NotFound)
+        self.assertEqual("order-b", results[2].order.id)
@@ -0,0 +1,149 @@
+import math
+import responses
+from unittest import IsolatedAsyncioTestCase, TestCase
+
+from aioresponses import aioresponses
+
+from revolut import exceptions
+from revolut.aio import AsyncBusinessClient
+from revolut.merchant import MerchantClient
+from revolut.metrics import Metrics, endpoint_template
+from revolut.ratelimit import RateLimiter, TokenBucket
+from revolut.retry import RetryPolicy
+from revolut.session import TemporarySession
+
+from . import FakeClock
+
+ORDER_ID = "6516e61c-d279-a454-a837-bc52ce55ed49"
+MERCHANT_URL = "https://sandbox-merchant.revolut.com/api/1.0/"
+
+
+class TestMetrics(TestCase):
+    def test_endpoint_template(self):
+        for path, template in (
+            ("accounts", "accounts"),
+            ("accounts/be8932d2-bf0d-4311-808f-fe9439d592df", "accounts/{id}"),
+            (
+                "accounts/be8932d2-bf0d-4311-808f-fe9439d592df/bank-details",
+                "accounts/{id}/bank-details",
+            ),
+            ("transaction/req-1?id_type=request_id", "transaction/{id}"),
+            ("transactions?count=1000&to=2022-01-01", "transactions"),
+            ("orders/{}/capture".format(ORDER_ID), "orders/{id}/capture"),
+            ("pay", "pay"),
+            ("exchange-rate/12345", "exchange-rate/{id}"),
+        ):
+            self.assertEqual(template, endpoint_template(path))
+
+    def test_export(self):
+        clock = FakeClock()
+        metrics = Metrics(buckets=(0.125, 1), clock=clock)
+        metrics.call("GET", "accounts/1")
+        metrics.status("GET", "accounts/2", 200)
+        metrics.exception(
+            "GET", "accounts/3", exceptions.NotFound(404, 'No "such" one')
+        )
+        metrics.retry("GET", "accounts/4")
+        metrics.throttle("POST", "pay", 0.25)
+        for seconds in (0.0625, 0.125, 0.5, 3):
+            with metrics.timing("GET", "accounts/5", "network"):
+                clock.now += seconds
+        snapshot = metrics.snapshot()
+        self.assertEqual(["GET accounts/{id}", "POST pay"], list(snapshot))
+        ep = snapshot["GET accounts/{id}"]
+        self.assertEqual((1, 1, 0), (ep["calls"], ep["retries"], ep["throttled"]))
+        self.assertEqual({200: 1}, ep["statuses"])
+        self.assertEqual({"NotFound": 1}, ep["exceptions"])
+        self.assertEqual(["network"], list(ep["phases"]))
+        self.assertEqual(
+            {0.125: 2, 1: 3, math.inf: 4}, ep["phases"]["network"]["buckets"]
+        )
+        self.assertEqual(3.6875, ep["phases"]["network"]["sum"])
+        self.assertEqual(0.25, snapshot["POST pay"]["throttle_seconds"])
+
+        text = metrics.prometheus()
+        for line in (
+            "# TYPE revolut_client_calls_total counter",
+            'revolut_client_calls_total{method="GET",endpoint="accounts/{id}"} 1',
+            'revolut_client_calls_total{method="POST",endpoint="pay"} 0',
+            'revolut_client_throttle_seconds_total{method="POST",endpoint="pay"} 0.25',
+            'revolut_client_responses_total{method="GET",endpoint="accounts/{id}",status="200"} 1',
+            'revolut_client_exceptions_total{method="GET",endpoint="accounts/{id}",exception="NotFound"} 1',
+            "# TYPE revolut_client_phase_seconds histogram",
+            'revolut_client_phase_seconds_bucket{method="GET",endpoint="accounts/{id}",phase="network",le="0.125"} 2',
+            'revolut_client_phase_seconds_bucket{method="GET",endpoint="accounts/{id}",phase="network",le="+Inf"} 4',
+            'revolut_client_phase_seconds_count{method="GET",endpoint="accounts/{id}",phase="network"} 4',
+        ):
+            self.assertIn(line, text.splitlines())
+        metrics.reset()
+        self.assertEqual({}, metrics.snapshot())
+
+    @responses.activate
+    def test_client(self):
+        responses.get(MERCHANT_URL + "orders", json=[{"id": ORDER_ID}] * 3)
+        responses.get(
+            MERCHANT_URL + "orders/" + ORDER_ID,
+            json={"message": "Service unavailable"},
+            status=503,
+        )
+        responses.get(MERCHANT_URL + "orders/" + ORDER_ID, json={"id": ORDER_ID})
+        responses.get(
+            MERCHANT_URL + "orders/missing", json={"message": "Not found"}, status=404
+        )
+        metrics = Metrics()
+        cli = MerchantClient(
+            "sk_test",
+            sandbox=True,
+            retry=RetryPolicy(backoff=0),
+            rate_limiter=RateLimiter(read=TokenBucket(rate=50, burst=1)),
+            metrics=metrics,
+        )
+        self.assertEqual(3, len(cli.orders()))
+        cli.get_order(ORDER_ID)
+        self.assertRaises(exceptions.NotFound, cli.get_order, "missing")
+
+        snapshot = metrics.snapshot()
+        orders = snapshot["GET orders"]
+        self.assertEqual(1, orders["calls"])
+        self.assertEqual({200: 1}, orders["statuses"])
+        self.assertEqual(
+            {"network": 1, "decode": 1, "models": 1},
+            {phase: hist["count"] for phase, hist in orders["phases"].items()},
+        )
+        order = snapshot["GET orders/{id}"]
+        self.assertEqual((2, 1), (order["calls"], order["retries"]))
+        self.assertEqual({200: 1, 404: 1, 503: 1}, order["statuses"])
+        self.assertEqual({"ServiceUnavailable": 1, "NotFound": 1}, order["exceptions"])
+        self.assertEqual(3, order["phases"]["network"]["count"])
+        self.assertGreater(order["throttled"], 0)
+        self.assertGreater(order["throttle_seconds"], 0)
+
+
+class TestAsyncMetrics(IsolatedAsyncioTestCase):
+    access_token = "oa_sand_lI35rv-tpvl0qsKa5OJGW5yiiXtKg7uZYB6b0jmLSCk"
+    base_url = "https://sandbox-b2b.revolut.com/api/1.0/"
+
+    async def test_client(self):
+        metrics = Metrics()
+        with aioresponses() as m:
+            m.get(
+                self.base_url + "counterparties",
+                payload={"message": "Too many requests"},
+                status=429,
+                headers={"Retry-After": "0"},
+            )
+            m.get(self.base_url + "counterparties", payload=[])
+            async with AsyncBusinessClient(
+                TemporarySession(self.access_token),
+                retry=RetryPolicy(),
+                metrics=metrics,
+            ) as cli:
+                self.assertEqual({}, await cli.get_counterparties())
+        ep = metrics.snapshot()["GET counterparties"]
+        self.assertEqual((1, 1), (ep["calls"], ep["retries"]))
+        self.assertEqual({200: 1, 429: 1}, ep["statuses"])
+        self.assertEqual({"TooManyRequests": 1}, ep["exceptions"])
+        self.assertEqual(
+            {"network": 2, "decode": 2, "models": 1},
+            {phase: hist["count"] for phase, hist in ep["phases"].items()},
+        )
@@ -0,0 +1,166 @@
+import json
+import os
+import re
+import responses
+import tempfile
+from unittest import TestCase
+
+from revolut.business import BusinessClient
+from revolut.outbox import PaymentOutbox
+from revolut.session import TemporarySession
+
+from . import JSONResponsesMixin
+
+ACCOUNT_ID = "be8932d2-bf0d-4311-808f-fe9439d592df"
+DEST_ID = "2d689cbd-1dc5-4e1b-a1bb-bc2b17c75a6c"
+
+
+class TestPaymentOutbox(TestCase, JSONResponsesMixin):
+    access_token = "oa_sand_lI35rv-tpvl0qsKa5OJGW5yiiXtKg7uZYB6b0jmLSCk"
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "outbox.db")
+        self.made = {}  # request_id: transaction data, as seen by the API
+        self.failures = {}  # request_id: (status, message) of the next attempt
+        self.garbled = set()  # request_ids made, but with an undecodable response
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def _mock_api(self, accounts, counterparties):
+        responses.get("https://sandbox-b2b.revolut.com/api/1.0/accounts", json=accounts)
+        responses.get(
+            "https://sandbox-b2b.revolut.com/api/1.0/counterparties",
+            json=counterparties,
+        )
+
+        def pay(request):
+            reqdata = json.loads(request.body)
+            rid = reqdata["request_id"]
+            if rid in self.failures:
+                status, message = self.failures.pop(rid)
+                if status == 503:  # NOTE: made, but the response got lost
+                    self.made[rid] = {"id": "tx-" + rid, "state": "completed"}
+                return (status, {}, json.dumps({"message": message}))
+            if rid in self.garbled:
+                self.garbled.remove(rid)
+                self.made[rid] = {"id": "tx-" + rid, "state": "completed"}
+                return (200, {}, "<html>Bad gateway</html>")
+            txdat = self.made.setdefault(rid, {"id": "tx-" + rid, "state": "pending"})
+            return (200, {}, json.dumps(txdat))
+
+        def transaction(request):
+            self.assertEqual("request_id", request.params["id_type"])
+            rid = request.path_url.split("?")[0].rsplit("/", 1)[1]
+            if rid not in self.made:
+                return (404, {}, json.dumps({"message": "Not found"}))
+            return (200, {}, json.dumps(dict(self.made[rid], request_id=rid)))
+
+        responses.add_callback(
+            responses.POST, "https://sandbox-b2b.revolut.com/api/1.0/pay", callback=pay
+        )
+        responses.add_callback(
+            responses.GET,
+            re.compile("https://sandbox-b2b.revolut.com/api/1.0/transaction/.*"),
+            callback=transaction,
+        )
+        return BusinessClient(TemporarySession(self.access_token))
+
+    @responses.activate
+    def test_run(self):
+        cli = self._mock_api(
+            self._read("10-accounts.json"), self._read("20-counterparties.json")
+        )
+        outbox = PaymentOutbox(cli, self.path, workers=3, batch_size=4)
+        rids = outbox.add_many(
+            [(ACCOUNT_ID, DEST_ID, 1, "GBP", "req-{}".format(i)) for i in range(8)]
+            + [(ACCOUNT_ID, "no-such-destination", 1, "GBP", "req-8")]
+        )
+        self.assertEqual("req-0", outbox.add(ACCOUNT_ID, DEST_ID, 5, "GBP", "req-0"))
+        generated = outbox.add(ACCOUNT_ID, DEST_ID, 2, "GBP", reference="Invoice 1")
+        self.assertNotIn(generated, rids)
+        self.assertEqual({"pending": 10}, outbox.counts())
+
+        self.failures = {
+            "req-1": (503, "Service unavailable"),
+            "req-2": (400, "Insufficient balance"),
+            "req-3": (429, "Too many requests"),
+        }
+        self.assertEqual(6, outbox.run())
+        self.assertEqual(
+            {"sent": 6, "failed": 2, "sending": 1, "pending": 1}, outbox.counts()
+        )
+        sent = {p.request_id: p for p in outbox.payments("sent")}
+        self.assertEqual("tx-req-0", sent["req-0"].transaction_id)
+        self.assertEqual("pending", sent["req-0"].transaction_state)
+        self.assertEqual(1, sent["req-0"].amount)
+        self.assertEqual("Invoice 1", sent[generated].reference)
+        failed = {p.request_id: p for p in outbox.payments("failed")}
+        self.assertIn("BadRequest", failed["req-2"].error)
+        self.assertIn("DestinationNotFound", failed["req-8"].error)
+
+        # the lost response is reconciled, the rate-limited payment sent again
+        self.assertEqual(2, outbox.run())
+        self.assertEqual({"sent": 8, "failed": 2}, outbox.counts())
+        paid = [
+            json.loads(call.request.body)["request_id"]
+            for call in responses.calls
+            if call.request.url.endswith("/pay")
+        ]
+        self.assertEqual(1, paid.count("req-0"))
+        self.assertEqual(1, paid.count("req-1"))
+        self.assertEqual(0, outbox.run())
+        outbox.close()
+
+    @responses.activate
+    def test_crash_recovery(self):
+        cli = self._mock_api(
+            self._read("10-accounts.json"), self._read("20-counterparties.json")
+        )
+        outbox = PaymentOutbox(cli, self.path)
+        outbox.add_many(
+            [(ACCOUNT_ID, DEST_ID, 1, "GBP", "req-{}".format(i)) for i in range(3)]
+        )
+        # the process dies after claiming the payments and making one of them
+        outbox._claim("9999")
+        self.made["req-1"] = {"id": "tx-req-1", "state": "completed"}
+        outbox.close()
+
+        outbox = PaymentOutbox(cli, self.path)
+        self.assertEqual({"sending": 3}, outbox.counts())
+        self.assertEqual(3, outbox.run())
+        payments = outbox.payments()
+        self.assertEqual(["sent"] * 3, [p.state for p in payments])
+        self.assertEqual([2, 1, 2], [p.attempts for p in payments])
+        self.assertEqual("completed", payments[1].transaction_state)
+        outbox.close()
+
+    @responses.activate
+    def test_failed_transactions(self):
+        cli = self._mock_api(
+            self._read("10-accounts.json"), self._read("20-counterparties.json")
+        )
+        outbox = PaymentOutbox(cli, self.path)
+        outbox.add_many(
+            [(ACCOUNT_ID, DEST_ID, 1, "GBP", "req-{}".format(i)) for i in range(4)]
+        )
+        outbox._claim("9999")
+        self.made["req-0"] = {"id": "tx-req-0", "state": "declined"}
+        self.made["req-1"] = {"id": "tx-req-1", "state": "completed"}
+        self.assertEqual(1, outbox.reconcile())
+        self.assertEqual({"sent": 1, "failed": 1, "pending": 2}, outbox.counts())
+
+        # a transaction failed upon sending and a response lost after sending
+        self.made["req-2"] = {"id": "tx-req-2", "state": "failed"}
+        self.garbled.add("req-3")
+        self.assertEqual(0, outbox.run())
+        self.assertEqual({"sent": 1, "failed": 2, "sending": 1}, outbox.counts())
+        failed = {p.request_id: p for p in outbox.payments("failed")}
+        self.assertEqual("declined", failed["req-0"].transaction_state)
+        self.assertEqual("tx-req-2", failed["req-2"].transaction_id)
+        self.assertIsNone(failed["req-2"].error)
+
+        self.assertEqual(1, outbox.run())
+        self.assertEqual({"sent": 2, "failed": 2}, outbox.counts())
+        outbox.close()
@@ -0,0 +1,97 @@
+import os
+import responses
+import tempfile
+import threading
+from unittest import TestCase
+
+from revolut.business import BusinessClient
+from revolut.ratelimit import FileTokenBucket, RateLimiter, TokenBucket
+from revolut.session import TemporarySession
+
+from . import FakeClock
+
+
+class TestTokenBucket(TestCase):
+    def test_reserve(self):
+        clock = FakeClock()
+        bucket = TokenBucket(2, burst=3, clock=clock)
+        self.assertEqual([0, 0, 0], [bucket.reserve() for _ in range(3)])
+        self.assertAlmostEqual(0.5, bucket.reserve())
+        clock.now = 0.5
+        self.assertEqual(0, bucket.reserve())
+        self.assertAlmostEqual(0.5, bucket.reserve())
+        clock.now = 100
+        self.assertEqual([0, 0, 0], [bucket.reserve() for _ in range(3)])
+        self.assertGreater(bucket.reserve(), 0)
+        self.assertRaises(ValueError, TokenBucket, 0)
+
+    def test_slow_rate(self):
+        clock = FakeClock()
+        bucket = TokenBucket(0.5, clock=clock)
+        self.assertEqual(1.0, bucket.burst)
+        self.assertEqual(0, bucket.reserve())
+        self.assertAlmostEqual(2.0, bucket.reserve())
+        clock.now = 2.0
+        self.assertEqual(0, bucket.reserve())
+        self.assertRaises(ValueError, bucket.reserve, 2)
+        self.assertRaises(ValueError, TokenBucket(2, burst=0.5).reserve)
+
+    def test_threads(self):
+        clock = FakeClock()
+        bucket = TokenBucket(1, burst=50, clock=clock)
+        granted = []
+
+        def worker():
+            for _ in range(20):
+                granted.append(bucket.reserve() == 0)
+
+        threads = [threading.Thread(target=worker) for _ in range(5)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(50, sum(granted))
+
+    def test_file_bucket_shared(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "bucket")
+            first = FileTokenBucket(path, 0.001, burst=3)
+            second = FileTokenBucket(path, 0.001, burst=3)
+            try:
+                self.assertEqual(0, first.reserve())
+                self.assertEqual(0, second.reserve())
+                self.assertEqual(0, first.reserve())
+                self.assertGreater(second.reserve(), 0)
+                self.assertGreater(first.reserve(), 0)
+            finally:
+                first.close()
+                second.close()
+
+
+class TestRateLimiter(TestCase):
+    access_token = "oa_sand_lI35rv-tpvl0qsKa5OJGW5yiiXtKg7uZYB6b0jmLSCk"
+
+    def test_classify(self):
+        limiter = RateLimiter()
+        self.assertEqual("read", limiter.classify("get", "accounts"))
+        self.assertEqual("payment", limiter.classify("POST", "pay"))
+        self.assertEqual("payment", limiter.classify("POST", "transfer"))
+        self.assertEqual("write", limiter.classify("POST", "counterparty"))
+        self.assertEqual("write", limiter.classify("DELETE", "counterparty/1"))
+        self.assertEqual(0, limiter.acquire("GET", "accounts"))
+
+    @responses.activate
+    def test_client(self):
+        clock = FakeClock()
+        read = TokenBucket(1, burst=1, clock=clock)
+        payment = TokenBucket(1, burst=5, clock=clock)
+        cli = BusinessClient(
+            TemporarySession(self.access_token),
+            rate_limiter=RateLimiter(read=read, payment=payment),
+        )
+        responses.get("https://sandbox-b2b.revolut.com/api/1.0/accounts", json=[])
+        responses.post("https://sandbox-b2b.revolut.com/api/1.0/pay", json={})
+        cli._get("accounts")
+        cli._post("pay", {"request_id": "r1"})
+        self.assertGreater(read.reserve(), 0)
+        self.assertEqual(4, sum(payment.reserve() == 0 for _ in range(5)))
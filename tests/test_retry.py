@@ -0,0 +1,114 @@
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+import requests
+import responses
+from unittest import TestCase
+
+from revolut import exceptions
+from revolut.business import BusinessClient
+from revolut.merchant import MerchantClient
+from revolut.retry import RetryPolicy, _parse_retry_after
+from revolut.session import TemporarySession
+
+
+class TestRetryPolicy(TestCase):
+    def test_idempotency(self):
+        policy = RetryPolicy()
+        self.assertTrue(policy.is_idempotent("get", "accounts"))
+        self.assertTrue(policy.is_idempotent("DELETE", "counterparty/1"))
+        self.assertTrue(policy.is_idempotent("POST", "pay", {"request_id": "r1"}))
+        self.assertTrue(policy.is_idempotent("POST", "transfer", {"request_id": "r1"}))
+        self.assertFalse(policy.is_idempotent("POST", "pay", {}))
+        self.assertFalse(policy.is_idempotent("POST", "counterparty", {"name": "X"}))
+        self.assertFalse(policy.is_idempotent("PATCH", "orders/1", {}))
+
+    def test_disabled(self):
+        error = exceptions.ServiceUnavailable(503, "Service unavailable")
+        self.assertTrue(RetryPolicy().should_retry("GET", "accounts", None, error, 1))
+        policy = RetryPolicy(max_attempts=0, backoff=0, max_backoff=0)
+        self.assertEqual(
+            (0, 0, 0), (policy.max_attempts, policy.backoff, policy.max_backoff)
+        )
+        self.assertFalse(policy.should_retry("GET", "accounts", None, error, 1))
+
+    def test_delay(self):
+        policy = RetryPolicy(backoff=1, max_backoff=5, jitter=False)
+        self.assertEqual([1, 2, 4, 5], [policy.delay(a) for a in range(1, 5)])
+        self.assertEqual(3, policy.delay(1, retry_after=3))
+        self.assertEqual(5, policy.delay(1, retry_after=3600))
+        policy = RetryPolicy(backoff=1, max_backoff=5)
+        for attempt in range(1, 10):
+            self.assertTrue(0 <= policy.delay(attempt) <= 5)
+
+    def test_parse_retry_after(self):
+        self.assertIsNone(_parse_retry_after(None))
+        self.assertIsNone(_parse_retry_after("whenever"))
+        self.assertEqual(3.0, _parse_retry_after("3"))
+        when = datetime.now(timezone.utc) + timedelta(seconds=30)
+        self.assertAlmostEqual(
+            30, _parse_retry_after(format_datetime(when, usegmt=True)), delta=2
+        )
+
+
+class TestClientRetry(TestCase):
+    access_token = "oa_sand_lI35rv-tpvl0qsKa5OJGW5yiiXtKg7uZYB6b0jmLSCk"
+    base_url = "https://sandbox-b2b.revolut.com/api/1.0/"
+    retry = RetryPolicy(max_attempts=3, backoff=0, jitter=False)
+
+    def _client(self):
+        return BusinessClient(TemporarySession(self.access_token), retry=self.retry)
+
+    @responses.activate
+    def test_get_retried_after_throttling(self):
+        responses.get(
+            self.base_url + "accounts",
+            json={"message": "Too many requests"},
+            status=429,
+            headers={"Retry-After": "0"},
+        )
+        responses.get(
+            self.base_url + "accounts", body="<html>Bad gateway</html>", status=502
+        )
+        responses.get(self.base_url + "accounts", json=[], status=200)
+        self.assertEqual({}, self._client().accounts)
+        self.assertEqual(3, len(responses.calls))
+
+    @responses.activate
+    def test_attempts_exhausted(self):
+        responses.get(self.base_url + "accounts", json={}, status=503)
+        self.assertRaises(
+            exceptions.ServiceUnavailable, getattr, self._client(), "accounts"
+        )
+        self.assertEqual(3, len(responses.calls))
+
+    @responses.activate
+    def test_connection_error_retried(self):
+        responses.get(self.base_url + "transaction/1", body=requests.ConnectionError())
+        responses.get(
+            self.base_url + "transaction/1",
+            json={"id": "1", "state": "completed", "legs": []},
+            status=200,
+        )
+        self.assertEqual("1", self._client().transaction("1").id)
+
+    @responses.activate
+    def test_post_retried_only_with_request_id(self):
+        cli = self._client()
+        responses.post(self.base_url + "pay", json={}, status=500)
+        responses.post(self.base_url + "pay", json={"id": "1"}, status=200)
+        self.assertEqual({"id": "1"}, cli._post("pay", {"request_id": "r1"}))
+        self.assertEqual(2, len(responses.calls))
+        responses.post(self.base_url + "counterparty", json={}, status=500)
+        self.assertRaises(
+            exceptions.InternalServerError, cli._post, "counterparty", {"name": "X"}
+        )
+        self.assertEqual(3, len(responses.calls))
+
+    @responses.activate
+    def test_no_retry_by_default(self):
+        responses.get(
+            "https://sandbox-merchant.revolut.com/api/1.0/orders/1", json={}, status=503
+        )
+        cli = MerchantClient("sk_key", sandbox=True)
+        self.assertRaises(exceptions.ServiceUnavailable, cli.get_order, "1")
+        self.assertEqual(1, len(responses.calls))
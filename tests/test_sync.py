@@ -0,0 +1,87 @@
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+import responses
+from unittest import TestCase
+
+from revolut.business import BusinessClient, Transaction
+from revolut.session import TemporarySession
+from revolut.sync import TransactionSync
+
+from . import transaction_data
+
+
+class TestTransactionSync(TestCase):
+    access_token = "oa_sand_lI35rv-tpvl0qsKa5OJGW5yiiXtKg7uZYB6b0jmLSCk"
+    url = "https://sandbox-b2b.revolut.com/api/1.0/transactions"
+
+    def setUp(self):
+        self.cli = BusinessClient(TemporarySession(self.access_token))
+        self.sync = TransactionSync(self.cli, ":memory:", lookback=timedelta(days=2))
+
+    def tearDown(self):
+        self.sync.close()
+
+    @responses.activate
+    def test_sync(self):
+        responses.get(
+            self.url,
+            json=[
+                transaction_data(3, "2022-03-10T10:00:00.000Z", state="pending"),
+                transaction_data(2, "2022-03-09T10:00:00.000Z", account_id="acc-2"),
+                transaction_data(1, "2022-03-01T10:00:00.000Z"),
+            ],
+            match=[responses.matchers.query_param_matcher({"count": "1000"})],
+        )
+        self.assertIsNone(self.sync.high_water())
+        self.assertEqual(3, self.sync.sync())
+        self.assertEqual(datetime(2022, 3, 10, 10), self.sync.high_water())
+
+        responses.get(
+            self.url,
+            json=[
+                transaction_data(4, "2022-03-11T10:00:00.000Z"),
+                transaction_data(3, "2022-03-10T10:00:00.000Z"),
+            ],
+            match=[
+                responses.matchers.query_param_matcher(
+                    {"count": "1000", "from": "2022-03-08"}
+                )
+            ],
+        )
+        self.assertEqual(2, self.sync.sync())
+        self.assertEqual(datetime(2022, 3, 11, 10), self.sync.high_water())
+        self.assertEqual(2, len(responses.calls))
+
+        txns = self.sync.transactions()
+        self.assertEqual(["tx-4", "tx-3", "tx-2", "tx-1"], [tx.id for tx in txns])
+        self.assertIsInstance(txns[0], Transaction)
+        self.assertIsInstance(txns[0].created_at, datetime)
+        self.assertEqual(Decimal("-6.0"), txns[0].legs[0]["amount"])
+        self.assertEqual(Decimal("100.1"), txns[0].legs[0]["balance"])
+        self.assertIsInstance(txns[0].legs[0]["balance"], Decimal)
+        self.assertEqual("completed", txns[1].state)
+        self.assertEqual(
+            ["tx-2"], [tx.id for tx in self.sync.transactions(account="acc-2")]
+        )
+        self.assertEqual(
+            ["tx-4", "tx-3"],
+            [tx.id for tx in self.sync.transactions(from_date=date(2022, 3, 10))],
+        )
+        self.assertEqual([], self.sync.transactions(state="pending"))
+        self.assertEqual(2, len(responses.calls))
+
+    @responses.activate
+    def test_sync_per_account(self):
+        responses.get(
+            self.url,
+            json=[transaction_data(1, "2022-03-01T10:00:00.000Z")],
+            match=[
+                responses.matchers.query_param_matcher(
+                    {"count": "1000", "account": "acc-1"}
+                )
+            ],
+        )
+        self.assertEqual(1, self.sync.sync(account="acc-1"))
+        self.assertEqual(datetime(2022, 3, 1, 10), self.sync.high_water("acc-1"))
+        self.assertIsNone(self.sync.high_water("acc-2"))
+        self.assertIsNone(self.sync.high_water())
@@ -0,0 +1,106 @@
+from datetime import datetime, timedelta
+import os
+import responses
+import tempfile
+from unittest import TestCase
+
+from revolut.session import RenewableSession, TokenProvider
+from revolut.tokenstore import FileTokenStore, MemoryTokenStore, SQLiteTokenStore
+
+
+class TokenStoreTestMixin(object):
+    client_id = "rmPBoIc-LR3ObABUn-NKHq6WyEoCr6Lh__DFohuMRVM"
+    jwt = "eyJhbGciOiJIUzI1NiIsInR5cCI6IkpXVCJ9.e30.SflKxwRJSMeKKF2QT4fwpMeJf36POk6yJV"
+    refresh_token = "oa_prod_gg-_wDV66wYfKKpnF4RIrpOZs2oPTwNp4TXOra5pS0g"
+    request_url = "https://b2b.revolut.com/api/1.0/auth/token"
+
+    def _session(self):
+        return RenewableSession(
+            self.refresh_token, self.client_id, self.jwt, token_store=self.store
+        )
+
+    @responses.activate
+    def test_shared_token(self):
+        responses.post(
+            self.request_url,
+            json={
+                "access_token": "oa_prod_first",
+                "expires_in": 2399,
+                "refresh_token": "oa_prod_rotated",
+            },
+        )
+        first = self._session()
+        self.assertEqual("oa_prod_first", first.access_token)
+        self.assertEqual(1, len(responses.calls))
+        # a fresh worker takes the token from the store
+        second = self._session()
+        self.assertEqual("oa_prod_first", second.access_token)
+        self.assertEqual("oa_prod_rotated", second.refresh_token)
+        self.assertEqual(first.access_token_expires, second.access_token_expires)
+        self.assertEqual(1, len(responses.calls))
+
+    @responses.activate
+    def test_expired_token(self):
+        responses.post(
+            self.request_url, json={"access_token": "oa_prod_new", "expires_in": 2399}
+        )
+        with self.store.lock(self.client_id):
+            self.store.save(
+                self.client_id,
+                {
+                    "access_token": "oa_prod_old",
+                    "access_token_expires": (
+                        datetime.utcnow() - timedelta(seconds=1)
+                    ).isoformat(),
+                    "refresh_token": "oa_prod_stored",
+                },
+            )
+        sess = self._session()
+        self.assertEqual("oa_prod_new", sess.access_token)
+        self.assertIn("refresh_token=oa_prod_stored", responses.calls[0].request.body)
+        self.assertEqual("oa_prod_new", self.store.load(self.client_id)["access_token"])
+        # a rejected token is refreshed even if the store still holds it
+        self.assertEqual("oa_prod_new", sess.refresh_access_token())
+        self.assertEqual(2, len(responses.calls))
+
+    @responses.activate
+    def test_token_provider(self):
+        responses.post(
+            self.request_url,
+            json={
+                "access_token": "oa_prod_first",
+                "expires_in": 2399,
+                "refresh_token": "oa_prod_issued",
+            },
+        )
+        TokenProvider(
+            "oa_prod_authcode", self.client_id, self.jwt, token_store=self.store
+        )
+        sess = self._session()
+        self.assertEqual("oa_prod_first", sess.access_token)
+        self.assertEqual("oa_prod_issued", sess.refresh_token)
+        self.assertEqual(1, len(responses.calls))
+
+
+class TestMemoryTokenStore(TokenStoreTestMixin, TestCase):
+    def setUp(self):
+        self.store = MemoryTokenStore()
+
+
+class TestFileTokenStore(TokenStoreTestMixin, TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.store = FileTokenStore(os.path.join(self.tmpdir.name, "tokens.json"))
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+
+class TestSQLiteTokenStore(TokenStoreTestMixin, TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.store = SQLiteTokenStore(os.path.join(self.tmpdir.name, "tokens.db"))
+
+    def tearDown(self):
+        self.store.close()
+        self.tmpdir.cleanup()
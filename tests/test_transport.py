@@ -0,0 +1,76 @@
+import responses
+from unittest import TestCase
+
+from revolut.business import BusinessClient
+from revolut.merchant import MerchantClient
+from revolut.session import RenewableSession, TemporarySession
+from revolut.transport import Transport, default_transport
+
+
+class TestTransport(TestCase):
+    access_token = "oa_sand_lI35rv-tpvl0qsKa5OJGW5yiiXtKg7uZYB6b0jmLSCk"
+
+    def test_default_transport_shared(self):
+        cli1 = BusinessClient(TemporarySession(self.access_token))
+        cli2 = MerchantClient("sk_test", sandbox=True)
+        self.assertIs(default_transport(), cli1._transport)
+        self.assertIs(cli1._requester, cli2._requester)
+        self.assertEqual((5, 30), cli1._transport.timeout)
+
+    def test_custom_transport(self):
+        transport = Transport(
+            pool_connections=2, pool_maxsize=32, connect_timeout=1, read_timeout=2
+        )
+        adapter = transport.session.get_adapter("https://b2b.revolut.com")
+        self.assertEqual(32, adapter._pool_maxsize)
+        ssn = RenewableSession(
+            "oa_sand_refresh", "client-id", "jwt", transport=transport
+        )
+        cli = BusinessClient(ssn)
+        self.assertIs(transport, cli._transport)
+        self.assertIsNot(default_transport().session, cli._requester)
+        transport.close()
+
+    @responses.activate
+    def test_timeouts(self):
+        transport = Transport(connect_timeout=1, read_timeout=2)
+        cli = MerchantClient("sk_test", sandbox=True, transport=transport)
+        responses.get("https://sandbox-merchant.revolut.com/api/1.0/orders", json=[])
+        cli._get("orders")
+        self.assertEqual((1, 2), responses.calls[0].request.req_kwargs["timeout"])
+        cli = MerchantClient("sk_test", sandbox=True, timeout=7, transport=transport)
+        cli._get("orders")
+        self.assertEqual(7, responses.calls[1].request.req_kwargs["timeout"])
+        # explicit values are kept, even if falsy
+        self.assertEqual(
+            (0, 0.0), Transport(connect_timeout=0, read_timeout=0.0).timeout
+        )
+
+    @responses.activate
+    def test_merchant_keys_not_shared(self):
+        cli1 = MerchantClient("sk_one", sandbox=True)
+        cli2 = MerchantClient("sk_two", sandbox=True)
+        url = "https://sandbox-merchant.revolut.com/api/1.0/orders"
+        responses.get(url, json=[])
+        cli1._get("orders")
+        cli2._get("orders")
+        self.assertEqual(
+            "Bearer sk_one", responses.calls[0].request.headers["Authorization"]
+        )
+        self.assertEqual(
+            "Bearer sk_two", responses.calls[1].request.headers["Authorization"]
+        )
+        self.assertNotIn("Authorization", default_transport().session.headers)
+
+    @responses.activate
+    def test_token_request(self):
+        transport = Transport(connect_timeout=1, read_timeout=2)
+        responses.post(
+            "https://sandbox-b2b.revolut.com/api/1.0/auth/token",
+            json={"access_token": "oa_sand_new", "expires_in": 2399},
+        )
+        ssn = RenewableSession(
+            "oa_sand_refresh", "client-id", "jwt", transport=transport
+        )
+        self.assertEqual("oa_sand_new", ssn.access_token)
+        self.assertEqual((1, 2), responses.calls[0].request.req_kwargs["timeout"])
@@ -0,0 +1,338 @@
+import asyncio
+from decimal import Decimal
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+from unittest import TestCase
+from wsgiref.simple_server import WSGIRequestHandler, make_server
+
+import requests
+
+from revolut import exceptions
+from revolut.webhooks import (
+    EventPipeline,
+    LRUDeduplicator,
+    OrderCompleted,
+    OrderEvent,
+    SQLiteDeduplicator,
+    WebhookEvent,
+    WebhookHandler,
+    parse_event,
+    sign,
+    verify_signature,
+)
+
+SECRET = "wsk_r59a4HfWVAKycbCaNO1RvgCJec02gRd8"
+NOW = 1700000000.0
+TIMESTAMP = str(int(NOW * 1000))
+
+
+def _body(event="ORDER_COMPLETED", order_id="order-1", **kwargs):
+    return json.dumps(dict(event=event, order_id=order_id, **kwargs)).encode()
+
+
+def _environ(body, timestamp=TIMESTAMP, signature=None, method="POST"):
+    return {
+        "REQUEST_METHOD": method,
+        "CONTENT_LENGTH": str(len(body)),
+        "wsgi.input": io.BytesIO(body),
+        "HTTP_REVOLUT_REQUEST_TIMESTAMP": timestamp,
+        "HTTP_REVOLUT_SIGNATURE": signature or sign(SECRET, timestamp, body),
+    }
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+class TestSignature(TestCase):
+    def test_verify(self):
+        body = _body()
+        signature = sign(SECRET, TIMESTAMP, body)
+        self.assertTrue(signature.startswith("v1="))
+        verify_signature(SECRET, body, TIMESTAMP, signature, now=NOW)
+        # rotated secrets, either listed in the header or on our side
+        verify_signature(
+            SECRET, body, TIMESTAMP, "v1=deadbeef, " + signature, now=NOW + 299
+        )
+        verify_signature(["wsk_old", SECRET], body, TIMESTAMP, signature, now=NOW)
+        for args, now in (
+            ((SECRET, body + b" ", TIMESTAMP, signature), NOW),
+            (("wsk_other", body, TIMESTAMP, signature), NOW),
+            ((SECRET, body, TIMESTAMP, signature), NOW + 301),
+            ((SECRET, body, TIMESTAMP, None), NOW),
+            ((SECRET, body, "yesterday", signature), NOW),
+        ):
+            with self.assertRaises(exceptions.InvalidSignature):
+                verify_signature(*args, now=now)
+
+
+class TestWebhookHandler(TestCase):
+    def setUp(self):
+        self.handler = WebhookHandler(SECRET, clock=lambda: NOW)
+        self.received = []
+
+    def test_dispatch(self):
+        all_events, completed = [], []
+        self.handler.on()(all_events.append)
+        self.handler.on(OrderCompleted)(completed.append)
+        event = self.handler.handle(
+            _body(merchant_order_ext_ref="ref-1", amount=1.5),
+            TIMESTAMP,
+            sign(SECRET, TIMESTAMP, _body(merchant_order_ext_ref="ref-1", amount=1.5)),
+        )
+        self.assertIsInstance(event, OrderCompleted)
+        self.assertEqual("order-1", event.order_id)
+        self.assertEqual("ref-1", event.merchant_order_ext_ref)
+        self.assertEqual(Decimal("1.5"), event.data["amount"])
+        self.assertEqual(NOW, event.timestamp.timestamp())
+        self.assertEqual([event], completed)
+
+        body = _body("ORDER_AUTHORISED")
+        event = self.handler.handle(body, TIMESTAMP, sign(SECRET, TIMESTAMP, body))
+        self.assertIsInstance(event, OrderEvent)
+        body = _body("SOMETHING_NEW")
+        event = self.handler.handle(body, TIMESTAMP, sign(SECRET, TIMESTAMP, body))
+        self.assertIs(type(event), WebhookEvent)
+        self.assertEqual("SOMETHING_NEW", event.event)
+        self.assertEqual(3, len(all_events))
+        self.assertEqual(1, len(completed))
+
+    def _call(self, environ):
+        statuses = []
+        body = self.handler(environ, lambda status, headers: statuses.append(status))
+        self.assertEqual([b""], body)
+        return statuses[0]
+
+    def test_wsgi(self):
+        self.handler.on(OrderCompleted)(self.received.append)
+        self.assertEqual("204 No Content", self._call(_environ(_body())))
+        self.assertEqual(1, len(self.received))
+        self.assertEqual(
+            "401 Unauthorized", self._call(_environ(_body(), signature="v1=00"))
+        )
+        self.assertEqual(
+            "405 Method Not Allowed", self._call(_environ(b"", method="GET"))
+        )
+        self.assertEqual("400 Bad Request", self._call(_environ(b"[1, 2")))
+        self.assertEqual("400 Bad Request", self._call(_environ(b"[1, 2]")))
+        self.assertEqual(
+            "413 Payload Too Large", self._call(_environ(b" " * 100000 + _body()))
+        )
+        for length in ("12abc", "-1"):
+            environ = dict(_environ(_body()), CONTENT_LENGTH=length)
+            with self.assertLogs("revolut.webhooks", "WARNING"):
+                self.assertEqual("400 Bad Request", self._call(environ))
+
+        def fail(event):
+            raise RuntimeError("database down")
+
+        self.handler.on(OrderCompleted)(fail)
+        with self.assertLogs("revolut.webhooks", "ERROR"):
+            self.assertEqual("500 Internal Server Error", self._call(_environ(_body())))
+
+    def test_asgi(self):
+        received = []
+
+        async def handle(event):
+            received.append(event)
+
+        self.handler.on(OrderCompleted)(handle)
+
+        async def call(body, signature=None, method="POST"):
+            messages = [
+                {"type": "http.request", "body": body[:5], "more_body": True},
+                {"type": "http.request", "body": body[5:]},
+            ]
+            sent = []
+
+            async def receive():
+                return messages.pop(0)
+
+            async def send(message):
+                sent.append(message)
+
+            scope = {
+                "type": "http",
+                "method": method,
+                "headers": [
+                    (b"revolut-request-timestamp", TIMESTAMP.encode()),
+                    (
+                        b"revolut-signature",
+                        (signature or sign(SECRET, TIMESTAMP, body)).encode(),
+                    ),
+                ],
+            }
+            await self.handler.asgi(scope, receive, send)
+            return sent[0]["status"]
+
+        async def run():
+            return [
+                await call(_body()),
+                await call(_body(), signature="v1=00"),
+                await call(_body(), method="PUT"),
+            ]
+
+        self.assertEqual([204, 401, 405], asyncio.run(run()))
+        self.assertEqual(1, len(received))
+
+        async def websocket():
+            sent = []
+
+            async def receive():
+                return {"type": "websocket.connect"}
+
+            async def send(message):
+                sent.append(message)
+
+            await self.handler.asgi({"type": "websocket"}, receive, send)
+            with self.assertRaises(ValueError):
+                await self.handler.asgi({"type": "webtransport"}, receive, send)
+            return sent
+
+        self.assertEqual([{"type": "websocket.close"}], asyncio.run(websocket()))
+
+    def test_server(self):
+        self.handler.on(OrderEvent)(self.received.append)
+        server = make_server("127.0.0.1", 0, self.handler, handler_class=_QuietHandler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            url = "http://127.0.0.1:{}/".format(server.server_port)
+            with requests.Session() as http:
+                for i in range(50):
+                    body = _body(order_id="order-{}".format(i))
+                    rsp = http.post(
+                        url,
+                        data=body,
+                        headers={
+                            "Revolut-Request-Timestamp": TIMESTAMP,
+                            "Revolut-Signature": sign(SECRET, TIMESTAMP, body),
+                        },
+                    )
+                    self.assertEqual(204, rsp.status_code)
+        finally:
+            server.shutdown()
+            server.server_close()
+        self.assertEqual(
+            ["order-{}".format(i) for i in range(50)],
+            [event.order_id for event in self.received],
+        )
+
+
+def _event(order_id, event="ORDER_COMPLETED", seq=0):
+    return parse_event(_body(event, order_id, seq=seq))
+
+
+class TestEventPipeline(TestCase):
+    def test_lru_deduplicator(self):
+        dedup = LRUDeduplicator(maxsize=2)
+        self.assertTrue(dedup.add("a"))
+        self.assertFalse(dedup.add("a"))
+        self.assertTrue(dedup.add("b"))
+        self.assertTrue(dedup.add("c"))  # pushes out "a"
+        self.assertTrue(dedup.add("a"))
+        dedup.discard("a")
+        self.assertTrue(dedup.add("a"))
+
+    def test_sqlite_deduplicator(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "webhooks.db")
+            dedup = SQLiteDeduplicator(path, maxsize=3)
+            dedup._prune_every = 5
+            self.assertTrue(dedup.add("a"))
+            self.assertFalse(dedup.add("a"))
+            dedup.close()
+            dedup = SQLiteDeduplicator(path, maxsize=3)
+            dedup._prune_every = 5
+            self.assertFalse(dedup.add("a"))
+            dedup.discard("a")
+            self.assertTrue(dedup.add("a"))
+            for key in "bcd":
+                time.sleep(0.001)
+                dedup.add(key)
+            self.assertEqual(
+                3, dedup.db.execute("SELECT COUNT(*) FROM webhook_events").fetchone()[0]
+            )
+            dedup.close()
+
+    def test_ordering(self):
+        lock = threading.Lock()
+        active, overlap, peak, processed = set(), [], [0], []
+
+        def process(event):
+            with lock:
+                if event.order_id in active:
+                    overlap.append(event)
+                active.add(event.order_id)
+                peak[0] = max(peak[0], len(active))
+            time.sleep(0.002)
+            with lock:
+                active.discard(event.order_id)
+                processed.append((event.order_id, event.data["seq"]))
+
+        events = [_event("order-{}".format(i % 5), seq=i // 5) for i in range(50)]
+        with EventPipeline(process, workers=4) as pipeline:
+            for event in events:
+                self.assertTrue(pipeline.submit(event))
+        self.assertEqual([], overlap)
+        self.assertGreater(peak[0], 1)
+        self.assertEqual(50, len(processed))
+        for i in range(5):
+            self.assertEqual(
+                list(range(10)),
+                [
+                    seq
+                    for order_id, seq in processed
+                    if order_id == "order-{}".format(i)
+                ],
+            )
+
+    def test_failure(self):
+        attempts, errors = [], []
+
+        def process(event):
+            attempts.append(event)
+            if len(attempts) == 1:
+                raise RuntimeError("database down")
+
+        dedup = LRUDeduplicator()
+        with self.assertLogs("revolut.webhooks", "ERROR"):
+            with EventPipeline(
+                process, dedup=dedup, on_error=lambda e, exc: errors.append(exc)
+            ) as pipeline:
+                pipeline.submit(_event("order-1"))
+        self.assertIsInstance(errors[0], RuntimeError)
+        # the failed event is processed upon redelivery, the successful one only once
+        with EventPipeline(process, dedup=dedup) as pipeline:
+            self.assertTrue(pipeline.submit(_event("order-1")))
+        with EventPipeline(process, dedup=dedup) as pipeline:
+            self.assertFalse(pipeline.submit(_event("order-1")))
+            self.assertTrue(pipeline.submit(_event("order-1", "ORDER_AUTHORISED")))
+        self.assertEqual(3, len(attempts))
+
+    def test_backpressure(self):
+        release = threading.Event()
+        handler = WebhookHandler(SECRET, clock=lambda: NOW)
+        pipeline = EventPipeline(
+            lambda event: release.wait(), workers=1, capacity=2, timeout=0.01
+        )
+        handler.on(OrderEvent)(pipeline.submit)
+        for i in range(2):
+            body = _body(order_id="order-{}".format(i))
+            handler.handle(body, TIMESTAMP, sign(SECRET, TIMESTAMP, body))
+        self.assertRaises(
+            exceptions.WebhookOverloaded, pipeline.submit, _event("order-2")
+        )
+        statuses = []
+        handler(
+            _environ(_body(order_id="order-3")),
+            lambda status, headers: statuses.append(status),
+        )
+        self.assertEqual(["503 Service Unavailable"], statuses)
+        release.set()
+        pipeline.close()
@@ -0,0 +1,69 @@
+"""Compares the JSON codecs on large transactions and orders payloads.
+
+    python tools/bench_json.py [-n 20000] [-r 5]
+
+The decoding is compared with ``json.loads(text, parse_float=Decimal)`` as formerly called
+through ``requests``, the encoding with ``json.dumps`` and ``JSONWithDecimalEncoder``. Raw
+``orjson.loads``, which yields floats, is shown for reference only.
+"""
+import argparse
+from decimal import Decimal
+import gc
+import json
+import time
+
+import orjson
+
+from revolut import utils
+from revolut.codec import JSONCodec, OrjsonCodec
+
+from bench_timestamps import orders, transactions
+
+
+def best(func, repeat):
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        gc.disable()  # NOTE: like timeit, as the collections would make the figures vary
+        t0 = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - t0)
+        gc.enable()
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-n", type=int, default=20000, help="records per payload")
+    parser.add_argument("-r", type=int, default=5, help="repetitions, the best counts")
+    args = parser.parse_args()
+    jsoncodec, orjsoncodec = JSONCodec(), OrjsonCodec()
+    for name, records in (
+        ("transactions", list(transactions(args.n))),
+        ("orders", list(orders(args.n))),
+    ):
+        body = json.dumps(records).encode("utf-8")
+        data = jsoncodec.loads(body)
+        assert data == orjsoncodec.loads(body)
+        assert jsoncodec.dumps(data) == orjsoncodec.dumps(data)
+        print("{:d} {}, {:.1f} MB".format(args.n, name, len(body) / 1e6))
+        for label, func in (
+            (
+                "decode, json.loads",
+                lambda: json.loads(body.decode("utf-8"), parse_float=Decimal),
+            ),
+            ("decode, JSONCodec", lambda: jsoncodec.loads(body)),
+            ("decode, OrjsonCodec", lambda: orjsoncodec.loads(body)),
+            ("decode, raw orjson (floats)", lambda: orjson.loads(body)),
+            (
+                "encode, json.dumps",
+                lambda: json.dumps(data, cls=utils.JSONWithDecimalEncoder).encode(),
+            ),
+            ("encode, JSONCodec", lambda: jsoncodec.dumps(data)),
+            ("encode, OrjsonCodec", lambda: orjsoncodec.dumps(data)),
+        ):
+            print("  {:28s} {:.3f}s".format(label, best(func, args.r)))
+
+
+if __name__ == "__main__":
+    main()
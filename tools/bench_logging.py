@@ -0,0 +1,79 @@
+"""Measures what the debug logging adds to a large list call, disabled and enabled.
+
+    python tools/bench_logging.py [-n 20000] [-r 5]
+
+The requests are served from memory, so the figures show the client's own CPU time: the
+decoding of the response and the logging. The former eager formatting is emulated by
+``json.dumps(result, indent=2, sort_keys=True)`` of every result.
+"""
+import argparse
+import gc
+import json
+import logging
+import time
+
+import requests
+
+from revolut import utils
+from revolut.merchant import MerchantClient
+
+from bench_timestamps import transactions
+
+
+class MemoryRequester(object):
+    def __init__(self, body):
+        self.body = body
+
+    def request(self, method, url, **kwargs):
+        rsp = requests.Response()
+        rsp.status_code = 200
+        rsp._content = self.body
+        return rsp
+
+
+def best(func, repeat):
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        gc.disable()
+        t0 = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - t0)
+        gc.enable()
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-n", type=int, default=20000, help="records per response")
+    parser.add_argument("-r", type=int, default=5, help="repetitions, the best counts")
+    args = parser.parse_args()
+    body = json.dumps(list(transactions(args.n))).encode("utf-8")
+    cli = MerchantClient("sk_benchmark", sandbox=True)
+    cli._requester = MemoryRequester(body)
+    logger = logging.getLogger("revolut")
+    logger.addHandler(logging.NullHandler())
+    logger.propagate = False
+
+    def eager():
+        result = cli._get("transactions")
+        json.dumps(result, cls=utils.JSONWithDecimalEncoder, indent=2, sort_keys=True)
+
+    print("{:d} transactions, {:.1f} MB".format(args.n, len(body) / 1e6))
+    logger.setLevel(logging.INFO)
+    for label, func in (
+        ("decoding only", lambda: cli.codec.loads(body)),
+        ("request, debug disabled", lambda: cli._get("transactions")),
+        ("request, formerly", eager),
+    ):
+        print("  {:28s} {:.3f}s".format(label, best(func, args.r)))
+    logger.setLevel(logging.DEBUG)
+    print(
+        "  {:28s} {:.3f}s".format(
+            "request, debug enabled", best(lambda: cli._get("transactions"), args.r)
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
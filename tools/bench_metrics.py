@@ -0,0 +1,47 @@
+"""Measures the overhead of the request metrics, disabled and enabled.
+
+    python tools/bench_metrics.py [-n 20000] [-r 5]
+
+The requests are served from memory, so the figures show the client's own CPU time: ``-n``
+requests for a single order and one request for a list of ``-n`` orders.
+"""
+import argparse
+import json
+
+from revolut.merchant import MerchantClient
+from revolut.metrics import Metrics
+
+from bench_json import best
+from bench_logging import MemoryRequester
+from bench_timestamps import orders
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-n", type=int, default=20000, help="requests, list size")
+    parser.add_argument("-r", type=int, default=5, help="repetitions, the best counts")
+    args = parser.parse_args()
+    records = list(orders(args.n))
+    single = MemoryRequester(json.dumps(records[0]).encode("utf-8"))
+    listing = MemoryRequester(json.dumps(records).encode("utf-8"))
+    for label, metrics in (("disabled", None), ("enabled", Metrics())):
+        cli = MerchantClient("sk_benchmark", sandbox=True, metrics=metrics)
+
+        def get_orders():
+            for order in records:
+                cli.get_order(order["id"])
+
+        cli._requester = single
+        per_request = best(get_orders, args.r) / args.n
+        cli._requester = listing
+        listed = best(cli.orders, args.r)
+        print(
+            "metrics {}: {:.1f}us per order request, {:.3f}s per list of {:d}".format(
+                label, per_request * 1e6, listed, args.n
+            )
+        )
+    print("{:d} endpoint templates recorded".format(len(metrics.snapshot())))
+
+
+if __name__ == "__main__":
+    main()
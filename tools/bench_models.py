@@ -0,0 +1,59 @@
+"""Compares memory use and construction time of the regular and the compact models.
+
+    python tools/bench_models.py [-n 100000]
+
+The payload is decoded from JSON text each time, as the clients do, and the memory retained
+by the resulting objects is measured with ``tracemalloc``, so the raw values kept by the
+compact models count. Timing under ``tracemalloc`` is slower than usual.
+"""
+import argparse
+from decimal import Decimal
+import gc
+import json
+import time
+import tracemalloc
+
+from bench_timestamps import orders, transactions
+from revolut.business import Transaction
+from revolut.compact import CompactOrder, CompactTransaction
+from revolut.merchant import Order
+
+
+def measure(cls, text, touch=()):
+    gc.collect()
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    objs = [cls(client=None, **data) for data in json.loads(text, parse_float=Decimal)]
+    elapsed = time.perf_counter() - t0
+    for name in touch:
+        for obj in objs:
+            getattr(obj, name)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size / len(objs), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-n", type=int, default=100000, help="records per payload")
+    args = parser.parse_args()
+    for name, regular, compact, payload in (
+        ("transactions", Transaction, CompactTransaction, transactions(args.n)),
+        ("orders", Order, CompactOrder, orders(args.n)),
+    ):
+        text = json.dumps(list(payload))
+        for label, cls, touch in (
+            ("regular", regular, ()),
+            ("compact", compact, ()),
+            ("compact, timestamps read", compact, ("created_at", "updated_at")),
+        ):
+            size, elapsed = measure(cls, text, touch)
+            print(
+                "{:d} {} {}: {:.0f} B/object, built in {:.2f}s".format(
+                    args.n, name, label, size, elapsed
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Compares decoding of transactions and orders with dateutil and the fast timestamp parser.
+
+    python tools/bench_timestamps.py [-n 100000]
+"""
+import argparse
+from datetime import datetime, timedelta
+import time
+from unittest import mock
+
+import dateutil.parser
+
+from revolut import utils
+from revolut.business import Transaction
+from revolut.merchant import Order
+
+
+def transactions(n):
+    start = datetime(2022, 1, 1)
+    for i in range(n):
+        ts = (start + timedelta(seconds=i)).isoformat(timespec="milliseconds") + "Z"
+        yield {
+            "id": "tx-{}".format(i),
+            "type": "transfer",
+            "state": "completed",
+            "request_id": "req-{}".format(i),
+            "created_at": ts,
+            "updated_at": ts,
+            "completed_at": ts,
+            "legs": [
+                {
+                    "leg_id": "leg-{}".format(i),
+                    "account_id": "acc-1",
+                    "counterparty": {"id": "cpt-1", "type": "revolut"},
+                    "amount": -1.5,
+                    "currency": "GBP",
+                    "description": "Payment {}".format(i),
+                    "balance": 100.0,
+                }
+            ],
+        }
+
+
+def orders(n):
+    start = datetime(2022, 1, 1)
+    for i in range(n):
+        ts = (start + timedelta(seconds=i)).isoformat(timespec="microseconds") + "Z"
+        yield {
+            "id": "order-{}".format(i),
+            "public_id": "pub-{}".format(i),
+            "type": "PAYMENT",
+            "state": "COMPLETED",
+            "created_at": ts,
+            "updated_at": ts,
+            "completed_at": ts,
+            "order_amount": {"value": 1000, "currency": "GBP"},
+        }
+
+
+def decode(cls, payload, **kwargs):
+    t0 = time.perf_counter()
+    for data in payload:
+        cls(**kwargs, **data)
+    return time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-n", type=int, default=100000, help="records per payload")
+    args = parser.parse_args()
+    for name, cls, payload in (
+        ("transactions", Transaction, list(transactions(args.n))),
+        ("orders", Order, list(orders(args.n))),
+    ):
+        fast = decode(cls, payload, client=None)
+        with mock.patch.object(utils, "_parse_datetime", dateutil.parser.parse):
+            slow = decode(cls, payload, client=None)
+        print(
+            "{:d} {}: dateutil {:.2f}s, fast path {:.2f}s, {:.1f}x faster".format(
+                args.n, name, slow, fast, slow / fast
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""Measures the throughput of the webhook handler, called directly and over local HTTP.
+
+    python tools/bench_webhooks.py [-n 20000] [-c 4]
+
+Over HTTP the handler is served by ``wsgiref`` (a new connection per request) and by
+``http.server`` calling ``WebhookHandler.handle()`` on keep-alive connections. The events
+are posted by ``-c`` threads with ``http.client``. All run in one process, so the figures
+are bound by the servers and the clients rather than by the handler.
+"""
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import http.client
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import io
+import json
+from socketserver import ThreadingMixIn
+import threading
+import time
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+from revolut import exceptions
+from revolut.webhooks import OrderCompleted, WebhookHandler, sign
+
+SECRET = "wsk_benchmark"
+
+
+class _WSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class _WSGIRequestHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def keep_alive_handler(webhooks):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers["Content-Length"]))
+            try:
+                webhooks.handle(
+                    body,
+                    self.headers["Revolut-Request-Timestamp"],
+                    self.headers["Revolut-Signature"],
+                )
+                status = 204
+            except exceptions.InvalidSignature:
+                status = 401
+            self.send_response(status)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def requests_data(n):
+    timestamp = str(int(time.time() * 1000))
+    for i in range(n):
+        body = json.dumps(
+            {
+                "event": "ORDER_COMPLETED",
+                "order_id": "order-{}".format(i),
+                "merchant_order_ext_ref": "ref-{}".format(i),
+            }
+        ).encode()
+        yield body, timestamp, sign(SECRET, timestamp, body)
+
+
+def direct(handler, data):
+    t0 = time.perf_counter()
+    for body, timestamp, signature in data:
+        handler(
+            {
+                "REQUEST_METHOD": "POST",
+                "CONTENT_LENGTH": str(len(body)),
+                "wsgi.input": io.BytesIO(body),
+                "HTTP_REVOLUT_REQUEST_TIMESTAMP": timestamp,
+                "HTTP_REVOLUT_SIGNATURE": signature,
+            },
+            lambda status, headers: None,
+        )
+    return time.perf_counter() - t0
+
+
+def over_http(server, data, clients, keep_alive):
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_address[1]
+
+    def post(chunk):
+        conn = http.client.HTTPConnection("127.0.0.1", port)
+        for body, timestamp, signature in chunk:
+            if not keep_alive:
+                conn.close()
+            conn.request(
+                "POST",
+                "/",
+                body,
+                {
+                    "Revolut-Request-Timestamp": timestamp,
+                    "Revolut-Signature": signature,
+                },
+            )
+            rsp = conn.getresponse()
+            rsp.read()
+            assert rsp.status == 204, rsp.status
+        conn.close()
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(clients) as pool:
+        list(pool.map(post, [data[i::clients] for i in range(clients)]))
+    elapsed = time.perf_counter() - t0
+    server.shutdown()
+    server.server_close()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-n", type=int, default=20000, help="number of events")
+    parser.add_argument("-c", type=int, default=4, help="concurrent HTTP clients")
+    args = parser.parse_args()
+    data = list(requests_data(args.n))
+    received = []
+    handler = WebhookHandler(SECRET)
+    handler.on(OrderCompleted)(received.append)
+    for label, run in (
+        ("direct", lambda: direct(handler, data)),
+        (
+            "wsgiref",
+            lambda: over_http(
+                make_server(
+                    "127.0.0.1",
+                    0,
+                    handler,
+                    server_class=_WSGIServer,
+                    handler_class=_WSGIRequestHandler,
+                ),
+                data,
+                args.c,
+                keep_alive=False,
+            ),
+        ),
+        (
+            "http.server, keep-alive",
+            lambda: over_http(
+                ThreadingHTTPServer(("127.0.0.1", 0), keep_alive_handler(handler)),
+                data,
+                args.c,
+                keep_alive=True,
+            ),
+        ),
+    ):
+        elapsed = run()
+        print(
+            "{:d} events {}: {:.2f}s, {:.0f} events/s".format(
+                args.n, label, elapsed, args.n / elapsed
+            )
+        )
+    assert len(received) == 3 * args.n
+
+
+if __name__ == "__main__":
+    main()